@@ -5,10 +5,12 @@ CLI interface for the matcher
 import argparse
 import csv
 import json
+import os
+import numpy as np
 from .core import Matcher
-from .solvers import MinMaxSolver, FairFlow
+from .cache import EncoderCache, file_digest, fingerprint
+from . import ingest
 import logging
-from collections import defaultdict
 import time
 
 logger = logging.getLogger()
@@ -25,7 +27,17 @@ logger.addHandler(consoleHandler)
 t0 = time.time()
 logger.info("Starting time={}".format(t0))
 
-parser = argparse.ArgumentParser()
+parser = argparse.ArgumentParser(
+    epilog="""
+        Score, constraint, max papers, quota and probability limit files can be
+        CSV, Parquet (.parquet), Arrow IPC/Feather (.arrow, .feather, .ipc) or
+        numpy (.npz) files. Binary files hold "papers", "reviewers" and "values"
+        columns ("users" and "values" for max papers and quota), or use the
+        first columns in that order. ID columns may be dictionary-encoded; in
+        .npz files, as integer codes with a "<column>_categories" array of IDs.
+        Empty or null values in score files are conflict bids.
+        """,
+)
 parser.add_argument(
     "--scores",
     nargs="+",
@@ -114,15 +126,129 @@ parser.add_argument(
 # TODO: can argparse throw an error if the solver isn't in the list?
 parser.add_argument(
     "--solver",
-    help="Choose from: {}".format(["MinMax", "FairFlow", "Randomized", "FairIR", "PerturbedMaximization"]),
+    help="Choose from: {}".format(["MinMax", "FairFlow", "Randomized", "FairIR", "PerturbedMaximization", "Portfolio"]),
     default="MinMax",
 )
 
+parser.add_argument(
+    "--sparse",
+    action="store_true",
+    help="""Use flag to store scores and constraints as sparse matrices. Scores that are
+    not in the score files are 0. Solvers that cannot use sparse input densify them.""",
+)
+
+parser.add_argument(
+    "--compact",
+    action="store_true",
+    help="""Use flag to store scores and costs as float32 and constraints as int8,
+    reducing the memory used by the encoded matrices.""",
+)
+
 parser.add_argument(
     "--attribute_constraints",
     help="""JSON file with attribute constraints"""
 )
 
+parser.add_argument(
+    "--cache_dir",
+    help="""Directory for caching encoded inputs. Later runs with the same score, constraint,
+    probability limit and user group files and settings load the encoding from the cache
+    instead of parsing and encoding the files again.""",
+)
+
+parser.add_argument(
+    "--cache_size",
+    type=float,
+    help="""Maximum size of the cache directory in GB. Least recently used entries are
+    evicted when it is exceeded. Unbounded by default.""",
+)
+
+parser.add_argument(
+    "--pricing_top_k",
+    type=int,
+    help="""Solve on the given number of least-cost reviewers of each paper and papers of
+    each reviewer first, then add the left-out pairs that can lower the cost and solve
+    again until there are none. The result is optimal over all pairs. MinMax only.""",
+)
+
+parser.add_argument(
+    "--split_components",
+    action="store_true",
+    help="""Use flag to split the problem into its connected components (reviewers and
+    papers linked by pairs without a conflict that have a score or a constraint of 1),
+    solve them separately in parallel and merge the results.""",
+)
+
+parser.add_argument(
+    "--num_workers",
+    type=int,
+    help="""Number of processes solving components with --split_components, or threads
+    drawing samples with --num_samples. One per CPU by default.""",
+)
+
+parser.add_argument(
+    "--presolve",
+    action="store_true",
+    help="""Use flag to shrink the problem before solving: forced pairs (constraint 1) are
+    fixed and subtracted from demands and loads, and papers with no demand left and
+    reviewers with no capacity left or no assignable paper are removed.""",
+)
+
+parser.add_argument(
+    "--time_budget",
+    type=float,
+    help="""Seconds the solver may take. When they run out, the solver returns its best
+    feasible assignment so far and the completion status reports the objective it
+    reached. Unbounded by default; not supported by Randomized.""",
+)
+
+parser.add_argument(
+    "--portfolio",
+    nargs="+",
+    help="""Solvers the Portfolio solver races, in separate processes. FairFlow,
+    FairSequence and FairIR by default.""",
+)
+
+parser.add_argument(
+    "--portfolio_scoring",
+    default="affinity",
+    choices=["affinity", "min_paper_score", "time"],
+    help="""How the Portfolio solver picks its winner: the largest total affinity, the
+    largest score of the worst-off paper, or the first solver to finish.""",
+)
+
+parser.add_argument(
+    "--shared_memory",
+    action="store_true",
+    help="""Use flag to place the encoded matrices in shared memory while solving, so
+    that processes solving components or racing in a portfolio attach to them instead
+    of receiving a copy.""",
+)
+
+parser.add_argument(
+    "--shared_memory_dir",
+    help="""Directory in which to place the shared matrices as memory-mapped files,
+    instead of in shared memory. Implies --shared_memory.""",
+)
+
+parser.add_argument(
+    "--num_samples",
+    type=int,
+    default=1,
+    help="""Number of assignments to sample from the fractional assignment of the
+    Randomized or PerturbedMaximization solver, in parallel threads (see
+    --num_workers). The first is written to assignments.json, and all of them with
+    their empirical marginal probabilities to samples.npz in the output folder.""",
+)
+
+parser.add_argument(
+    "--seed",
+    type=int,
+    help="""Seed of the random number generator of the Randomized or
+    PerturbedMaximization solver, which makes its samples and alternates
+    reproducible whatever --num_workers is. Random by default.""",
+)
+
 # Output folder
 parser.add_argument(
     "--output_folder",
@@ -147,6 +273,8 @@ if args.solver == "PerturbedMaximization":
     solver_class = "PerturbedMaximization"
 if args.solver == "FairSequence":
     solver_class = "FairSequence"
+if args.solver == "Portfolio":
+    solver_class = "Portfolio"
 
 if not solver_class:
     raise ValueError("Invalid solver class {}".format(args.solver))
@@ -159,144 +287,187 @@ weight_by_type = {
     score_file: args.weights[idx] for idx, score_file in enumerate(args.scores)
 }
 
-scores_by_type = {score_file: {"edges": []} for score_file in args.scores}
-
-conflict_bids = []
-for score_file in args.scores:
-    logger.info("processing file={}".format(score_file))
-    file_reviewers = []
-    file_papers = []
-
-    with open(score_file) as file_handle:
 
-        for row in csv.reader(file_handle):
-            paper_id = row[0].strip()
-            profile_id = row[1].strip()
-            score = row[2].strip()
-            
+def input_digest(value):
+    """Digest of an input file, or the value itself if it is not a file."""
+    if value and os.path.isfile(value):
+        return file_digest(value)
+    return value
+
+
+cache_max_bytes = int(args.cache_size * 1e9) if args.cache_size else None
+cache_key = None
+cached_encoder = None
+if args.cache_dir:
+    cache = EncoderCache(
+        args.cache_dir,
+        max_bytes=cache_max_bytes,
+        logger=logger,
+    )
+    cache_key = fingerprint(
+        [input_digest(score_file) for score_file in args.scores],
+        args.weights,
+        input_digest(args.constraints),
+        args.user_group,
+        input_digest(args.user_group_file),
+        input_digest(args.probability_limits),
+        args.perturbation,
+        args.bad_match_thresholds,
+        input_digest(args.attribute_constraints),
+        args.sparse,
+        args.compact,
+    )
+    # the inputs are not read on a hit, so the Matcher is given the encoder
+    # loaded here rather than loading it again, when it may have been evicted
+    cached_encoder = cache.load(cache_key, logger=logger)
+
+# parse every input file in parallel into typed columns
+reads = {}
+if args.max_papers:
+    reads["max_papers"] = (ingest.read_loads, (args.max_papers,), {})
+if args.quota:
+    reads["quota"] = (ingest.read_loads, (args.quota,), {"skip_header": True})
 
-            if score == '': # This means the reviewer bidded "Conflict" for the paper -- add this to the constraints
-                conflict_bids.append((paper_id, profile_id, -1))
-                continue
+probability_limits = []
+if cached_encoder is None:
+    for score_file in args.scores:
+        reads[score_file] = (
+            ingest.read_edges,
+            (score_file,),
+            {"allow_missing": True},
+        )
+    if args.constraints:
+        reads["constraints"] = (
+            ingest.read_edges,
+            (args.constraints,),
+            {"dtype": int},
+        )
+    if args.probability_limits:
+        try:
+            probability_limits = float(args.probability_limits)
+        except ValueError:  # read from file
+            reads["probability_limits"] = (
+                ingest.read_edges,
+                (args.probability_limits,),
+                {},
+            )
+columns = ingest.read_all(reads)
+
+if cached_encoder is not None:
+    logger.info("Using cached encoding={}".format(cache_key))
+    reviewers, papers = cached_encoder.reviewers, cached_encoder.papers
+else:
+    for score_file in args.scores:
+        logger.info("processing file={}".format(score_file))
+        edges = columns[score_file]
+        # an empty score means the reviewer bid "Conflict" for the paper
+        reviewer_set.update(ingest.used_ids(edges.reviewers, ~edges.missing))
+        paper_set.update(ingest.used_ids(edges.papers, ~edges.missing))
+
+    if args.constraints:
+        reviewer_set.update(
+            ingest.used_ids(columns["constraints"].reviewers)
+        )
+        paper_set.update(ingest.used_ids(columns["constraints"].papers))
+
+    reviewers = sorted(list(reviewer_set))
+    papers = sorted(list(paper_set))
+
+    if args.user_group:
+        selected_reviewers = set()
+        if args.user_group_file:
+            with open(args.user_group_file) as file_handle:
+                for row in csv.reader(file_handle):
+                    group_id = row[0]
+                    reviewer_email = row[1]
+                    if group_id == args.user_group:
+                        selected_reviewers.add(reviewer_email)
+        if not selected_reviewers:
+            raise ValueError("Invalid user group {}".format(args.user_group))
+        reviewers = [
+            reviewer for reviewer in reviewers if reviewer in selected_reviewers
+        ]
+
+index_by_paper = {paper: index for index, paper in enumerate(papers)}
+index_by_reviewer = {reviewer: index for index, reviewer in enumerate(reviewers)}
+
+if cached_encoder is not None:
+    scores_by_type = {score_file: {"edges": []} for score_file in args.scores}
+    constraints = []
+else:
+    scores_by_type = {}
+    conflict_bids = []
+    for score_file in args.scores:
+        edges = columns[score_file]
+        scores_by_type[score_file] = {
+            "edges": ingest.indexed_edges(
+                edges, index_by_paper, index_by_reviewer, mask=~edges.missing
+            )
+        }
+        conflict_bids.append(
+            ingest.indexed_edges(
+                edges,
+                index_by_paper,
+                index_by_reviewer,
+                mask=edges.missing,
+                value=-1,
+            )
+        )
 
-            file_reviewers.append(profile_id)
-            file_papers.append(paper_id)
-            scores_by_type[score_file]["edges"].append(
-                (paper_id, profile_id, score)
+    if args.constraints:
+        conflict_bids.append(
+            ingest.indexed_edges(
+                columns["constraints"], index_by_paper, index_by_reviewer
             )
-    reviewer_set.update(file_reviewers)
-    paper_set.update(file_papers)
-
-constraints = conflict_bids + []
-if args.constraints:
-    with open(args.constraints) as file_handle:
-        for row in csv.reader(file_handle):
-            paper_id = row[0]
-            profile_id = row[1]
-            constraint = row[2]
-
-            reviewer_set.update([profile_id])
-            paper_set.update([paper_id])
-
-            constraints.append((paper_id, profile_id, constraint))
-
-reviewers = sorted(list(reviewer_set))
-papers = sorted(list(paper_set))
-
-user_group_map = defaultdict(list)
-if args.user_group_file:
-    with open(args.user_group_file) as file_handle:
-        for row in csv.reader(file_handle):
-            group_id = row[0]
-            reviewer_email = row[1]
-            user_group_map[group_id].append(reviewer_email)
-
-reviewers_copy = [reviewer for reviewer in reviewers]
-if args.user_group:
-    selected_reviewers = user_group_map.get(args.user_group)
-    for reviewer in reviewers:
-        if reviewer not in selected_reviewers:
-            reviewers_copy.remove(reviewer)
-    reviewers = reviewers_copy
+        )
+    # conflict bids come first, so the constraints file overrides them
+    constraints = ingest.concat_indexed_edges(conflict_bids)
 
 minimums = [args.min_papers_default] * len(reviewers)
-maximums = [args.max_papers_default] * len(reviewers)
+maximums = np.full(len(reviewers), args.max_papers_default, dtype=object)
 
 if args.max_papers:
-    missing_reviewers = []
-    with open(args.max_papers) as file_handle:
-        for idx, row in enumerate(csv.reader(file_handle)):
-            profile_id = row[0]
-            max_assignment = int(row[1])
-
-            if profile_id in reviewers:
-                reviewer_idx = reviewers.index(profile_id)
-
-                maximums[reviewer_idx] = max_assignment
-            else:
-                missing_reviewers.append(profile_id)
+    missing_reviewers = ingest.assign_loads(
+        maximums, columns["max_papers"], index_by_reviewer
+    )
     if missing_reviewers:
         logger.info(
-            "Reviewers missing in all score files: " + ", ".join(profile_id)
+            "Reviewers missing in all score files: "
+            + ", ".join(missing_reviewers)
         )
 
 if args.quota:
-    missing_reviewers = []
-    with open(args.quota) as file_handle:
-        reader = csv.reader(file_handle)
-        # Skip header row
-        next(reader, None)
-        for idx, row in enumerate(reader):
-            if len(row) < 2:
-                continue
-            profile_id = row[0].strip()
-            quota = int(row[1].strip())
-
-            if profile_id in reviewers:
-                reviewer_idx = reviewers.index(profile_id)
-                maximums[reviewer_idx] = quota
-            else:
-                missing_reviewers.append(profile_id)
+    missing_reviewers = ingest.assign_loads(
+        maximums, columns["quota"], index_by_reviewer
+    )
     if missing_reviewers:
         logger.info(
-            "Reviewers in quota file missing in all score files: " + ", ".join(missing_reviewers)
+            "Reviewers in quota file missing in all score files: "
+            + ", ".join(missing_reviewers)
         )
+maximums = maximums.tolist()
 
 demands = [args.num_reviewers] * len(papers)
 num_alternates = args.num_alternates
 
-probability_limits = []
-if args.probability_limits:
-    try:
-        probability_limits = float(args.probability_limits)
-    except ValueError:  # read from file
-        missing_reviewers = set()
-        missing_papers = set()
-        with open(args.probability_limits) as file_handle:
-            for row in csv.reader(file_handle):
-                paper_id = row[0].strip()
-                profile_id = row[1].strip()
-                limit = row[2].strip()
-
-                if profile_id in reviewer_set and paper_id in paper_set:
-                    probability_limits.append((paper_id, profile_id, limit))
-
-                if profile_id not in reviewer_set:
-                    missing_reviewers.add(profile_id)
-                if paper_id not in paper_set:
-                    missing_papers.add(paper_id)
-
-        if missing_reviewers:
-            logger.info(
-                "Reviewers with probability limits but missing in all score files: "
-                + ", ".join(missing_reviewers)
-            )
-        if missing_papers:
-            logger.info(
-                "Papers with probability limits but missing in all score files: "
-                + ", ".join(missing_papers)
-            )
-        
+if cached_encoder is None and "probability_limits" in columns:
+    limits = columns["probability_limits"]
+    probability_limits = ingest.indexed_edges(
+        limits, index_by_paper, index_by_reviewer
+    )
+    missing_reviewers = set(ingest.used_ids(limits.reviewers)) - reviewer_set
+    missing_papers = set(ingest.used_ids(limits.papers)) - paper_set
+    if missing_reviewers:
+        logger.info(
+            "Reviewers with probability limits but missing in all score files: "
+            + ", ".join(missing_reviewers)
+        )
+    if missing_papers:
+        logger.info(
+            "Papers with probability limits but missing in all score files: "
+            + ", ".join(missing_papers)
+        )
+
 perturbation = 0.0
 if args.perturbation:
     try:
@@ -333,8 +504,26 @@ match_data = {
     "num_alternates": num_alternates,
     "allow_zero_score_assignments": args.allow_zero_score_assignments,
     "attribute_constraints": attr_constraints,
+    "sparse": args.sparse,
+    "compact": args.compact,
+    "cache_dir": args.cache_dir,
+    "cache_max_bytes": cache_max_bytes,
+    "cache_key": cache_key,
+    "encoder": cached_encoder,
+    "pricing_top_k": args.pricing_top_k,
+    "split_components": args.split_components,
+    "num_workers": args.num_workers,
+    "presolve": args.presolve,
+    "time_budget": args.time_budget,
+    "portfolio": args.portfolio,
+    "portfolio_scoring": args.portfolio_scoring,
+    "shared_memory": args.shared_memory,
+    "shared_memory_dir": args.shared_memory_dir,
+    "num_samples": args.num_samples,
+    "seed": args.seed,
     "assignments_output": args.output_folder + "/assignments.json",
     "alternates_output": args.output_folder + "/alternates.json",
+    "samples_output": args.output_folder + "/samples.npz",
     "logger": logger,
 }
 
@@ -0,0 +1,311 @@
+"""
+A persistent on-disk cache of encoded problems.
+
+Encoder matrices and ID indexes are stored as .npy files under a directory
+named after a fingerprint of the encoder inputs, so that later runs on the
+same inputs can memory-map them instead of parsing and encoding again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .encoder import Encoder
+
+META_FILE = "meta.json"
+DIGEST_CHUNK_SIZE = 4096  # list items fed to a digest at once
+SCALAR_TYPES = {str, int, float, bool, type(None)}
+
+
+def _is_nested(obj):
+    """Whether `obj` holds inputs whose repr does not identify them."""
+    if type(obj) is tuple:
+        # edges are tuples of IDs and scores, checked quickly
+        return not SCALAR_TYPES.issuperset(map(type, obj)) and any(
+            map(_is_nested, obj)
+        )
+    return type(obj) not in SCALAR_TYPES and (
+        isinstance(obj, (np.ndarray, dict, list)) or hasattr(obj, "to_numpy")
+    )
+
+
+def _update_digest(digest, obj):
+    """Feed a (possibly nested) encoder input into a hashlib digest."""
+    if isinstance(obj, np.ndarray):
+        digest.update(str((obj.dtype.str, obj.shape)).encode())
+        if obj.dtype.hasobject:
+            digest.update(repr(obj.tolist()).encode())
+        else:
+            digest.update(np.ascontiguousarray(obj).tobytes())
+    elif hasattr(obj, "columns"):
+        # pandas DataFrame
+        for column in obj.columns:
+            _update_digest(digest, obj[column].to_numpy())
+    elif hasattr(obj, "to_numpy"):
+        # pandas Series
+        _update_digest(digest, obj.to_numpy())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, obj[key])
+    elif isinstance(obj, tuple) and any(
+        isinstance(item, np.ndarray) for item in obj
+    ):
+        for item in obj:
+            _update_digest(digest, item)
+    elif isinstance(obj, list):
+        # edge lists are fed in chunks, instead of building a repr of the
+        # whole list
+        digest.update(b"[")
+        for start in range(0, len(obj), DIGEST_CHUNK_SIZE):
+            chunk = obj[start : start + DIGEST_CHUNK_SIZE]
+            if any(map(_is_nested, chunk)):
+                for item in chunk:
+                    _update_digest(digest, item)
+            else:
+                digest.update(repr(chunk).encode())
+    else:
+        digest.update(repr(obj).encode())
+    digest.update(b"|")
+
+
+def file_digest(path, block_size=1 << 20):
+    """Return the sha256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_handle:
+        for block in iter(lambda: file_handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(*parts):
+    """
+    Return a hex key identifying a set of encoder inputs. Parts can be IDs,
+    edge lists, numpy arrays, dicts of those, or digests of input files.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        _update_digest(digest, part)
+    return digest.hexdigest()
+
+
+class EncoderCache:
+    """
+    Stores encoded problems in `cache_dir`, one sub-directory per fingerprint.
+
+    Arguments:
+    - `cache_dir`:
+        the directory holding the cache entries. It is created if needed.
+
+    - `max_bytes`:
+        an int, the total size the cache may grow to. Least recently used
+        entries are evicted when a new entry makes the cache exceed it.
+        None means unbounded.
+    """
+
+    def __init__(
+        self, cache_dir, max_bytes=None, logger=logging.getLogger(__name__)
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, key):
+        meta_path = os.path.join(self._entry_dir(key), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as file_handle:
+            meta = json.load(file_handle)
+        # mark the entry as recently used
+        os.utime(meta_path)
+        return meta
+
+    def load_ids(self, key):
+        """Return the cached (reviewers, papers) for `key`, or None on a miss."""
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        return meta["reviewers"], meta["papers"]
+
+    def load(self, key, logger=None):
+        """
+        Return the cached Encoder for `key`, or None on a miss. Matrices are
+        memory-mapped copy-on-write, so solvers may modify them in memory
+        without touching the cache.
+        """
+        meta = self._read_meta(key)
+        if meta is None:
+            self.logger.debug("Encoder cache miss for {}".format(key))
+            return None
+
+        self.logger.debug("Encoder cache hit for {}".format(key))
+        entry_dir = self._entry_dir(key)
+        shape = tuple(meta["matrix_shape"])
+
+        def load_matrix(name):
+            if meta["sparse"]:
+                import scipy.sparse
+
+                return scipy.sparse.csr_matrix(
+                    tuple(
+                        np.load(
+                            os.path.join(
+                                entry_dir, "{}.{}.npy".format(name, part)
+                            ),
+                            mmap_mode="c",
+                        )
+                        for part in ("data", "indices", "indptr")
+                    ),
+                    shape=shape,
+                    copy=False,
+                )
+            return np.load(
+                os.path.join(entry_dir, "{}.npy".format(name)), mmap_mode="c"
+            )
+
+        encoder = Encoder.__new__(Encoder)
+        encoder.logger = logger or self.logger
+        encoder.sparse = meta["sparse"]
+        encoder.compact = meta.get("compact", False)
+        encoder.shared = None
+        encoder.shared_descriptors = {}
+        encoder.score_dtype = np.float32 if encoder.compact else float
+        encoder.constraint_dtype = np.int8 if encoder.compact else int
+        encoder.reviewers = meta["reviewers"]
+        encoder.papers = meta["papers"]
+        encoder.index_by_user = {r: i for i, r in enumerate(encoder.reviewers)}
+        encoder.user_by_index = {
+            v: k for k, v in encoder.index_by_user.items()
+        }
+        encoder.index_by_forum = {n: i for i, n in enumerate(encoder.papers)}
+        encoder.matrix_shape = shape
+        encoder.prob_limit_default = meta["prob_limit_default"]
+        encoder.perturbation = meta["perturbation"]
+        encoder.bad_match_thresholds = meta["bad_match_thresholds"]
+        encoder.attribute_constraints = meta["attribute_constraints"]
+        encoder.keep_score_matrices = meta.get("keep_score_matrices", True)
+        encoder.weight_by_type = meta.get("weight_by_type", {})
+        encoder.normalization_types = meta.get("normalization_types", [])
+        encoder.score_defaults = meta.get(
+            "score_defaults",
+            {score_type: 0 for score_type in meta["score_types"]},
+        )
+        encoder.score_matrices = {
+            score_type: load_matrix("score_{}".format(position))
+            for position, score_type in enumerate(meta["score_types"])
+        }
+        encoder.constraint_matrix = load_matrix("constraint_matrix")
+        encoder.prob_limit_matrix = load_matrix("prob_limit_matrix")
+        encoder.aggregate_score_matrix = load_matrix("aggregate_score_matrix")
+        encoder.cost_matrix = load_matrix("cost_matrix")
+        return encoder
+
+    def store(self, key, encoder):
+        """Persist `encoder` under `key`, then evict entries over the size bound."""
+        if os.path.exists(self._entry_dir(key)):
+            return
+
+        staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=self.cache_dir)
+        try:
+
+            def save_matrix(name, matrix):
+                if encoder.sparse:
+                    import scipy.sparse
+
+                    matrix = scipy.sparse.csr_matrix(matrix)
+                    for part in ("data", "indices", "indptr"):
+                        np.save(
+                            os.path.join(
+                                staging_dir, "{}.{}.npy".format(name, part)
+                            ),
+                            getattr(matrix, part),
+                        )
+                else:
+                    np.save(
+                        os.path.join(staging_dir, "{}.npy".format(name)),
+                        matrix,
+                    )
+
+            score_types = list(encoder.score_matrices)
+            for position, score_type in enumerate(score_types):
+                save_matrix(
+                    "score_{}".format(position),
+                    encoder.score_matrices[score_type],
+                )
+            save_matrix("constraint_matrix", encoder.constraint_matrix)
+            save_matrix("prob_limit_matrix", encoder.prob_limit_matrix)
+            save_matrix(
+                "aggregate_score_matrix", encoder.aggregate_score_matrix
+            )
+            save_matrix("cost_matrix", encoder.cost_matrix)
+
+            meta = {
+                "sparse": encoder.sparse,
+                "compact": encoder.compact,
+                "reviewers": list(encoder.reviewers),
+                "papers": list(encoder.papers),
+                "matrix_shape": list(encoder.matrix_shape),
+                "prob_limit_default": encoder.prob_limit_default,
+                "perturbation": encoder.perturbation,
+                "bad_match_thresholds": encoder.bad_match_thresholds,
+                "attribute_constraints": encoder.attribute_constraints,
+                "score_types": score_types,
+                "keep_score_matrices": encoder.keep_score_matrices,
+                "weight_by_type": encoder.weight_by_type,
+                "normalization_types": encoder.normalization_types,
+                "score_defaults": encoder.score_defaults,
+            }
+            # meta.json is written last: an entry without it is incomplete
+            with open(
+                os.path.join(staging_dir, META_FILE), "w"
+            ) as file_handle:
+                json.dump(meta, file_handle)
+
+            os.rename(staging_dir, self._entry_dir(key))
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            if not os.path.exists(self._entry_dir(key)):
+                raise
+
+        self.logger.debug("Stored encoder cache entry {}".format(key))
+        self.evict(keep=key)
+
+    def _entries(self):
+        """Return (last used time, size in bytes, key) for every complete entry."""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self._entry_dir(key), META_FILE)
+            if key.startswith(".") or not os.path.exists(meta_path):
+                continue
+            size = sum(
+                entry.stat().st_size
+                for entry in os.scandir(self._entry_dir(key))
+                if entry.is_file()
+            )
+            entries.append((os.path.getmtime(meta_path), size, key))
+        return entries
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        if self.max_bytes is None:
+            return
+
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.logger.debug("Evicting encoder cache entry {}".format(key))
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
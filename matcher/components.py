@@ -0,0 +1,399 @@
+"""
+Decomposition of a matching problem into connected components.
+
+Papers and reviewers are linked by the pairs that can be assigned: pairs
+without a conflict that have a known (non-zero) score, or a constraint of 1.
+Reviewers and papers in different components never share such a pair, so
+each component can be solved independently, in parallel, and the solutions
+stitched back together.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .solvers import SolverException
+from .solvers.core import issparse
+
+# how float status info of the solvers is combined over components, the
+# objectives of components adding up to that of the whole problem
+STATUS_INFO_COMBINERS = {
+    "objective": sum,
+    "makespan": min,
+    "makespan_gap": max,
+}
+
+
+def has_known_costs(encoder):
+    """
+    Return whether any pair of `encoder` has a non-zero cost. Solvers assign
+    problems without any at random, over every pair.
+    """
+    if encoder.sparse:
+        return encoder.cost_matrix.count_nonzero() > 0
+    return bool(np.any(encoder.cost_matrix))
+
+
+def assignable_pairs(encoder, allow_zero_score_assignments=False):
+    """
+    Return (paper indices, reviewer indices) of the pairs of `encoder` that
+    can be assigned.
+    """
+    if encoder.sparse:
+        cost = encoder.cost_matrix.tocsr()
+        constraint = encoder.constraint_matrix.tocsr()
+        known = (cost != 0).astype(np.int8)
+        allowed = known - known.multiply(constraint < 0)
+        allowed = (allowed + (constraint > 0).astype(np.int8)).tocoo()
+        keep = allowed.data != 0
+        return allowed.row[keep], allowed.col[keep]
+
+    num_papers, num_reviewers = encoder.matrix_shape
+    chunk_size = max(1, (1 << 20) // max(1, num_reviewers))
+    papers, reviewers = [], []
+    for start in range(0, num_papers, chunk_size):
+        rows = slice(start, start + chunk_size)
+        constraint = encoder.constraint_matrix[rows]
+        allowed = constraint == 0
+        if not allow_zero_score_assignments:
+            allowed &= encoder.cost_matrix[rows] != 0
+        allowed |= constraint == 1
+        block_papers, block_reviewers = np.nonzero(allowed)
+        papers.append(block_papers + start)
+        reviewers.append(block_reviewers)
+    return np.concatenate(papers), np.concatenate(reviewers)
+
+
+def connected_components(encoder, allow_zero_score_assignments=False):
+    """
+    Return a list of (paper indices, reviewer indices) arrays, one per
+    connected component of the assignable pairs of `encoder`, largest first.
+    Papers or reviewers without any assignable pair form components of
+    their own.
+    """
+    import scipy.sparse
+    from scipy.sparse.csgraph import connected_components as components
+
+    num_papers, num_reviewers = encoder.matrix_shape
+    papers, reviewers = assignable_pairs(encoder, allow_zero_score_assignments)
+    # papers are nodes 0..num_papers-1, reviewers follow
+    graph = scipy.sparse.coo_matrix(
+        (
+            np.ones(len(papers), dtype=np.int8),
+            (papers, reviewers + num_papers),
+        ),
+        shape=(num_papers + num_reviewers,) * 2,
+    )
+    _, labels = components(graph, directed=False)
+
+    paper_labels = labels[:num_papers]
+    reviewer_labels = labels[num_papers:]
+    sizes = np.bincount(labels)
+    return [
+        (
+            np.flatnonzero(paper_labels == label),
+            np.flatnonzero(reviewer_labels == label),
+        )
+        for label in np.argsort(-sizes, kind="stable")
+    ]
+
+
+def stitch(parts, shape, sparse=False):
+    """
+    Return a flow matrix of the given shape holding the solutions of
+    sub-problems. `parts` are (solution, paper indices, reviewer indices),
+    the indices mapping the rows and columns of each solution into the
+    matrix. The matrix is a scipy CSR matrix if `sparse`.
+    """
+    rows, cols, values = [], [], []
+    for solution, papers, reviewers in parts:
+        if issparse(solution):
+            solution = solution.tocoo()
+            row, col, value = solution.row, solution.col, solution.data
+        else:
+            solution = np.asarray(solution)
+            row, col = np.nonzero(solution)
+            value = solution[row, col]
+        rows.append(np.asarray(papers)[row])
+        cols.append(np.asarray(reviewers)[col])
+        values.append(value)
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    values = np.concatenate(values) if values else np.zeros(0)
+    if sparse:
+        import scipy.sparse
+
+        return scipy.sparse.csr_matrix((values, (rows, cols)), shape=shape)
+    flow_matrix = np.zeros(shape)
+    flow_matrix[rows, cols] = values
+    return flow_matrix
+
+
+def global_alternates(alternates_by_index, papers, reviewers):
+    """
+    Map a dict of paper index -> [reviewer indices] of a sub-problem to the
+    indices of the whole problem.
+    """
+    return {
+        int(papers[paper_index]): [
+            int(reviewers[reviewer_index])
+            for reviewer_index in reviewer_indices
+        ]
+        for paper_index, reviewer_indices in alternates_by_index.items()
+    }
+
+
+def _solve_component(
+    solver_class,
+    minimums,
+    maximums,
+    demands,
+    encoder,
+    num_alternates,
+    solver_kwargs,
+    subset=None,
+):
+    """
+    Solve one component, in a worker process. Returns a dict with the
+    solution and what the Matcher reads from a solved solver.
+
+    `subset` is None if `encoder` is the component's, or the component's
+    (paper indices, reviewer indices) in a shared `encoder`.
+    """
+    if subset is not None:
+        encoder = encoder.subset(*subset)
+    solver = solver_class(
+        minimums, maximums, demands, encoder, **solver_kwargs
+    )
+    result = {"solution": solver.solve(), "solved": solver.solved}
+    if not solver.solved:
+        return result
+
+    if hasattr(solver, "get_alternates"):
+        result["alternates"] = solver.get_alternates(num_alternates)
+    if hasattr(solver, "get_fraction_of_opt"):
+        result["fraction_of_opt"] = solver.get_fraction_of_opt()
+        # the optimal cost the fraction is relative to, to weigh components
+        result["opt_cost"] = getattr(
+            solver,
+            "opt_cost",
+            getattr(solver, "deterministic_assignment_cost", None),
+        )
+    if hasattr(solver, "get_additional_status_info"):
+        result["status_info"] = solver.get_additional_status_info()
+    return result
+
+
+class ComponentSolver:
+    """
+    Solves each connected component of a problem with `solver_class` and
+    stitches the solutions back into the indices of the whole problem. It
+    has the interface of the solvers it wraps, so the Matcher can use it in
+    their place.
+
+    Arguments are those of `solver_class`, plus:
+    - `components`:
+        a list of (paper indices, reviewer indices), as returned by
+        `connected_components`.
+
+    - `num_alternates`:
+        the number of alternates that solvers with `get_alternates` pick in
+        each component.
+
+    - `max_workers`:
+        the number of processes solving components. None uses one per CPU, 1
+        solves the components one after the other in this process.
+    """
+
+    def __init__(
+        self,
+        solver_class,
+        components,
+        minimums,
+        maximums,
+        demands,
+        encoder,
+        num_alternates=0,
+        max_workers=None,
+        logger=logging.getLogger(__name__),
+        **solver_kwargs,
+    ):
+        self.solver_class = solver_class
+        self.minimums = np.asarray(minimums)
+        self.maximums = np.asarray(maximums)
+        self.demands = np.asarray(demands)
+        self.encoder = encoder
+        self.num_alternates = num_alternates
+        self.max_workers = max_workers
+        self.logger = logger
+        self.solver_kwargs = dict(solver_kwargs, logger=logger)
+        if getattr(solver_class, "is_portfolio", False):
+            # a portfolio has its members pick alternates as they solve
+            self.solver_kwargs["num_alternates"] = num_alternates
+
+        # reviewers without papers get no assignments and need no solver
+        self.components = [
+            (papers, reviewers)
+            for papers, reviewers in components
+            if len(papers) > 0
+        ]
+        self.solved = False
+        self.flow_matrix = None
+        self.results = []
+        if hasattr(solver_class, "get_alternates"):
+            self.get_alternates = self._get_alternates
+        if hasattr(solver_class, "get_fraction_of_opt"):
+            self.get_fraction_of_opt = self._get_fraction_of_opt
+
+    def _validate_input_range(self):
+        """Check that every component's demand is within its review supply"""
+        for position, (papers, reviewers) in enumerate(self.components):
+            demand = self.demands[papers].sum()
+            min_supply = self.minimums[reviewers].sum()
+            max_supply = self.maximums[reviewers].sum()
+            if demand > max_supply or demand < min_supply:
+                raise SolverException(
+                    "Review demand ({}) of component {} ({} papers, {} reviewers) "
+                    "must be between its min review supply ({}) and max review "
+                    "supply ({}).".format(
+                        demand,
+                        position,
+                        len(papers),
+                        len(reviewers),
+                        min_supply,
+                        max_supply,
+                    )
+                )
+
+    def _component_args(self, papers, reviewers, in_worker=False):
+        if in_worker and self.encoder.shared_descriptors:
+            # workers attach to the shared matrices and take their subset
+            encoder = self.encoder
+            subset = (papers, reviewers)
+        else:
+            encoder = self.encoder.subset(papers, reviewers)
+            subset = None
+        return (
+            self.solver_class,
+            self.minimums[reviewers].tolist(),
+            self.maximums[reviewers].tolist(),
+            self.demands[papers].tolist(),
+            encoder,
+            self.num_alternates,
+            self.solver_kwargs,
+            subset,
+        )
+
+    def solve(self):
+        """Solve every component and return the stitched flow matrix"""
+        self._validate_input_range()
+        self.logger.debug(
+            "Solving {} components, the largest with {} papers".format(
+                len(self.components),
+                max((len(papers) for papers, _ in self.components), default=0),
+            )
+        )
+
+        # components without reviewers have no demand: nothing to solve
+        solvable = [
+            (papers, reviewers)
+            for papers, reviewers in self.components
+            if len(reviewers) > 0
+        ]
+        if self.max_workers == 1 or len(solvable) <= 1:
+            self.results = [
+                _solve_component(*self._component_args(papers, reviewers))
+                for papers, reviewers in solvable
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(
+                        _solve_component,
+                        *self._component_args(
+                            papers, reviewers, in_worker=True
+                        ),
+                    )
+                    for papers, reviewers in solvable
+                ]
+                self.results = [future.result() for future in futures]
+
+        self.solved = all(result["solved"] for result in self.results)
+        # a portfolio has these methods once its winner is known to have them
+        if self.results and all(
+            "alternates" in result for result in self.results
+        ):
+            self.get_alternates = self._get_alternates
+        if self.results and all(
+            "fraction_of_opt" in result for result in self.results
+        ):
+            self.get_fraction_of_opt = self._get_fraction_of_opt
+        self.flow_matrix = stitch(
+            [
+                (result["solution"], papers, reviewers)
+                for result, (papers, reviewers) in zip(self.results, solvable)
+            ],
+            self.encoder.matrix_shape,
+            self.encoder.sparse,
+        )
+        self.components = solvable
+        return self.flow_matrix
+
+    def _get_alternates(self, num_alternates):
+        """
+        Alternates picked in each component, keyed on global paper indices.
+        They were picked with the `num_alternates` given to the constructor.
+        """
+        alternates_by_index = {
+            paper_index: [] for paper_index in range(len(self.encoder.papers))
+        }
+        for result, (papers, reviewers) in zip(self.results, self.components):
+            alternates_by_index.update(
+                global_alternates(result["alternates"], papers, reviewers)
+            )
+        return alternates_by_index
+
+    def _get_fraction_of_opt(self):
+        """The components' fractions of the optimum, weighted by their optimal costs"""
+        fractions = [result["fraction_of_opt"] for result in self.results]
+        weights = [result["opt_cost"] for result in self.results]
+        if None in weights or sum(weights) == 0:
+            return float(np.mean(fractions)) if fractions else 1
+        return sum(
+            fraction * weight for fraction, weight in zip(fractions, weights)
+        ) / sum(weights)
+
+    def get_additional_status_info(self):
+        """
+        The number of components, and the solvers' status info combined over
+        them: objectives and counts are summed, the makespan is the smallest
+        and its gap the largest, and the time budget was exhausted if it was
+        in any component. Other info, or info some component lacks, is left out.
+        """
+        values_by_key = {}
+        for result in self.results:
+            for key, value in result.get("status_info", {}).items():
+                values_by_key.setdefault(key, []).append(value)
+
+        status_info = {}
+        for key, values in values_by_key.items():
+            if len(values) < len(self.results):
+                continue
+            if key == "time_budget_exhausted":
+                status_info[key] = str(
+                    any(value == "True" for value in values)
+                )
+                continue
+            combine = STATUS_INFO_COMBINERS.get(key)
+            try:
+                if combine is None:
+                    total = sum(int(value) for value in values)
+                else:
+                    total = combine(float(value) for value in values)
+            except ValueError:
+                continue
+            status_info[key] = str(total)
+        status_info["components"] = str(len(self.components))
+        return status_info
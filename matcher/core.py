@@ -3,26 +3,55 @@ import logging
 import threading
 import time
 import json
+import numpy as np
+from collections.abc import Mapping
 from enum import Enum
-from .solvers import (
-    SolverException,
-    MinMaxSolver,
-    FairFlow,
-    RandomizedSolver,
-    FairSequence,
-    FairIR,
-    PerturbedMaximizationSolver
-)
+from . import solvers
+from .solvers import SolverException
 from .encoder import Encoder
+from .cache import EncoderCache, fingerprint
+from .components import (
+    ComponentSolver,
+    connected_components,
+    has_known_costs,
+)
+from .presolve import Presolve
+
+
+class SolverRegistry(Mapping):
+    """
+    Maps solver names to solver classes. A solver's module (and its
+    dependencies, e.g. gurobipy for FairIR) is only imported when the solver
+    is looked up.
+    """
+
+    def __init__(self, class_names):
+        self.class_names = class_names
+
+    def __getitem__(self, name):
+        return getattr(solvers, self.class_names[name])
+
+    def __contains__(self, name):
+        return name in self.class_names
+
+    def __iter__(self):
+        return iter(self.class_names)
+
+    def __len__(self):
+        return len(self.class_names)
 
-SOLVER_MAP = {
-    "MinMax": MinMaxSolver,
-    "FairFlow": FairFlow,
-    "Randomized": RandomizedSolver,
-    "FairSequence": FairSequence,
-    "FairIR": FairIR,
-    "PerturbedMaximization": PerturbedMaximizationSolver
-}
+
+SOLVER_MAP = SolverRegistry(
+    {
+        "MinMax": "MinMaxSolver",
+        "FairFlow": "FairFlow",
+        "Randomized": "RandomizedSolver",
+        "FairSequence": "FairSequence",
+        "FairIR": "FairIR",
+        "PerturbedMaximization": "PerturbedMaximizationSolver",
+        "Portfolio": "Portfolio",
+    }
+)
 
 
 class MatcherStatus(Enum):
@@ -62,8 +91,27 @@ class KeywordDatasource:
         bad_match_thresholds=[],
         allow_zero_score_assignments=False,
         attribute_constraints=None,
+        sparse=False,
+        compact=False,
+        keep_score_matrices=False,
+        cache_dir=None,
+        cache_max_bytes=None,
+        cache_key=None,
+        encoder=None,
+        pricing_top_k=None,
+        split_components=False,
+        num_workers=None,
+        presolve=False,
+        time_budget=None,
+        portfolio=None,
+        portfolio_scoring="affinity",
+        shared_memory=False,
+        shared_memory_dir=None,
+        num_samples=1,
+        seed=None,
         assignments_output="assignments.json",
         alternates_output="alternates.json",
+        samples_output="samples.npz",
         logger=logging.getLogger(__name__),
     ):
 
@@ -82,8 +130,27 @@ class KeywordDatasource:
         self.normalization_types = []
         self.perturbation = perturbation
         self.bad_match_thresholds = bad_match_thresholds
+        self.sparse = sparse
+        self.compact = compact
+        self.keep_score_matrices = keep_score_matrices
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_key = cache_key
+        self.encoder = encoder
+        self.pricing_top_k = pricing_top_k
+        self.split_components = split_components
+        self.num_workers = num_workers
+        self.presolve = presolve
+        self.time_budget = time_budget
+        self.portfolio = portfolio
+        self.portfolio_scoring = portfolio_scoring
+        self.shared_memory = shared_memory
+        self.shared_memory_dir = shared_memory_dir
+        self.num_samples = num_samples
+        self.seed = seed
         self.assignments_output = assignments_output
         self.alternates_output = alternates_output
+        self.samples_output = samples_output
         self.logger = logger
 
     def set_assignments(self, assignments):
@@ -96,6 +163,23 @@ class KeywordDatasource:
         with open(self.alternates_output, "w") as f:
             f.write(json.dumps(alternates, indent=2))
 
+    def set_samples(self, samples, papers, reviewers):
+        """
+        Write Samples as a compressed .npz of the paper and reviewer IDs, the
+        edges (paper and reviewer indices), the sampled assignment of each
+        edge in each sample, and each edge's empirical marginal probability.
+        """
+        self.logger.info("Writing samples to file")
+        np.savez_compressed(
+            self.samples_output,
+            paper_ids=np.array(papers),
+            reviewer_ids=np.array(reviewers),
+            papers=samples.papers.astype(np.int32),
+            reviewers=samples.reviewers.astype(np.int32),
+            assignments=samples.assignments,
+            marginals=samples.assignments.mean(axis=0),
+        )
+
     def set_status(self, status, message, additional_status_info={}):
         self.logger.info(
             "status={0}, message={1}, additional_status_info={2}".format(
@@ -122,6 +206,7 @@ class Matcher:
 
         self.logger = logger
         self.solution = None
+        self.samples = None
         self.assignments = None
         self.alternates = None
         self.status = "Initialized"
@@ -129,7 +214,9 @@ class Matcher:
         self.solver_class = self.__set_solver_class(solver_class)
 
     def __set_solver_class(self, solver_class):
-        return SOLVER_MAP.get(solver_class, MinMaxSolver)
+        if solver_class not in SOLVER_MAP:
+            solver_class = "MinMax"
+        return SOLVER_MAP[solver_class]
 
     def set_status(self, status, message=None, additional_status_info={}):
         self.status = status.value
@@ -150,6 +237,109 @@ class Matcher:
         self.alternates = alternates
         self.datasource.set_alternates(alternates)
 
+    def _encode(self):
+        """
+        Build the Encoder for the datasource, unless it already gives one as
+        `encoder`. When the datasource has a `cache_dir`, the encoding is
+        loaded from (or stored in) an EncoderCache keyed by `cache_key`, or by
+        a fingerprint of the inputs.
+        """
+        encoder = getattr(self.datasource, "encoder", None)
+        if encoder is not None:
+            return encoder
+
+        encoder_kwargs = dict(
+            reviewers=self.datasource.reviewers,
+            papers=self.datasource.papers,
+            constraints=self.datasource.constraints,
+            scores_by_type=self.datasource.scores_by_type,
+            weight_by_type=self.datasource.weight_by_type,
+            normalization_types=self.datasource.normalization_types,
+            probability_limits=self.datasource.probability_limits,
+            attribute_constraints=self.datasource.attribute_constraints,
+            perturbation=self.datasource.perturbation,
+            bad_match_thresholds=self.datasource.bad_match_thresholds,
+            sparse=getattr(self.datasource, "sparse", False),
+            compact=getattr(self.datasource, "compact", False),
+            keep_score_matrices=getattr(
+                self.datasource, "keep_score_matrices", False
+            ),
+        )
+
+        cache_dir = getattr(self.datasource, "cache_dir", None)
+        if not cache_dir:
+            return Encoder(logger=self.logger, **encoder_kwargs)
+
+        cache = EncoderCache(
+            cache_dir,
+            max_bytes=getattr(self.datasource, "cache_max_bytes", None),
+            logger=self.logger,
+        )
+        cache_key = getattr(
+            self.datasource, "cache_key", None
+        ) or fingerprint(encoder_kwargs)
+
+        encoder = cache.load(cache_key, logger=self.logger)
+        if encoder is None:
+            encoder = Encoder(logger=self.logger, **encoder_kwargs)
+            cache.store(cache_key, encoder)
+        return encoder
+
+    def _presolve(self, encoder):
+        """
+        Return the Presolve of the problem if the datasource asks for it and
+        it leaves a problem to solve, else None.
+        """
+        if not getattr(self.datasource, "presolve", False):
+            return None
+
+        if encoder.attribute_constraints:
+            self.logger.warning(
+                "Attribute constraints count forced pairs, skipping presolve"
+            )
+            return None
+
+        presolve = Presolve(
+            encoder,
+            self.datasource.minimums,
+            self.datasource.maximums,
+            self.datasource.demands,
+            allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
+            logger=self.logger,
+        )
+        if presolve.is_empty:
+            self.logger.info(
+                "Forced pairs meet every demand, solving the whole problem"
+            )
+            return None
+        return presolve
+
+    def _components(self, encoder):
+        """
+        Return the connected components of the problem if the datasource asks
+        to solve them separately and there are several to solve, else None.
+        """
+        if not getattr(self.datasource, "split_components", False):
+            return None
+
+        if encoder.attribute_constraints:
+            self.logger.warning(
+                "Attribute constraints span components, solving the whole problem"
+            )
+            return None
+        if not has_known_costs(encoder):
+            # solvers assign all-zero costs at random, over every pair
+            return None
+
+        components = connected_components(
+            encoder, self.datasource.allow_zero_score_assignments
+        )
+        num_with_papers = sum(1 for papers, _ in components if len(papers))
+        self.logger.info(
+            "Found {} connected components with papers".format(num_with_papers)
+        )
+        return components if num_with_papers > 1 else None
+
     def run(self):
         """
         Compute a match of reviewers to papers and post it to the as assignment notes.
@@ -160,37 +350,142 @@ class Matcher:
 
             self.logger.debug("Start encoding")
 
-            encoder = Encoder(
-                reviewers=self.datasource.reviewers,
-                papers=self.datasource.papers,
-                constraints=self.datasource.constraints,
-                scores_by_type=self.datasource.scores_by_type,
-                weight_by_type=self.datasource.weight_by_type,
-                normalization_types=self.datasource.normalization_types,
-                probability_limits=self.datasource.probability_limits,
-                attribute_constraints=self.datasource.attribute_constraints,
-                perturbation=self.datasource.perturbation,
-                bad_match_thresholds=self.datasource.bad_match_thresholds,
-                logger=self.logger,
-            )
+            encoder = self._encode()
+
+            if encoder.sparse and (
+                self.datasource.allow_zero_score_assignments
+                or not getattr(self.solver_class, "supports_sparse", False)
+            ):
+                self.logger.debug(
+                    "Solver requires dense input, densifying encoder"
+                )
+                encoder.densify()
 
             self.logger.debug("Preparing solver")
 
-            # solver
-            solver = self.solver_class(
-                self.datasource.minimums,
-                self.datasource.maximums,
-                self.datasource.demands,
-                encoder,
-                allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
-                logger=self.logger,
-            )
+            solver_kwargs = {}
+            pricing_top_k = getattr(self.datasource, "pricing_top_k", None)
+            if pricing_top_k is not None:
+                if getattr(self.solver_class, "supports_pricing", False):
+                    solver_kwargs["pricing_top_k"] = pricing_top_k
+                else:
+                    self.logger.warning(
+                        "Solver does not support pricing, ignoring pricing_top_k"
+                    )
+            time_budget = getattr(self.datasource, "time_budget", None)
+            if time_budget is not None:
+                if getattr(self.solver_class, "supports_time_budget", False):
+                    solver_kwargs["time_budget"] = time_budget
+                else:
+                    self.logger.warning(
+                        "Solver does not support a time budget, ignoring time_budget"
+                    )
+            if getattr(self.solver_class, "is_portfolio", False):
+                portfolio = getattr(self.datasource, "portfolio", None)
+                if portfolio:
+                    unknown = [
+                        name for name in portfolio if name not in SOLVER_MAP
+                    ]
+                    if unknown:
+                        raise SolverException(
+                            "Unknown solvers in the portfolio: {}".format(
+                                unknown
+                            )
+                        )
+                    solver_kwargs["solvers"] = {
+                        name: SOLVER_MAP[name] for name in portfolio
+                    }
+                solver_kwargs["scoring"] = getattr(
+                    self.datasource, "portfolio_scoring", "affinity"
+                )
+
+            # the problem the solver runs on, reduced if presolved
+            presolve = self._presolve(encoder)
+            if presolve is not None:
+                problem = (
+                    presolve.minimums,
+                    presolve.maximums,
+                    presolve.demands,
+                    presolve.encoder,
+                )
+            else:
+                problem = (
+                    self.datasource.minimums,
+                    self.datasource.maximums,
+                    self.datasource.demands,
+                    encoder,
+                )
+
+            components = self._components(problem[-1])
+
+            num_samples = getattr(self.datasource, "num_samples", 1)
+            if num_samples > 1:
+                if not getattr(self.solver_class, "supports_sampling", False):
+                    self.logger.warning(
+                        "Solver does not support sampling, ignoring num_samples"
+                    )
+                elif presolve is not None or components is not None:
+                    self.logger.warning(
+                        "Samples cannot be merged after presolve or split components, ignoring num_samples"
+                    )
+                else:
+                    solver_kwargs["num_samples"] = num_samples
+                    solver_kwargs["max_workers"] = getattr(
+                        self.datasource, "num_workers", None
+                    )
+            seed = getattr(self.datasource, "seed", None)
+            if seed is not None:
+                if not getattr(self.solver_class, "supports_sampling", False):
+                    self.logger.warning(
+                        "Solver does not support sampling, ignoring seed"
+                    )
+                else:
+                    solver_kwargs["seed"] = seed
+            # with components, ComponentSolver passes on its num_alternates
+            if components is None and getattr(
+                self.solver_class, "is_portfolio", False
+            ):
+                solver_kwargs[
+                    "num_alternates"
+                ] = self.datasource.num_alternates
+            if components is not None:
+                solver = ComponentSolver(
+                    self.solver_class,
+                    components,
+                    *problem,
+                    num_alternates=self.datasource.num_alternates,
+                    max_workers=getattr(self.datasource, "num_workers", None),
+                    allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
+                    logger=self.logger,
+                    **solver_kwargs,
+                )
+            else:
+                # solver
+                solver = self.solver_class(
+                    *problem,
+                    allow_zero_score_assignments=self.datasource.allow_zero_score_assignments,
+                    logger=self.logger,
+                    **solver_kwargs,
+                )
 
             solution = None
             start_time = time.time()
 
             self.logger.debug("Solving solver")
-            solution = solver.solve()
+            # worker processes attach to the shared matrices instead of
+            # receiving a copy of them
+            shared_memory_dir = getattr(
+                self.datasource, "shared_memory_dir", None
+            )
+            if (
+                getattr(self.datasource, "shared_memory", False)
+                or shared_memory_dir
+            ):
+                problem[-1].share(shared_memory_dir)
+            try:
+                solution = solver.solve()
+            finally:
+                problem[-1].unshare()
 
             self.logger.debug(
                 "Complete solver run took {} seconds".format(
@@ -199,15 +494,25 @@ class Matcher:
             )
 
             if solver.solved:
+                if presolve is not None:
+                    solution = presolve.restore(solution)
                 self.solution = solution
                 self.set_assignments(encoder.decode_assignments(solution))
+                if "num_samples" in solver_kwargs:
+                    self.samples = solver.get_samples()
+                    self.datasource.set_samples(
+                        self.samples, encoder.papers, encoder.reviewers
+                    )
                 if hasattr(solver, "get_alternates"):
-                    self.set_alternates(
-                        encoder.decode_selected_alternates(
-                            solver.get_alternates(
-                                self.datasource.num_alternates
-                            )
+                    alternates_by_index = solver.get_alternates(
+                        self.datasource.num_alternates
+                    )
+                    if presolve is not None:
+                        alternates_by_index = presolve.restore_alternates(
+                            alternates_by_index
                         )
+                    self.set_alternates(
+                        encoder.decode_selected_alternates(alternates_by_index)
                     )
                 else:
                     self.set_alternates(
@@ -220,6 +525,14 @@ class Matcher:
                     additional_status_info["randomized_fraction_of_opt"] = str(
                         solver.get_fraction_of_opt()
                     )
+                if hasattr(solver, "get_additional_status_info"):
+                    additional_status_info.update(
+                        solver.get_additional_status_info()
+                    )
+                if presolve is not None:
+                    additional_status_info.update(
+                        presolve.get_additional_status_info()
+                    )
                 self.set_status(
                     MatcherStatus.COMPLETE,
                     message="",
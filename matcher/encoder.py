@@ -5,9 +5,28 @@ Responsible for:
 """
 
 from collections import defaultdict, namedtuple
+from operator import itemgetter
 import numpy as np
 import json
 import logging
+import warnings
+
+from .solvers.core import issparse
+
+
+SHARED_MATRICES = (
+    "constraint_matrix",
+    "prob_limit_matrix",
+    "aggregate_score_matrix",
+    "cost_matrix",
+)
+"""The matrices, besides the score matrices, that `Encoder.share` shares."""
+
+IndexedEdges = namedtuple("IndexedEdges", ["rows", "cols", "values"])
+"""
+Edges whose papers and reviewers are given as row and column indices of the
+encoded matrices instead of IDs, e.g. as produced by `matcher.ingest`.
+"""
 
 
 def _score_to_cost(score, scaling_factor=100):
@@ -19,6 +38,56 @@ def _score_to_cost(score, scaling_factor=100):
     return score * -scaling_factor
 
 
+def _edge_columns(edges):
+    """
+    Return (paper IDs, reviewer IDs, values) columns if `edges` is columnar,
+    i.e. a tuple of three equal-length numpy arrays or a pandas DataFrame whose
+    first three columns hold the paper IDs, reviewer IDs and values.
+    Return None for any other collection of edges.
+    """
+    if hasattr(edges, "iloc"):
+        return tuple(edges.iloc[:, column] for column in range(3))
+
+    if (
+        isinstance(edges, tuple)
+        and len(edges) == 3
+        and all(isinstance(column, np.ndarray) for column in edges)
+    ):
+        return edges
+
+    return None
+
+
+def _last_occurrences(rows, cols, shape):
+    """
+    Return the positions of the last occurrence of every (row, col)
+    coordinate, so that later duplicates overwrite earlier ones.
+    """
+    flat = rows * shape[1] + cols
+    _, last_reversed = np.unique(flat[::-1], return_index=True)
+    return len(flat) - 1 - last_reversed
+
+
+def _add_weighted(target, scores, weight, indicator=False, chunk_cells=1 << 20):
+    """
+    Add `weight * scores` (or `weight * (scores != 0)` if `indicator`) to
+    `target` and return it. Dense targets are updated in place, a chunk of
+    rows at a time, so temporaries stay small.
+    """
+    if issparse(target):
+        if indicator:
+            scores = scores != 0
+        return target + scores * weight
+
+    row_size = target.shape[1] if target.ndim == 2 else 1
+    chunk_size = max(1, chunk_cells // max(1, row_size))
+    for start in range(0, len(target), chunk_size):
+        rows = slice(start, start + chunk_size)
+        chunk = scores[rows] != 0 if indicator else scores[rows]
+        target[rows] += chunk * weight
+    return target
+
+
 class EncoderError(Exception):
     """Exception wrapper class for errors related to Encoder"""
 
@@ -64,6 +133,23 @@ class Encoder:
      - `bad_match_thresholds`:
          a list of floats, representing the thresholds in affinity score for 
          categorizing a paper-reviewer match, used by the Perturbed Maximization Solver.
+
+     - `sparse`:
+         a bool. If True, scores, constraints and probability limits are stored
+         as scipy CSR matrices holding only the encoded edges, so memory grows
+         with the number of edges instead of #papers x #reviewers. Every score
+         type must then have a default of 0. Solvers that need dense input can
+         call `densify()`.
+
+     - `compact`:
+         a bool. If True, scores, aggregate scores and costs are stored as
+         float32 and constraints as int8, instead of float64 and int64.
+         Probability limits keep float64 precision.
+
+     - `keep_score_matrices`:
+         a bool. If False, each score type is discarded once it has been added
+         to the aggregate scores, so `score_matrices` stays empty and
+         `apply_delta` can only update constraints.
     """
 
     def __init__(
@@ -78,9 +164,18 @@ class Encoder:
         attribute_constraints=None,
         perturbation=0.0,
         bad_match_thresholds=[],
+        sparse=False,
+        compact=False,
+        keep_score_matrices=True,
         logger=logging.getLogger(__name__),
     ):
         self.logger = logger
+        self.sparse = sparse
+        self.compact = compact
+        self.shared = None
+        self.shared_descriptors = {}
+        self.score_dtype = np.float32 if compact else float
+        self.constraint_dtype = np.int8 if compact else int
 
         if len(reviewers) == 0:
             raise EncoderError("Reviewers List can not be empty.")
@@ -99,23 +194,16 @@ class Encoder:
         self.logger.info("Use normalization={}".format(normalization_types))
 
         self.matrix_shape = (len(self.papers), len(self.reviewers))
+        self.prob_limit_default = 1.0
 
-        self.logger.debug("Init score matrices")
-        self.score_matrices = {
-            score_type: self._encode_scores(scores)
+        # kept so that apply_delta can recompute aggregate scores
+        self.weight_by_type = dict(weight_by_type)
+        self.normalization_types = list(normalization_types)
+        self.score_defaults = {
+            score_type: scores.get("default", 0)
             for score_type, scores in scores_by_type.items()
         }
 
-        with_normalization_matrices = {}
-        without_normalization_matrices = {}
-
-        self.logger.debug("Init normalization matricies")
-        for score_type, scores in self.score_matrices.items():
-            if score_type in normalization_types:
-                with_normalization_matrices[score_type] = scores
-            else:
-                without_normalization_matrices[score_type] = scores
-
         self.logger.debug("Init conflicts")
         self.constraint_matrix = self._encode_constraints(constraints)
         self.prob_limit_matrix = self._encode_probability_limits(
@@ -151,59 +239,42 @@ class Encoder:
                 })
         self.attribute_constraints = constraints_list
 
-        # don't use numpy.sum() here. it will collapse the matrices into a single value.
-        self.aggregate_score_matrix = np.full(
-            self.matrix_shape, 0, dtype=float
+        self.logger.debug("Init score matrices")
+        self.keep_score_matrices = keep_score_matrices
+        self.score_matrices = {}
+
+        def encoded_scores():
+            for score_type, scores in scores_by_type.items():
+                score_matrix = self._encode_scores(scores)
+                if keep_score_matrices:
+                    self.score_matrices[score_type] = score_matrix
+                yield score_type, score_matrix
+
+        # each score type is folded into the aggregate as soon as it is encoded
+        self.aggregate_score_matrix = self._aggregate_scores(
+            encoded_scores(), self.matrix_shape, sparse=self.sparse
         )
-
-        if without_normalization_matrices:
-            self.aggregate_score_matrix = sum(
-                [
-                    scores * weight_by_type[score_type]
-                    for score_type, scores in without_normalization_matrices.items()
-                ]
-            )
-
-        if with_normalization_matrices:
-            self.aggregate_score_matrix += self._normalize(
-                weight_by_type, with_normalization_matrices
-            )
-
         self.cost_matrix = _score_to_cost(self.aggregate_score_matrix)
 
-    def _normalize(self, weight_by_type, with_normalization_matrices):
-
-        indicator = {
-            score_type: scores != 0.0
-            for score_type, scores in with_normalization_matrices.items()
-        }
-        sum_of_weights = sum(
-            [
-                indicator * weight_by_type[score_type]
-                for score_type, indicator in indicator.items()
-            ]
-        )
-        normalizer = np.where(sum_of_weights == 0, 0, 1 / sum_of_weights)
-
-        return normalizer * sum(
-            [
-                scores * weight_by_type[score_type]
-                for score_type, scores in with_normalization_matrices.items()
-            ]
-        )
-
     def _encode_scores(self, scores):
         """return a matrix containing unweighted scores."""
         default = scores.get("default", 0)
         edges = scores.get("edges", [])
-        score_matrix = np.full(self.matrix_shape, default, dtype=float)
 
-        for forum, user, score in edges:
-            coordinates = (
-                self.index_by_forum[forum],
-                self.index_by_user[user],
-            )
-            score_matrix[coordinates] = score
+        if self.sparse:
+            if default != 0:
+                raise EncoderError(
+                    "Sparse encoding requires a default score of 0, got {}".format(
+                        default
+                    )
+                )
+            return self._encode_sparse(edges, dtype=self.score_dtype)
+
+        score_matrix = np.full(self.matrix_shape, default, dtype=self.score_dtype)
+        rows, cols, values = self._edge_coordinates(
+            edges, dtype=self.score_dtype
+        )
+        score_matrix[rows, cols] = values
 
         return score_matrix
 
@@ -211,13 +282,16 @@ class Encoder:
         """
         return a matrix containing constraint values. label should have no bearing on the outcome.
         """
-        constraint_matrix = np.full(self.matrix_shape, 0, dtype=int)
-        for forum, user, constraint in constraints:
-            coordinates = (
-                self.index_by_forum[forum],
-                self.index_by_user[user],
-            )
-            constraint_matrix[coordinates] = constraint
+        if self.sparse:
+            return self._encode_sparse(constraints, dtype=self.constraint_dtype)
+
+        constraint_matrix = np.full(
+            self.matrix_shape, 0, dtype=self.constraint_dtype
+        )
+        rows, cols, values = self._edge_coordinates(
+            constraints, dtype=self.constraint_dtype
+        )
+        constraint_matrix[rows, cols] = values
 
         return constraint_matrix
 
@@ -225,7 +299,17 @@ class Encoder:
         """
         return a matrix containing probability limits
         """
+        if self.sparse:
+            # explicit limits are stored; every other pair uses prob_limit_default
+            if isinstance(probability_limits, float):
+                self.prob_limit_default = probability_limits
+                probability_limits = []
+            return self._encode_sparse(
+                probability_limits, dtype=float, eliminate_zeros=False
+            )
+
         if isinstance(probability_limits, float):
+            self.prob_limit_default = probability_limits
             prob_limit_matrix = np.full(
                 self.matrix_shape, probability_limits, dtype=float
             )
@@ -233,14 +317,481 @@ class Encoder:
             prob_limit_matrix = np.full(
                 self.matrix_shape, 1, dtype=float
             )  # default to no limit
-            for forum, user, limit in probability_limits:
-                coordinates = (
-                    self.index_by_forum[forum],
-                    self.index_by_user[user],
-                )
-                prob_limit_matrix[coordinates] = limit
+            rows, cols, values = self._edge_coordinates(
+                probability_limits, dtype=float
+            )
+            prob_limit_matrix[rows, cols] = values
         return prob_limit_matrix
 
+    def _indices(self, ids, index_by_id):
+        """
+        Map a column of IDs to matrix indices in one pass. Dictionary-encoded
+        columns (pandas categoricals) only look up each category once.
+        Unknown IDs raise a KeyError.
+        """
+        if hasattr(ids, "cat"):
+            category_indices = self._indices(ids.cat.categories, index_by_id)
+            return category_indices[ids.cat.codes.to_numpy()]
+
+        if isinstance(ids, np.ndarray) or hasattr(ids, "to_numpy"):
+            ids = np.asarray(ids).tolist()
+
+        return np.fromiter(
+            map(index_by_id.__getitem__, ids), dtype=np.int64, count=len(ids)
+        )
+
+    def _edge_coordinates(self, edges, dtype):
+        """
+        return (row indices, column indices, values) arrays for a collection of
+        edges, keeping only the last value of duplicated (paper, reviewer) pairs.
+
+        `edges` may be a list of (<paper_ID>, <reviewer_ID>, <value>) triples,
+        a tuple of three equal-length numpy arrays, a pandas DataFrame whose
+        first three columns hold the paper IDs, reviewer IDs and values, or
+        IndexedEdges holding matrix indices instead of IDs.
+        """
+        if isinstance(edges, IndexedEdges):
+            rows = np.asarray(edges.rows, dtype=np.int64)
+            cols = np.asarray(edges.cols, dtype=np.int64)
+            values = np.asarray(edges.values, dtype=dtype)
+            keep = _last_occurrences(rows, cols, self.matrix_shape)
+            return rows[keep], cols[keep], values[keep]
+
+        columns = _edge_columns(edges)
+
+        if columns is None:
+            if not isinstance(edges, (list, tuple)):
+                edges = list(edges)
+            columns = (
+                list(map(itemgetter(position), edges)) for position in range(3)
+            )
+
+        forums, users, values = columns
+        rows = self._indices(forums, self.index_by_forum)
+        cols = self._indices(users, self.index_by_user)
+        values = np.asarray(values, dtype=dtype)
+
+        keep = _last_occurrences(rows, cols, self.matrix_shape)
+        return rows[keep], cols[keep], values[keep]
+
+    def _encode_sparse(self, triples, dtype, eliminate_zeros=True):
+        """return a CSR matrix containing the values of (forum, user, value) triples."""
+        import scipy.sparse
+
+        rows, cols, values = self._edge_coordinates(triples, dtype=dtype)
+
+        matrix = scipy.sparse.csr_matrix(
+            (values, (rows, cols)), shape=self.matrix_shape, dtype=dtype
+        )
+        if eliminate_zeros:
+            matrix.eliminate_zeros()
+        return matrix
+
+    def densify(self):
+        """
+        Convert a sparse encoding into dense numpy matrices, in place.
+        Used before running solvers that cannot consume sparse input.
+        """
+        if not self.sparse:
+            return
+
+        self.logger.debug("Densifying encoder matrices")
+        self.score_matrices = {
+            score_type: scores.toarray()
+            for score_type, scores in self.score_matrices.items()
+        }
+        self.constraint_matrix = self.constraint_matrix.toarray()
+        self.aggregate_score_matrix = self.aggregate_score_matrix.toarray()
+        self.cost_matrix = self.cost_matrix.toarray()
+
+        limits = self.prob_limit_matrix.tocoo()
+        self.prob_limit_matrix = np.full(
+            self.matrix_shape, self.prob_limit_default, dtype=float
+        )
+        self.prob_limit_matrix[limits.row, limits.col] = limits.data
+
+        self.sparse = False
+
+    def _matrices(self):
+        """Yield (key, matrix) for every matrix of the encoding."""
+        for score_type, scores in self.score_matrices.items():
+            yield ("score_matrices", score_type), scores
+        for name in SHARED_MATRICES:
+            yield name, getattr(self, name)
+
+    def _set_matrix(self, key, matrix):
+        if isinstance(key, tuple):
+            self.score_matrices[key[1]] = matrix
+        else:
+            setattr(self, key, matrix)
+
+    def share(self, directory=None):
+        """
+        Copy the matrices into shared memory (or into memory-mapped files
+        under `directory`) and return the SharedMatrices that owns it. Until
+        `unshare` is called, pickling the encoder, e.g. to send it to worker
+        processes, sends descriptors of the shared copies instead of the
+        matrices, and the workers attach to them read-only.
+
+        The shared copies are a snapshot: a matrix replaced afterwards (e.g.
+        by `densify` or `apply_delta`) is pickled again as a whole.
+        """
+        from .shared import SharedMatrices
+
+        self.unshare()
+        self.shared = SharedMatrices(directory)
+        self.shared_descriptors = {
+            key: (self.shared.put(matrix), matrix)
+            for key, matrix in self._matrices()
+        }
+        self.logger.debug(
+            "Shared {} bytes of encoder matrices".format(self.shared.nbytes)
+        )
+        return self.shared
+
+    def unshare(self):
+        """Release the shared copies of the matrices made by `share`."""
+        shared = getattr(self, "shared", None)
+        if shared is not None:
+            shared.close()
+        self.shared = None
+        self.shared_descriptors = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["shared"] = None
+        descriptors = getattr(self, "shared_descriptors", {})
+        if not descriptors:
+            return state
+
+        state["score_matrices"] = dict(self.score_matrices)
+        # matrices replaced since they were shared are sent as they are
+        state["shared_descriptors"] = {}
+        for key, matrix in self._matrices():
+            descriptor, shared_matrix = descriptors.get(key, (None, None))
+            if matrix is shared_matrix:
+                state["shared_descriptors"][key] = (descriptor, None)
+                if isinstance(key, tuple):
+                    state["score_matrices"][key[1]] = None
+                else:
+                    state[key] = None
+        return state
+
+    def __setstate__(self, state):
+        from .shared import attach
+
+        self.__dict__.update(state)
+        descriptors = state.get("shared_descriptors", {})
+        for key, (descriptor, _) in descriptors.items():
+            matrix = attach(descriptor)
+            self._set_matrix(key, matrix)
+            # attached matrices are sent on as descriptors again
+            descriptors[key] = (descriptor, matrix)
+
+    def subset(self, paper_indices, reviewer_indices):
+        """
+        Return a new Encoder restricted to the papers and reviewers at the
+        given (sorted) indices, e.g. a connected component of the problem.
+        Matrices are copied, and attribute constraint members are kept if they
+        are in the subset, re-indexed.
+        """
+        paper_indices = np.asarray(paper_indices, dtype=np.int64)
+        reviewer_indices = np.asarray(reviewer_indices, dtype=np.int64)
+
+        def select(matrix):
+            if self.sparse:
+                return matrix.tocsr()[paper_indices][:, reviewer_indices]
+            return matrix[np.ix_(paper_indices, reviewer_indices)]
+
+        encoder = Encoder.__new__(Encoder)
+        encoder.__dict__.update(self.__dict__)
+        # the subset's matrices are copies, owned by nobody else
+        encoder.shared = None
+        encoder.shared_descriptors = {}
+        encoder.reviewers = [self.reviewers[i] for i in reviewer_indices]
+        encoder.papers = [self.papers[i] for i in paper_indices]
+        encoder.index_by_user = {r: i for i, r in enumerate(encoder.reviewers)}
+        encoder.user_by_index = {
+            v: k for k, v in encoder.index_by_user.items()
+        }
+        encoder.index_by_forum = {n: i for i, n in enumerate(encoder.papers)}
+        encoder.matrix_shape = (len(encoder.papers), len(encoder.reviewers))
+        encoder.weight_by_type = dict(self.weight_by_type)
+        encoder.normalization_types = list(self.normalization_types)
+        encoder.score_defaults = dict(self.score_defaults)
+        encoder.bad_match_thresholds = list(self.bad_match_thresholds)
+
+        if self.attribute_constraints is not None:
+            local_index = {
+                index: position
+                for position, index in enumerate(reviewer_indices.tolist())
+            }
+            encoder.attribute_constraints = [
+                dict(
+                    constraint,
+                    members=[
+                        local_index[member]
+                        for member in constraint["members"]
+                        if member in local_index
+                    ],
+                )
+                for constraint in self.attribute_constraints
+            ]
+
+        encoder.score_matrices = {
+            score_type: select(scores)
+            for score_type, scores in self.score_matrices.items()
+        }
+        encoder.constraint_matrix = select(self.constraint_matrix)
+        encoder.prob_limit_matrix = select(self.prob_limit_matrix)
+        encoder.aggregate_score_matrix = select(self.aggregate_score_matrix)
+        encoder.cost_matrix = select(self.cost_matrix)
+        return encoder
+
+    def apply_delta(
+        self,
+        added_edges=None,
+        removed_edges=None,
+        constraint_updates=None,
+        new_reviewers=[],
+        new_papers=[],
+    ):
+        """
+        Update the encoding in place instead of re-encoding a modified problem.
+        Only the aggregate scores and costs of changed cells are recomputed.
+
+        - `added_edges`: a dict, keyed on existing score types, of edges in any
+          format accepted for `scores_by_type`. Existing scores are overwritten.
+        - `removed_edges`: a dict, keyed on score types, of (<paper_ID>,
+          <reviewer_ID>) pairs whose score is reset to the type's default.
+        - `constraint_updates`: constraint triples overwriting current values.
+        - `new_reviewers`, `new_papers`: IDs appended to the encoding. Their
+          cells get default scores, no constraint and the default probability limit.
+
+        Only constraints can be updated without the per-type score matrices,
+        which the Matcher drops unless the datasource sets
+        `keep_score_matrices`, so encoders it cached take score deltas only then.
+        """
+        added_edges = added_edges or {}
+        removed_edges = removed_edges or {}
+
+        if not self.keep_score_matrices and (
+            added_edges or removed_edges or new_reviewers or new_papers
+        ):
+            raise EncoderError(
+                "Score updates need the per-type score matrices, "
+                "create the Encoder with keep_score_matrices=True"
+            )
+
+        for score_type in list(added_edges) + list(removed_edges):
+            if score_type not in self.score_matrices:
+                raise EncoderError(
+                    "Unknown score type {}".format(score_type)
+                )
+
+        for new_ids, index_by_id in [
+            (new_reviewers, self.index_by_user),
+            (new_papers, self.index_by_forum),
+        ]:
+            duplicates = set(new_ids).intersection(index_by_id)
+            if duplicates or len(set(new_ids)) != len(new_ids):
+                raise EncoderError(
+                    "IDs are already encoded: {}".format(
+                        sorted(duplicates or new_ids)
+                    )
+                )
+
+        num_papers, num_reviewers = self.matrix_shape
+        if new_reviewers or new_papers:
+            self._grow(new_reviewers, new_papers)
+
+        changed_rows = []
+        changed_cols = []
+        for score_type, pairs in removed_edges.items():
+            pairs = list(pairs)
+            rows = self._indices(
+                list(map(itemgetter(0), pairs)), self.index_by_forum
+            )
+            cols = self._indices(
+                list(map(itemgetter(1), pairs)), self.index_by_user
+            )
+            values = np.full(
+                len(pairs),
+                self.score_defaults[score_type],
+                dtype=self.score_dtype,
+            )
+            self.score_matrices[score_type] = self._set_cells(
+                self.score_matrices[score_type], rows, cols, values
+            )
+            changed_rows.append(rows)
+            changed_cols.append(cols)
+
+        for score_type, edges in added_edges.items():
+            rows, cols, values = self._edge_coordinates(
+                edges, dtype=self.score_dtype
+            )
+            self.score_matrices[score_type] = self._set_cells(
+                self.score_matrices[score_type], rows, cols, values
+            )
+            changed_rows.append(rows)
+            changed_cols.append(cols)
+
+        if constraint_updates is not None:
+            rows, cols, values = self._edge_coordinates(
+                constraint_updates, dtype=self.constraint_dtype
+            )
+            self.constraint_matrix = self._set_cells(
+                self.constraint_matrix, rows, cols, values
+            )
+
+        regions = []
+        if changed_rows:
+            flat = np.unique(
+                np.concatenate(changed_rows) * self.matrix_shape[1]
+                + np.concatenate(changed_cols)
+            )
+            regions.append(np.divmod(flat, self.matrix_shape[1]))
+        if not self.sparse:
+            # new cells hold the (possibly non-zero) default scores
+            if new_papers:
+                regions.append((slice(num_papers, None), slice(None)))
+            if new_reviewers:
+                regions.append((slice(None, num_papers), slice(num_reviewers, None)))
+
+        for region in regions:
+            if isinstance(region[0], slice):
+                shape = tuple(
+                    len(range(*index.indices(size)))
+                    for index, size in zip(region, self.matrix_shape)
+                )
+            else:
+                shape = (len(region[0]),)
+            aggregate = self._aggregate_scores(
+                (
+                    (score_type, self._get_cells(scores, region))
+                    for score_type, scores in self.score_matrices.items()
+                ),
+                shape,
+            )
+            if self.sparse:
+                self.aggregate_score_matrix = self._set_cells(
+                    self.aggregate_score_matrix, *region, aggregate
+                )
+                self.cost_matrix = self._set_cells(
+                    self.cost_matrix, *region, _score_to_cost(aggregate)
+                )
+            else:
+                self.aggregate_score_matrix[region] = aggregate
+                self.cost_matrix[region] = _score_to_cost(aggregate)
+
+    def _grow(self, new_reviewers, new_papers):
+        """append reviewers and papers to the index maps and matrices."""
+        num_papers, num_reviewers = self.matrix_shape
+        self.reviewers = list(self.reviewers) + list(new_reviewers)
+        self.papers = list(self.papers) + list(new_papers)
+        for index, reviewer in enumerate(new_reviewers, num_reviewers):
+            self.index_by_user[reviewer] = index
+            self.user_by_index[index] = reviewer
+        for index, paper in enumerate(new_papers, num_papers):
+            self.index_by_forum[paper] = index
+        self.matrix_shape = (len(self.papers), len(self.reviewers))
+
+        def grow(matrix, default):
+            if self.sparse:
+                matrix = matrix.copy()
+                matrix.resize(self.matrix_shape)
+                return matrix
+            grown = np.full(self.matrix_shape, default, dtype=matrix.dtype)
+            grown[:num_papers, :num_reviewers] = matrix
+            return grown
+
+        self.score_matrices = {
+            score_type: grow(scores, self.score_defaults[score_type])
+            for score_type, scores in self.score_matrices.items()
+        }
+        self.constraint_matrix = grow(self.constraint_matrix, 0)
+        self.prob_limit_matrix = grow(
+            self.prob_limit_matrix, self.prob_limit_default
+        )
+        self.aggregate_score_matrix = grow(self.aggregate_score_matrix, 0)
+        self.cost_matrix = grow(self.cost_matrix, 0)
+
+    def _aggregate_scores(self, scores_by_type, shape, sparse=False):
+        """
+        Fold (score type, unweighted scores) pairs into aggregate scores of
+        the given shape. Types are consumed one at a time and added in place,
+        so besides the aggregate only the normalization buffers are held.
+        Normalized types are divided by the sum of the weights of the types
+        with a non-zero score in each cell.
+        """
+        def zeros():
+            if sparse:
+                import scipy.sparse
+
+                return scipy.sparse.csr_matrix(shape, dtype=self.score_dtype)
+            return np.zeros(shape, dtype=self.score_dtype)
+
+        aggregate = zeros()
+        normalized_sum = None
+        sum_of_weights = None
+
+        for score_type, scores in scores_by_type:
+            weight = self.weight_by_type[score_type]
+            if score_type not in self.normalization_types:
+                aggregate = _add_weighted(aggregate, scores, weight)
+                continue
+
+            if normalized_sum is None:
+                normalized_sum = zeros()
+                sum_of_weights = zeros()
+            normalized_sum = _add_weighted(normalized_sum, scores, weight)
+            sum_of_weights = _add_weighted(
+                sum_of_weights, scores, weight, indicator=True
+            )
+
+        if normalized_sum is None:
+            return aggregate
+
+        if sparse:
+            # only the stored entries can have a non-zero weight sum
+            sum_of_weights.eliminate_zeros()
+            sum_of_weights.data = 1 / sum_of_weights.data
+            return (aggregate + sum_of_weights.multiply(normalized_sum)).tocsr()
+
+        # reuse the weight sums as the normalizer; cells without weight stay 0
+        np.divide(
+            1, sum_of_weights, out=sum_of_weights, where=sum_of_weights != 0
+        )
+        normalized_sum *= sum_of_weights
+        aggregate += normalized_sum
+        return aggregate
+
+    def _get_cells(self, matrix, region):
+        """return the values of `matrix` at (rows, cols) coordinate arrays or slices."""
+        if self.sparse:
+            return np.asarray(matrix[region[0], region[1]]).ravel()
+        return matrix[region]
+
+    def _set_cells(self, matrix, rows, cols, values):
+        """set `matrix` at coordinate arrays; returns the (possibly new) matrix."""
+        if not self.sparse:
+            matrix[rows, cols] = values
+            return matrix
+
+        if len(rows) == 0:
+            return matrix
+        import scipy.sparse
+
+        with warnings.catch_warnings():
+            # inserting new entries into a CSR matrix is expected here
+            warnings.simplefilter(
+                "ignore", scipy.sparse.SparseEfficiencyWarning
+            )
+            matrix[rows, cols] = values
+        if matrix is not self.prob_limit_matrix:
+            matrix.eliminate_zeros()
+        return matrix
+
     def decode_assignments(self, flow_matrix):
         """
         Return a dictionary, keyed on forum IDs, with lists containing dicts
@@ -248,20 +799,22 @@ class Encoder:
         """
         assignments_by_forum = defaultdict(list)
 
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                if flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        "aggregate_score": self.aggregate_score_matrix[
-                            coordinates
-                        ],
-                        "user": reviewer,
-                    }
-                    assignments_by_forum[paper_id].append(paper_user_entry)
+        # nonzero() walks both dense and sparse flows in row-major order
+        paper_indices, reviewer_indices = flow_matrix.nonzero()
+        scores = self.aggregate_score_matrix[paper_indices, reviewer_indices]
+
+        for paper_index, reviewer_index, score in zip(
+            paper_indices.tolist(),
+            reviewer_indices.tolist(),
+            np.asarray(scores).ravel().tolist(),
+        ):
+            paper_user_entry = {
+                "aggregate_score": score,
+                "user": self.reviewers[reviewer_index],
+            }
+            assignments_by_forum[self.papers[paper_index]].append(
+                paper_user_entry
+            )
 
         return dict(assignments_by_forum)
 
@@ -271,30 +824,102 @@ class Encoder:
         representing alternate suggested users.
 
         """
-        alternates_by_forum = {}
-
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            unassigned = []
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                # alternates must not be assigned
-                if not flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        "aggregate_score": self.aggregate_score_matrix[
-                            coordinates
-                        ],
-                        "user": reviewer,
+        if self.sparse or issparse(flow_matrix):
+            return self._decode_sparse_alternates(flow_matrix, num_alternates)
+
+        flow_matrix = np.asarray(flow_matrix)
+        alternates_by_forum = {paper_id: [] for paper_id in self.papers}
+        num_papers, num_reviewers = self.matrix_shape
+        num_alternates = min(num_alternates, num_reviewers)
+        if num_alternates <= 0:
+            return alternates_by_forum
+
+        chunk_size = max(1, (1 << 20) // num_reviewers)
+        for start in range(0, num_papers, chunk_size):
+            rows = slice(start, start + chunk_size)
+            for paper_index, reviewer_index, score in zip(
+                *self._top_unassigned(
+                    self.aggregate_score_matrix[rows],
+                    flow_matrix[rows] == 0,
+                    num_alternates,
+                )
+            ):
+                alternates_by_forum[self.papers[start + paper_index]].append(
+                    {
+                        "aggregate_score": score,
+                        "user": self.reviewers[reviewer_index],
                     }
-                    unassigned.append(paper_user_entry)
+                )
 
-            unassigned.sort(
-                key=lambda entry: entry["aggregate_score"], reverse=True
-            )
+        return alternates_by_forum
 
-            alternates_by_forum[paper_id] = unassigned[:num_alternates]
+    def _top_unassigned(self, scores, unassigned, num_alternates):
+        """
+        return (row, column, score) lists of the `num_alternates` highest
+        unassigned scores of each row, ordered by row, then by descending
+        score, then by column, like a stable sort on descending score.
+        """
+        masked = np.where(unassigned, scores, -np.inf)
+        # the num_alternates-th highest unassigned score of every row
+        thresholds = -np.partition(-masked, num_alternates - 1, axis=1)[
+            :, num_alternates - 1
+        ]
+
+        # candidates include every tie at the threshold; ranking keeps the lowest columns
+        rows, cols = np.nonzero(
+            np.logical_and(masked >= thresholds[:, None], unassigned)
+        )
+        values = masked[rows, cols]
+        order = np.lexsort((cols, -values, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+
+        row_starts = np.searchsorted(rows, rows, side="left")
+        keep = np.arange(len(rows)) - row_starts < num_alternates
+        return (
+            rows[keep].tolist(),
+            cols[keep].tolist(),
+            values[keep].tolist(),
+        )
+
+    def _decode_sparse_alternates(self, flow_matrix, num_alternates):
+        """
+        decode_alternates for sparse encodings. Only stored scores are ranked,
+        padded with the first `num_alternates` unassigned reviewers whose score
+        is implicitly 0, which gives the same ordering as the dense version.
+        """
+        import scipy.sparse
+
+        aggregate = scipy.sparse.csr_matrix(self.aggregate_score_matrix)
+        flows = scipy.sparse.csr_matrix(flow_matrix)
+        alternates_by_forum = {}
+
+        for paper_index, paper_id in enumerate(self.papers):
+            flow_row = flows.getrow(paper_index)
+            assigned = set(flow_row.indices[flow_row.data != 0])
+            score_row = aggregate.getrow(paper_index)
+            scores = dict(zip(score_row.indices, score_row.data))
+
+            candidates = [
+                (score, reviewer_index)
+                for reviewer_index, score in scores.items()
+                if reviewer_index not in assigned
+            ]
+            implicit_zeros = 0
+            for reviewer_index in range(len(self.reviewers)):
+                if implicit_zeros == num_alternates:
+                    break
+                if reviewer_index not in scores and reviewer_index not in assigned:
+                    candidates.append((0.0, reviewer_index))
+                    implicit_zeros += 1
+
+            candidates.sort(key=lambda entry: (-entry[0], entry[1]))
+            alternates_by_forum[paper_id] = [
+                {
+                    "aggregate_score": float(score),
+                    "user": self.reviewers[reviewer_index],
+                }
+                for score, reviewer_index in candidates[:num_alternates]
+            ]
 
         return alternates_by_forum
 
@@ -312,9 +937,11 @@ class Encoder:
             for reviewer_index in reviewer_indices:
                 reviewer_id = self.reviewers[reviewer_index]
                 entry = {
-                    "aggregate_score": self.aggregate_score_matrix[
-                        (paper_index, reviewer_index)
-                    ],
+                    "aggregate_score": float(
+                        self.aggregate_score_matrix[
+                            (paper_index, reviewer_index)
+                        ]
+                    ),
                     "user": reviewer_id,
                 }
                 reviewer_list.append(entry)
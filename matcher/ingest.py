@@ -0,0 +1,402 @@
+"""
+Columnar ingestion of the matcher's CSV inputs.
+
+Files are read into typed numpy columns instead of lists of string tuples.
+Paper and reviewer IDs are dictionary-encoded: each ID column holds integer
+codes into a list of distinct IDs, so mapping a column to matrix indices only
+looks up each distinct ID once. pyarrow is used for CSV files when it is
+installed (it parses in native threads); otherwise the csv module is used.
+
+Parquet, Arrow IPC (Feather) and numpy .npz files are also accepted, picked
+by file extension. Their ID columns may already be dictionary-encoded, in
+which case the encoding is used as it is.
+"""
+
+import csv
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+
+from .encoder import IndexedEdges
+
+IdColumn = namedtuple("IdColumn", ["codes", "categories"])
+"""A dictionary-encoded column of IDs: `categories[codes[i]]` is the i-th ID."""
+
+EdgeColumns = namedtuple(
+    "EdgeColumns", ["papers", "reviewers", "values", "missing"]
+)
+"""
+Columns of a (paperID, userID, value) file. `missing` flags rows with an empty
+value (their entry in `values` is meaningless); it is None unless requested.
+"""
+
+LoadColumns = namedtuple("LoadColumns", ["users", "values"])
+"""Columns of a (userID, value) file, e.g. quotas or max papers. `users` is an IdColumn."""
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+NPZ_EXTENSIONS = (".npz",)
+
+EDGE_NAMES = ("papers", "reviewers", "values")
+"""Column names of edge files in the binary formats."""
+
+LOAD_NAMES = ("users", "values")
+"""Column names of load files in the binary formats."""
+
+
+class IngestError(Exception):
+    """Exception wrapper class for errors related to reading input files"""
+
+    pass
+
+
+def _read_columns_csv(path, num_columns, skip_header):
+    """Read the first `num_columns` fields of every row with the csv module."""
+    with open(path, newline="") as file_handle:
+        reader = csv.reader(file_handle)
+        if skip_header:
+            next(reader, None)
+        rows = [row for row in reader if len(row) >= num_columns]
+
+    return [
+        list(map(str.strip, map(itemgetter(position), rows)))
+        for position in range(num_columns)
+    ]
+
+
+def _factorize(ids):
+    """Dictionary-encode a list of IDs, keeping the order of first occurrence."""
+    categories = list(dict.fromkeys(ids))
+    code_by_id = {category: code for code, category in enumerate(categories)}
+    codes = np.fromiter(
+        map(code_by_id.__getitem__, ids), dtype=np.int64, count=len(ids)
+    )
+    return IdColumn(codes, categories)
+
+
+def _convert(values, dtype, path):
+    try:
+        return values.astype(dtype)
+    except ValueError as error_handle:
+        raise IngestError("{}: {}".format(path, error_handle))
+
+
+def _read_csv(
+    path, num_columns, dtype, allow_missing=False, skip_header=False
+):
+    """
+    Read the first `num_columns` whitespace-stripped fields of every row,
+    skipping rows with fewer fields. Returns (IdColumns for the leading ID
+    fields, the last field converted to `dtype`, the empty-value mask). Empty
+    values are an error unless `allow_missing`, in which case the mask flags
+    them (otherwise it is None).
+    """
+    columns = _read_columns_arrow(
+        path, num_columns, dtype, allow_missing, skip_header
+    )
+    if columns is not None:
+        return columns
+
+    columns = _read_columns_csv(path, num_columns, skip_header)
+    raw_values = np.array(columns[-1], dtype=str)
+    missing = None
+    if allow_missing:
+        missing = raw_values == ""
+        values = np.zeros(len(raw_values), dtype=dtype)
+        values[~missing] = _convert(raw_values[~missing], dtype, path)
+    else:
+        values = _convert(raw_values, dtype, path)
+    return [_factorize(ids) for ids in columns[:-1]], values, missing
+
+
+def _arrow_ids(column, path, trim=False):
+    """Return an IdColumn for a pyarrow column, reusing its dictionary if it has one."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if column.null_count:
+        raise IngestError("{}: missing IDs".format(path))
+    if not pa.types.is_dictionary(column.type):
+        if not pa.types.is_string(column.type):
+            column = pc.cast(column, pa.string())
+        if trim:
+            column = pc.utf8_trim_whitespace(column)
+        column = column.dictionary_encode()
+    encoded = column.combine_chunks()
+    return IdColumn(
+        encoded.indices.to_numpy(),
+        encoded.dictionary.cast(pa.string()).to_pylist(),
+    )
+
+
+def _arrow_values(column, dtype, allow_missing, path):
+    """
+    Convert a pyarrow value column to a numpy array of `dtype`. Empty strings
+    and nulls are missing values; returns (values, missing mask or None).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_string(column.type):
+        column = pc.utf8_trim_whitespace(column)
+        column = pc.if_else(pc.equal(column, ""), None, column)
+
+    missing = None
+    if allow_missing:
+        missing = column.is_null().to_numpy()
+        column = column.fill_null(
+            "0" if pa.types.is_string(column.type) else 0
+        )
+    elif column.null_count:
+        raise IngestError("{}: missing values".format(path))
+
+    try:
+        values = pc.cast(column, pa.from_numpy_dtype(np.dtype(dtype)))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error_handle:
+        raise IngestError("{}: {}".format(path, error_handle))
+    return values.to_numpy(), missing
+
+
+def _read_columns_arrow(path, num_columns, dtype, allow_missing, skip_header):
+    """
+    pyarrow version of `_read_csv`. Returns None if pyarrow is not installed,
+    if the file has no rows, or if it has rows with extra fields, which
+    pyarrow cannot truncate.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        return None
+
+    column_names = ["column{}".format(i) for i in range(num_columns)]
+    extra_fields = []
+
+    def invalid_row_handler(row):
+        if row.actual_columns > row.expected_columns:
+            extra_fields.append(row.number)
+        return "skip"
+
+    try:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(
+                column_names=column_names, skip_rows=1 if skip_header else 0
+            ),
+            parse_options=pa_csv.ParseOptions(
+                invalid_row_handler=invalid_row_handler
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in column_names},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+    except pa.ArrowInvalid:
+        # e.g. an empty file; the csv module handles it
+        return None
+    if extra_fields:
+        return None
+
+    id_columns = [
+        _arrow_ids(table.column(name), path, trim=True)
+        for name in column_names[:-1]
+    ]
+    values, missing = _arrow_values(
+        table.column(column_names[-1]), dtype, allow_missing, path
+    )
+    return id_columns, values, missing
+
+
+def _read_table(path, names, dtype, allow_missing):
+    """
+    Read a Parquet or Arrow IPC (Feather) file. Columns are taken by name if
+    the file has all of `names`, otherwise by position. Dictionary-encoded ID
+    columns are used as they are; null values are missing values.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise IngestError(
+            "{}: reading this format requires pyarrow".format(path)
+        )
+
+    try:
+        if path.endswith(PARQUET_EXTENSIONS):
+            table = pq.read_table(path, memory_map=True)
+        else:
+            table = feather.read_table(path, memory_map=True)
+    except (pa.ArrowInvalid, OSError) as error_handle:
+        raise IngestError("{}: {}".format(path, error_handle))
+
+    if table.num_columns < len(names):
+        raise IngestError(
+            "{}: expected {} columns, found {}".format(
+                path, len(names), table.num_columns
+            )
+        )
+    if set(names) <= set(table.column_names):
+        table = table.select(list(names))
+    else:
+        table = table.select(list(range(len(names))))
+    table = table.unify_dictionaries()
+
+    id_columns = [_arrow_ids(column, path) for column in table.columns[:-1]]
+    values, missing = _arrow_values(
+        table.columns[-1], dtype, allow_missing, path
+    )
+    return id_columns, values, missing
+
+
+def _read_npz(path, names, dtype, allow_missing):
+    """
+    Read a numpy .npz file holding one array per name in `names`. An ID array
+    may hold integer codes into a "<name>_categories" array of IDs instead of
+    the IDs themselves. NaN values are missing values.
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        missing_names = [name for name in names if name not in arrays]
+        if missing_names:
+            raise IngestError(
+                "{}: missing arrays {}".format(path, ", ".join(missing_names))
+            )
+
+        id_columns = []
+        for name in names[:-1]:
+            ids = arrays[name]
+            categories_name = "{}_categories".format(name)
+            if categories_name in arrays and ids.dtype.kind in "iu":
+                id_columns.append(
+                    IdColumn(ids, arrays[categories_name].astype(str).tolist())
+                )
+            else:
+                categories, codes = np.unique(
+                    ids.astype(str), return_inverse=True
+                )
+                id_columns.append(IdColumn(codes, categories.tolist()))
+        values = arrays[names[-1]]
+
+    missing = np.zeros(len(values), dtype=bool)
+    if values.dtype.kind == "f":
+        missing = np.isnan(values)
+    if missing.any():
+        if not allow_missing:
+            raise IngestError("{}: missing values".format(path))
+        values = np.where(missing, 0, values)
+    if not allow_missing:
+        missing = None
+    return id_columns, _convert(values, dtype, path), missing
+
+
+def _read_columns(path, names, dtype, allow_missing=False, skip_header=False):
+    """
+    Read the ID columns and value column called `names` from a file, picking
+    the reader by the file extension. CSV files have no column names, so their
+    fields are read by position, skipping the first row if `skip_header`.
+    """
+    if path.endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS):
+        return _read_table(path, names, dtype, allow_missing)
+    if path.endswith(NPZ_EXTENSIONS):
+        return _read_npz(path, names, dtype, allow_missing)
+    return _read_csv(
+        path,
+        len(names),
+        dtype,
+        allow_missing=allow_missing,
+        skip_header=skip_header,
+    )
+
+
+def read_edges(path, dtype=float, allow_missing=False):
+    """
+    Read a (paperID, userID, value) file into EdgeColumns. With
+    `allow_missing`, empty values are flagged in `missing` instead of failing.
+    """
+    (papers, reviewers), values, missing = _read_columns(
+        path, EDGE_NAMES, dtype, allow_missing=allow_missing
+    )
+    return EdgeColumns(papers, reviewers, values, missing)
+
+
+def read_loads(path, skip_header=False):
+    """Read a (userID, int value) file into LoadColumns."""
+    (users,), values, _ = _read_columns(
+        path, LOAD_NAMES, int, skip_header=skip_header
+    )
+    return LoadColumns(users, values)
+
+
+def read_all(reads, max_workers=None):
+    """
+    Run several reads in parallel threads. `reads` maps keys to
+    (function, args, kwargs) tuples; returns a dict of the results by key.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            key: executor.submit(function, *args, **kwargs)
+            for key, (function, args, kwargs) in reads.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def used_ids(column, mask=None):
+    """Return the distinct IDs of an IdColumn, restricted to rows in `mask`."""
+    codes = column.codes if mask is None else column.codes[mask]
+    used = np.bincount(codes, minlength=len(column.categories)) > 0
+    return [column.categories[code] for code in np.flatnonzero(used)]
+
+
+def index_ids(column, index_by_id):
+    """Map an IdColumn to matrix indices; IDs missing from `index_by_id` map to -1."""
+    index_by_code = np.fromiter(
+        (index_by_id.get(category, -1) for category in column.categories),
+        dtype=np.int64,
+        count=len(column.categories),
+    )
+    return index_by_code[column.codes]
+
+
+def indexed_edges(
+    edges, index_by_paper, index_by_reviewer, mask=None, value=None
+):
+    """
+    Return IndexedEdges for the rows of `edges` in `mask`, dropping rows whose
+    paper or reviewer is not in the index maps. If `value` is given, every
+    edge gets that value instead of the one read from the file.
+    """
+    rows = index_ids(edges.papers, index_by_paper)
+    cols = index_ids(edges.reviewers, index_by_reviewer)
+    keep = np.logical_and(rows >= 0, cols >= 0)
+    if mask is not None:
+        keep &= mask
+    values = edges.values[keep]
+    if value is not None:
+        values = np.full(len(values), value, dtype=np.asarray(value).dtype)
+    return IndexedEdges(rows[keep], cols[keep], values)
+
+
+def concat_indexed_edges(edges_list):
+    """Concatenate IndexedEdges; later edges win over earlier duplicates."""
+    if not edges_list:
+        return IndexedEdges(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0),
+        )
+    return IndexedEdges(*(np.concatenate(parts) for parts in zip(*edges_list)))
+
+
+def assign_loads(target, loads, index_by_user):
+    """
+    Set `target[index_by_user[user]]` to each user's value in `loads`, the
+    last value winning for repeated users. Returns the IDs of users missing
+    from `index_by_user`, in file order.
+    """
+    indices = index_ids(loads.users, index_by_user)
+    known = indices >= 0
+    target[indices[known]] = loads.values[known].astype(target.dtype)
+    return [loads.users.categories[code] for code in loads.users.codes[~known]]
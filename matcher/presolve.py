@@ -0,0 +1,206 @@
+"""
+A presolve stage that shrinks a matching problem before any solver runs.
+
+Presolve fixes the forced pairs (a constraint of 1), subtracting them from
+the paper demands and reviewer loads, then removes:
+    - papers whose demand is met,
+    - reviewers with no capacity left,
+    - reviewers without any pair that can be assigned (no conflict and a
+      known, non-zero score).
+
+Solvers run on the reduced encoding, in which fixed pairs are conflicts,
+and `restore` maps their solution back to the whole problem. Forced pairs
+are therefore assigned with every solver, including those that do not
+enforce a constraint of 1 themselves (FairFlow, FairSequence, FairIR).
+"""
+
+import logging
+
+import numpy as np
+
+from .components import (
+    assignable_pairs,
+    global_alternates,
+    has_known_costs,
+    stitch,
+)
+from .solvers import SolverException
+
+
+def _forced_pairs(encoder):
+    """Return (paper indices, reviewer indices) of the pairs with a constraint of 1."""
+    if encoder.sparse:
+        forced = (encoder.constraint_matrix.tocsr() == 1).tocoo()
+        return forced.row.astype(np.int64), forced.col.astype(np.int64)
+    papers, reviewers = np.nonzero(np.asarray(encoder.constraint_matrix) == 1)
+    return papers, reviewers
+
+
+class Presolve:
+    """
+    Reduces the problem given by an encoder and the reviewer loads and paper
+    demands. The reduced problem is in the `encoder`, `minimums`,
+    `maximums` and `demands` attributes; `papers` and `reviewers` hold the
+    indices they keep from the whole problem.
+
+    Raises a SolverException if forced pairs exceed a paper's demand or a
+    reviewer's maximum load, or if a paper with demand left has no pair that
+    can be assigned.
+    """
+
+    def __init__(
+        self,
+        encoder,
+        minimums,
+        maximums,
+        demands,
+        allow_zero_score_assignments=False,
+        logger=logging.getLogger(__name__),
+    ):
+        self.whole_encoder = encoder
+        self.logger = logger
+        num_papers, num_reviewers = encoder.matrix_shape
+
+        minimums = np.asarray(minimums, dtype=np.int64)
+        maximums = np.asarray(maximums, dtype=np.int64)
+        demands = np.asarray(demands, dtype=np.int64)
+
+        self.forced_papers, self.forced_reviewers = _forced_pairs(encoder)
+        forced_by_paper = np.bincount(self.forced_papers, minlength=num_papers)
+        forced_by_reviewer = np.bincount(
+            self.forced_reviewers, minlength=num_reviewers
+        )
+        over_demand = np.flatnonzero(forced_by_paper > demands)
+        if len(over_demand):
+            raise SolverException(
+                "Papers {} have more forced reviewers than their demand".format(
+                    [encoder.papers[index] for index in over_demand]
+                )
+            )
+        over_load = np.flatnonzero(forced_by_reviewer > maximums)
+        if len(over_load):
+            raise SolverException(
+                "Reviewers {} have more forced papers than their maximum load".format(
+                    [encoder.reviewers[index] for index in over_load]
+                )
+            )
+        demands = demands - forced_by_paper
+        maximums = maximums - forced_by_reviewer
+        minimums = np.maximum(minimums - forced_by_reviewer, 0)
+
+        keep_papers = demands > 0
+        keep_reviewers = maximums > 0
+
+        # forced pairs are fixed, so they are not assignable any more
+        pair_papers, pair_reviewers = assignable_pairs(
+            encoder,
+            allow_zero_score_assignments or not has_known_costs(encoder),
+        )
+        assignable = keep_papers[pair_papers] & keep_reviewers[pair_reviewers]
+        assignable[
+            np.isin(
+                pair_papers * num_reviewers + pair_reviewers,
+                self.forced_papers * num_reviewers + self.forced_reviewers,
+            )
+        ] = False
+        pairs_by_paper = np.bincount(
+            pair_papers[assignable], minlength=num_papers
+        )
+        pairs_by_reviewer = np.bincount(
+            pair_reviewers[assignable], minlength=num_reviewers
+        )
+
+        stranded = np.flatnonzero(keep_papers & (pairs_by_paper == 0))
+        if len(stranded):
+            raise SolverException(
+                "Papers {} have no reviewer that can be assigned".format(
+                    [encoder.papers[index] for index in stranded]
+                )
+            )
+        keep_reviewers &= pairs_by_reviewer > 0
+
+        self.papers = np.flatnonzero(keep_papers)
+        self.reviewers = np.flatnonzero(keep_reviewers)
+        self.minimums = minimums[self.reviewers].tolist()
+        self.maximums = maximums[self.reviewers].tolist()
+        self.demands = demands[self.papers].tolist()
+
+        self.encoder = encoder.subset(self.papers, self.reviewers)
+        self._block_forced_pairs()
+
+        self.logger.info(
+            "Presolve fixed {} forced pairs and kept {} of {} papers and {} of {} reviewers".format(
+                len(self.forced_papers),
+                len(self.papers),
+                num_papers,
+                len(self.reviewers),
+                num_reviewers,
+            )
+        )
+
+    def _block_forced_pairs(self):
+        """Turn the fixed pairs kept in the reduced encoding into conflicts"""
+        local_papers = np.full(self.whole_encoder.matrix_shape[0], -1)
+        local_papers[self.papers] = np.arange(len(self.papers))
+        local_reviewers = np.full(self.whole_encoder.matrix_shape[1], -1)
+        local_reviewers[self.reviewers] = np.arange(len(self.reviewers))
+
+        rows = local_papers[self.forced_papers]
+        cols = local_reviewers[self.forced_reviewers]
+        kept = (rows >= 0) & (cols >= 0)
+        self.encoder.constraint_matrix = self.encoder._set_cells(
+            self.encoder.constraint_matrix, rows[kept], cols[kept], -1
+        )
+
+    @property
+    def is_empty(self):
+        """Whether the forced pairs meet every demand, leaving nothing to solve"""
+        return len(self.papers) == 0
+
+    def restore(self, flow_matrix):
+        """
+        Return the flow matrix of the whole problem for a solution of the
+        reduced problem (None if it is empty), including the fixed pairs.
+        """
+        parts = []
+        if flow_matrix is not None:
+            parts.append((flow_matrix, self.papers, self.reviewers))
+        restored = stitch(
+            parts,
+            self.whole_encoder.matrix_shape,
+            self.whole_encoder.sparse,
+        )
+        if self.whole_encoder.sparse:
+            import scipy.sparse
+
+            return restored + scipy.sparse.csr_matrix(
+                (
+                    np.ones(len(self.forced_papers)),
+                    (self.forced_papers, self.forced_reviewers),
+                ),
+                shape=self.whole_encoder.matrix_shape,
+            )
+        restored[self.forced_papers, self.forced_reviewers] = 1
+        return restored
+
+    def restore_alternates(self, alternates_by_index):
+        """Map alternates picked in the reduced problem to the whole problem"""
+        restored = {
+            paper_index: []
+            for paper_index in range(self.whole_encoder.matrix_shape[0])
+        }
+        restored.update(
+            global_alternates(alternates_by_index, self.papers, self.reviewers)
+        )
+        return restored
+
+    def get_additional_status_info(self):
+        """The number of fixed pairs and of papers and reviewers removed"""
+        num_papers, num_reviewers = self.whole_encoder.matrix_shape
+        return {
+            "presolve_forced_pairs": str(len(self.forced_papers)),
+            "presolve_removed_papers": str(num_papers - len(self.papers)),
+            "presolve_removed_reviewers": str(
+                num_reviewers - len(self.reviewers)
+            ),
+        }
@@ -588,6 +588,8 @@ class ConfigNoteInterfaceV1(BaseConfigNoteInterface):
         self.bad_match_thresholds = self.config_note.content.get(
             "perturbedmaximization_bad_match_thresholds", [0.1, 0.3, 0.5]
         )
+        time_budget = self.config_note.content.get("time_budget")
+        self.time_budget = float(time_budget) if time_budget else None
 
         # Lazy variables
         self._reviewers = None
@@ -791,6 +793,8 @@ class ConfigNoteInterfaceV2(BaseConfigNoteInterface):
         self.bad_match_thresholds = self.config_note.content.get(
             "perturbedmaximization_bad_match_thresholds", [0.1, 0.3, 0.5]
         )
+        time_budget = self.config_note.content.get("time_budget")
+        self.time_budget = float(time_budget) if time_budget else None
 
         # Lazy variables
         self._reviewers = None
@@ -0,0 +1,162 @@
+"""
+Matrices that worker processes can read without receiving a copy.
+
+SharedMatrices places numpy arrays, and the data, indices and indptr arrays
+of scipy sparse matrices, in `multiprocessing.shared_memory` blocks or in
+memory-mapped files under a directory. For each matrix it hands out a
+descriptor: a small picklable record of where the matrix lives. A worker
+process calls `attach` on a descriptor to get a read-only view of the same
+memory.
+
+The process that places the matrices owns them and releases them with
+`close`. Workers only attach, so they must be started by the owner (e.g.
+with multiprocessing or concurrent.futures), which shares its resource
+tracker with them.
+"""
+
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .solvers.core import issparse
+
+SharedArray = namedtuple("SharedArray", ["name", "path", "shape", "dtype"])
+"""
+A numpy array in the shared memory block `name`, or in the .npy file at
+`path`. Both are None for an empty array.
+"""
+
+SharedSparse = namedtuple(
+    "SharedSparse", ["format", "shape", "data", "indices", "indptr"]
+)
+"""A scipy CSR or CSC matrix whose arrays are SharedArrays."""
+
+# blocks attached by this process, open as long as the process lives since
+# the views handed out keep pointing into them
+_attached_blocks = {}
+
+
+def _attach_array(descriptor):
+    dtype = np.dtype(descriptor.dtype)
+    if descriptor.name is None and descriptor.path is None:
+        array = np.empty(descriptor.shape, dtype=dtype)
+    elif descriptor.path is not None:
+        array = np.load(descriptor.path, mmap_mode="r")
+    else:
+        block = _attached_blocks.get(descriptor.name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=descriptor.name)
+            _attached_blocks[descriptor.name] = block
+        array = np.ndarray(descriptor.shape, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def attach(descriptor):
+    """
+    Return a read-only view of the matrix described by `descriptor`,
+    without copying it.
+    """
+    if isinstance(descriptor, SharedArray):
+        return _attach_array(descriptor)
+
+    import scipy.sparse
+
+    matrix_class = (
+        scipy.sparse.csr_matrix
+        if descriptor.format == "csr"
+        else scipy.sparse.csc_matrix
+    )
+    return matrix_class(
+        (
+            _attach_array(descriptor.data),
+            _attach_array(descriptor.indices),
+            _attach_array(descriptor.indptr),
+        ),
+        shape=descriptor.shape,
+        copy=False,
+    )
+
+
+class SharedMatrices:
+    """
+    Owns the shared memory that matrices are placed in.
+
+    Arguments:
+    - `directory`:
+        None to place matrices in `multiprocessing.shared_memory` blocks, or
+        a directory in which they are written to memory-mapped .npy files,
+        e.g. on a disk when the matrices do not fit in /dev/shm.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.nbytes = 0
+        self._blocks = []
+        self._files_dir = None
+        self._num_files = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._files_dir = tempfile.mkdtemp(prefix="shared-", dir=directory)
+
+    def _put_array(self, array):
+        array = np.ascontiguousarray(array)
+        descriptor = SharedArray(None, None, array.shape, array.dtype.str)
+        if array.nbytes == 0:
+            return descriptor
+
+        if self._files_dir is not None:
+            path = os.path.join(
+                self._files_dir, "{}.npy".format(self._num_files)
+            )
+            self._num_files += 1
+            np.save(path, array)
+            descriptor = descriptor._replace(path=path)
+        else:
+            block = shared_memory.SharedMemory(create=True, size=array.nbytes)
+            self._blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[
+                ...
+            ] = array
+            descriptor = descriptor._replace(name=block.name)
+        self.nbytes += array.nbytes
+        return descriptor
+
+    def put(self, matrix):
+        """Copy `matrix` into shared memory and return its descriptor."""
+        if not issparse(matrix):
+            return self._put_array(np.asarray(matrix))
+
+        if matrix.format not in ("csr", "csc"):
+            matrix = matrix.tocsr()
+        return SharedSparse(
+            matrix.format,
+            matrix.shape,
+            self._put_array(matrix.data),
+            self._put_array(matrix.indices),
+            self._put_array(matrix.indptr),
+        )
+
+    def close(self):
+        """
+        Release the shared memory. Workers that attached keep their views
+        until they exit, but no new worker can attach.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        if self._files_dir is not None:
+            shutil.rmtree(self._files_dir, ignore_errors=True)
+            self._files_dir = None
+        self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,10 +1,38 @@
-"""A module for paper-reviewer assignment solvers"""
+"""
+A module for paper-reviewer assignment solvers
+
+Solver classes are imported on first access, so that only the dependencies of
+the solvers actually used (gurobipy, ortools, cffi, ...) are loaded.
+"""
+
+import importlib
 
 from .core import SolverException
-from .minmax_solver import MinMaxSolver
-from .simple_solver import SimpleSolver
-from .randomized_solver import RandomizedSolver
-from .fairflow import FairFlow
-from .fairsequence import FairSequence
-from .fairir import FairIR
-from .perturbed_maximization_solver import PerturbedMaximizationSolver
\ No newline at end of file
+
+_SOLVER_MODULES = {
+    "MinMaxSolver": ".minmax_solver",
+    "SimpleSolver": ".simple_solver",
+    "RandomizedSolver": ".randomized_solver",
+    "FairFlow": ".fairflow",
+    "FairSequence": ".fairsequence",
+    "FairIR": ".fairir",
+    "PerturbedMaximizationSolver": ".perturbed_maximization_solver",
+    "Portfolio": ".portfolio",
+}
+
+__all__ = ["SolverException"] + list(_SOLVER_MODULES)
+
+
+def __getattr__(name):
+    if name not in _SOLVER_MODULES:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    module = importlib.import_module(_SOLVER_MODULES[name], __name__)
+    solver = getattr(module, name)
+    globals()[name] = solver
+    return solver
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SOLVER_MODULES))
@@ -3,4 +3,177 @@ A C extension that implements a sampling algorithm based on the Birkhoff-von Neu
 theorem, used in randomized_solver.
 """
 
-from _bvn_extension.lib import run_bvn
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from _bvn_extension import ffi
+from _bvn_extension.lib import run_bvn, run_bvn_sparse
+
+
+def _draw_seed(seed):
+    """Return `seed`, or a random seed for the C sampler if it is None"""
+    if seed is None:
+        seed = np.random.default_rng().integers(1, 2**63)
+    return int(seed)
+
+
+def sample_bvn(flows, one, subsets=None, seed=None):
+    """
+    Sample a deterministic assignment from a fractional one with `run_bvn`.
+
+    `flows` is a (#papers, #reviewers) matrix of assignment probabilities
+    scaled up by `one` to integers. If it is a C-contiguous `np.intc` array,
+    the C code reads it and writes the sampled 0/1 assignment into it in
+    place, without a copy; otherwise it is converted once. `subsets` holds a
+    strictly positive subset ID for each reviewer, all 1 by default.
+
+    The sample is determined by the nonnegative integer `seed`, random if
+    None. The GIL is released while sampling, so that several threads can
+    sample at once.
+
+    Returns the sampled assignment, as an `np.intc` matrix.
+    """
+    flows = np.ascontiguousarray(flows, dtype=np.intc)
+    num_papers, num_reviewers = flows.shape
+    if subsets is None:
+        subsets = np.ones(num_reviewers, dtype=np.intc)
+    subsets = np.ascontiguousarray(subsets, dtype=np.intc)
+    run_bvn(
+        ffi.from_buffer("int[]", flows, require_writable=True),
+        ffi.from_buffer("int[]", subsets),
+        num_papers,
+        num_reviewers,
+        one,
+        _draw_seed(seed),
+    )
+    return flows
+
+
+def sample_bvn_sparse(
+    papers,
+    reviewers,
+    flows,
+    one,
+    num_papers,
+    num_reviewers,
+    subsets=None,
+    seed=None,
+):
+    """
+    Sample a deterministic assignment from a fractional one given as edges,
+    with `run_bvn_sparse`, which allocates memory for the edges with nonzero
+    flow only.
+
+    `papers`, `reviewers` and `flows` are equal-length arrays holding, for
+    each paper-reviewer pair with a nonzero assignment probability, its
+    paper index, reviewer index and probability scaled up by `one` to an
+    integer. `flows` is written in place, and `seed` used, like those of
+    `sample_bvn`.
+
+    Returns the sampled assignment of each edge (0 or 1), as an `np.intc`
+    array.
+    """
+    papers = np.ascontiguousarray(papers, dtype=np.intc)
+    reviewers = np.ascontiguousarray(reviewers, dtype=np.intc)
+    flows = np.ascontiguousarray(flows, dtype=np.intc)
+    if subsets is None:
+        subsets = np.ones(num_reviewers, dtype=np.intc)
+    subsets = np.ascontiguousarray(subsets, dtype=np.intc)
+    run_bvn_sparse(
+        ffi.from_buffer("int[]", papers),
+        ffi.from_buffer("int[]", reviewers),
+        ffi.from_buffer("int[]", flows, require_writable=True),
+        len(flows),
+        ffi.from_buffer("int[]", subsets),
+        num_papers,
+        num_reviewers,
+        one,
+        _draw_seed(seed),
+    )
+    return flows
+
+
+class Samples(
+    namedtuple("Samples", ["papers", "reviewers", "assignments", "shape"])
+):
+    """
+    Assignments sampled from one fractional assignment of the given (#papers,
+    #reviewers) `shape`, stored over its edges: `assignments[k, e]` is 1 if
+    sample k assigns reviewer `reviewers[e]` to paper `papers[e]`. Pairs that
+    are not edges have probability 0 and are never assigned.
+    """
+
+    __slots__ = ()
+
+    def assignment(self, index=0):
+        """Return sample `index` as a dense assignment matrix"""
+        assignment = np.zeros(self.shape)
+        assignment[self.papers, self.reviewers] = self.assignments[index]
+        return assignment
+
+    def marginals(self):
+        """Return the fraction of the samples assigning each pair, as a dense matrix"""
+        marginals = np.zeros(self.shape)
+        marginals[self.papers, self.reviewers] = self.assignments.mean(axis=0)
+        return marginals
+
+
+def _sample_edges(
+    papers, reviewers, flows, one, num_papers, num_reviewers, seeds
+):
+    """Draw one sample over the given edges per seed, in one thread"""
+    assignments = np.empty((len(seeds), len(flows)), dtype=np.int8)
+    for assignment, seed in zip(assignments, seeds):
+        assignment[:] = sample_bvn_sparse(
+            papers,
+            reviewers,
+            np.array(flows, dtype=np.intc),
+            one,
+            num_papers,
+            num_reviewers,
+            seed=seed,
+        )
+    return assignments
+
+
+def sample_matrix(flows, one, num_samples=1, max_workers=None, seed=None):
+    """
+    Draw `num_samples` independent samples from the fractional assignment
+    `flows`, a matrix of assignment probabilities scaled up by `one` to
+    integers, which is left unchanged. Only its nonzero pairs are passed to
+    the sampler.
+
+    Several samples are drawn in `max_workers` threads (one per CPU if
+    None); 1 draws them one after the other in this thread.
+
+    `seed` is a seed or a `np.random.Generator` passed to
+    `np.random.default_rng`, from which the seed of each sample is drawn, so
+    that a given seed gives the same samples whatever `max_workers` is.
+
+    Returns the Samples.
+    """
+    papers, reviewers = np.nonzero(flows)
+    edges = (
+        papers,
+        reviewers,
+        np.asarray(flows)[papers, reviewers],
+        one,
+    ) + tuple(np.shape(flows))
+    seeds = np.random.default_rng(seed).integers(1, 2**63, size=num_samples)
+
+    num_workers = min(num_samples, max_workers or os.cpu_count() or 1)
+    if num_workers <= 1:
+        assignments = _sample_edges(*edges, seeds)
+    else:
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            futures = [
+                pool.submit(_sample_edges, *edges, chunk)
+                for chunk in np.array_split(seeds, num_workers)
+            ]
+            assignments = np.concatenate(
+                [future.result() for future in futures]
+            )
+    return Samples(papers, reviewers, assignments, tuple(np.shape(flows)))
@@ -18,54 +18,65 @@
 #include <time.h>
 #include <math.h>
 #include <assert.h>
+#include <stdint.h>
 
 #define debug 0
 
-int one;
-
 /* STATE VARIABLES */
 
-// flow tracking
-int *f, *c, *ci; // f: current flow on an edge, c: total load of a vertex (positive for reviewers, negative for papers), ci: total load of a paper-instution pair
-int fw, bw; // (fw, bw): maximum amount of flow that can be added in the forward / backward direction on current path / cycle
-int m; // m: number of remaining (fractional) edges
+// The state of one sampling run. Every run has its own, so that runs can
+// proceed concurrently in several threads.
+typedef struct
+{
+    int one; // one: scale of flows
+
+    // flow tracking
+    int *f, *c, *ci; // f: current flow on an edge, c: total load of a vertex (positive for reviewers, negative for papers), ci: total load of a paper-instution pair
+    int fw, bw; // (fw, bw): maximum amount of flow that can be added in the forward / backward direction on current path / cycle
+    int m; // m: number of remaining (fractional) edges
+
+    // (simulated) linked lists of adjacent edges
+    int *h, *u, *v, *l, *se; // h: heads, (u, v): starting and ending points of an edge, l: pointer to next edge, se: whether edge has been visited
+    int tot; // tot: total number of edges ever added
+    int *s, *ri; // s: whether vertex has been visited, ri: instituion a reviewer belongs to
 
-// (simulated) linked lists of adjacent edges
-int *h, *u, *v, *l, *se; // h: heads, (u, v): starting and ending points of an edge, l: pointer to next edge, se: whether edge has been visited
-int tot; // tot: total number of edges ever added
-int *s, *ri; // s: whether vertex has been visited, ri: instituion a reviewer belongs to
+    // (simulated) linked lists of adjacent institutions
+    int *hi, *vi, *li, *si; // hi: heads, vi: name / number of insitution, li: pointer to next institution, si: whether an institution has been visited at this paper
+    int ti; // ti: total number of paper-institution pairs ever added
 
-// (simulated) linked lists of adjacent institutions
-int *hi, *vi, *li, *si; // hi: heads, vi: name / number of insitution, li: pointer to next institution, si: whether an institution has been visited at this paper
-int ti; // ti: total number of paper-institution pairs ever added
+    // stack for tracking path / cycle to clear
+    int *st; // st: stack of pointers
+    int top, btm; // top: top, btm: where path / cycle starts
 
-// stack for tracking path / cycle to clear
-int *st; // st: stack of pointers
-int top, btm; // top: top, btm: where path / cycle starts
+    // random number generation
+    uint64_t rng; // rng: state of the xorshift64* generator, never 0
+} bvn_state;
 
 
 /* FUNCTION PROTOTYPES */
 
-int go(int x, int y, int p);
+int go(bvn_state* S, int x, int y, int p);
+void push_flows(bvn_state* S, int n);
 
-void ae(int x, int y, int z);
-int fi(int p, int i);
-void ai(int p, int i, int w);
-void re(int x);
-int tr(int x, int i);
-void cnr(int x);
-void upd(int x, int y);
+void ae(bvn_state* S, int x, int y, int z);
+int fi(bvn_state* S, int p, int i);
+void ai(bvn_state* S, int p, int i, int w);
+void re(bvn_state* S, int x);
+int tr(bvn_state* S, int x, int i);
+void cnr(bvn_state* S, int x);
+void upd(bvn_state* S, int x, int y);
 
 int idx_to_rev(int i, int npaps, int nrevs);
 int idx_to_pap(int i, int npaps, int nrevs);
 int pap_rev_to_idx(int p, int r, int npaps, int nrevs);
 int min(int a, int b);
-int fl(int x);
-int ce(int x);
-int in(int x);
-void initialize_state(int vsize, int esize);
+int fl(bvn_state* S, int x);
+int ce(bvn_state* S, int x);
+int in(bvn_state* S, int x);
+void initialize_state(bvn_state* S, int vsize, int esize, int one_, uint64_t seed);
 int* alloc_int(int size);
-void free_buffers(void);
+double random_double(bvn_state* S);
+void free_buffers(bvn_state* S);
 
 
 /* ALGORITHM LOGIC FUNCTIONS */
@@ -83,19 +94,20 @@ void free_buffers(void);
  * - npaps: Number of papers.
  * - nrevs: Number of reviewers.
  * - one_: Scale of flows.
+ * - seed: Seed of the random number generator. Runs with the same inputs and
+ *   seed sample the same assignment.
  */
-int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_)
+int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_, uint64_t seed)
 {
-    srand(clock()); // set random seed to current clock time
-    rand(); // throw away first random number
-
+    bvn_state state;
+    bvn_state* S = &state;
     int n = npaps + nrevs;
-	one = one_;
 
-	// allocate space for n vertices, and 2*p*r maximum edges
-	initialize_state(n + 1, (2 * npaps * nrevs) + 1);
+	// allocate space for n vertices, and 2*p*r maximum edges, numbered from
+	// 2 since tot starts at 1
+	initialize_state(S, n + 1, (2 * npaps * nrevs) + 2, one_, seed);
 
-    for(int i = 1; i <= nrevs; i++) ri[i] = subsets[i-1];
+    for(int i = 1; i <= nrevs; i++) S->ri[i] = subsets[i-1];
 
     for(int i = 0; i < npaps*nrevs; i++)
     {
@@ -103,38 +115,21 @@ int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_)
 		int y = idx_to_pap(i, npaps, nrevs);
 		int z = flows[i];//round(flows[i] * one);
 
-        c[x] += z; // update load counters at vertices
-        c[y] -= z;
+        S->c[x] += z; // update load counters at vertices
+        S->c[y] -= z;
         if(z != 0) // if flow is nonzero, add edge
         {
-            ae(x, y, z);
-            ae(y, x, one - z);
+            ae(S, x, y, z);
+            ae(S, y, x, S->one - z);
 
-            ai(y, ri[x], z); // and update flow counter for paper-institution pair
+            ai(S, y, S->ri[x], z); // and update flow counter for paper-institution pair
 
-            cnr(tot); // remove edge if flow is already integral
+            cnr(S, S->tot); // remove edge if flow is already integral
         }
 
     }
 
-    while(m) // while there are still fractional edges left
-    {
-        if(debug) printf("%d\n", m);
-        memset(s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
-        for(int i = 1; i <= n; i++) // try to find paths / cycles starting from vertices with fractional load
-            if(!in(c[i]))
-            {
-                top = 0;
-                if(go(i, 0, 1)) break;
-            }
-
-        memset(s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
-        for(int i = 1; i <= n; i++) // now try to find cycles only starting from all vertices
-        {
-            top = 0;
-            if(go(i, 0, 0)) break;
-        }
-    }
+    push_flows(S, n);
 
 	// set all flows to 0 for output
     for(int i = 0; i < npaps * nrevs; i++)
@@ -142,197 +137,289 @@ int run_bvn(int* flows, int* subsets, int npaps, int nrevs, int one_)
 		flows[i] = 0;
 	}
 
-    for(int i = 2; i <= tot; i++)
+    for(int i = 2; i <= S->tot; i++)
 	{
-        if(u[i] < v[i] && f[i] == one) // output all edges whose final flow is one -- these constitute the integral matching
+        if(S->u[i] < S->v[i] && S->f[i] == S->one) // output all edges whose final flow is one -- these constitute the integral matching
 		{
-			int idx = pap_rev_to_idx(v[i], u[i], npaps, nrevs);
+			int idx = pap_rev_to_idx(S->v[i], S->u[i], npaps, nrevs);
 			flows[idx] = 1;
 		}
 	}
 
-	free_buffers();
+	free_buffers(S);
     return 0;
 }
 
+/*
+ * The function called by Python to sample from a fractional assignment given
+ * as a list of edges. Unlike run_bvn, memory is proportional to the number of
+ * edges with nonzero flow instead of npaps * nrevs.
+ * Arguments:
+ * - paps, revs: Arrays of size nedges with the paper and reviewer index
+ *   (starting at 0) of each edge. Each paper-reviewer pair appears at most once.
+ * - flows: Array of size nedges with the flow on each edge, scaled up by one_
+ *   to be integers. The function modifies this buffer so that it contains
+ *   the output sampled assignment: 1 on the sampled edges, 0 elsewhere.
+ * - nedges: Number of edges.
+ * - subsets: As in run_bvn.
+ * - npaps: Number of papers.
+ * - nrevs: Number of reviewers.
+ * - one_: Scale of flows.
+ * - seed: As in run_bvn.
+ */
+int run_bvn_sparse(int* paps, int* revs, int* flows, int nedges, int* subsets, int npaps, int nrevs, int one_, uint64_t seed)
+{
+    bvn_state state;
+    bvn_state* S = &state;
+    int n = npaps + nrevs;
+
+    int nonzero = 0;
+    for(int i = 0; i < nedges; i++)
+        if(flows[i] != 0) nonzero++;
+
+    // allocate space for n vertices, and an edge and a co-edge per nonzero
+    // flow, numbered from 2 since tot starts at 1
+    initialize_state(S, n + 1, (2 * nonzero) + 2, one_, seed);
+
+    for(int i = 1; i <= nrevs; i++) S->ri[i] = subsets[i-1];
+
+    for(int i = 0; i < nedges; i++)
+    {
+        int x = revs[i] + 1; // reviewer numbers start at 1
+        int y = paps[i] + nrevs + 1; // and paper numbers at nrevs + 1
+        int z = flows[i];
+
+        S->c[x] += z; // update load counters at vertices
+        S->c[y] -= z;
+        if(z != 0) // if flow is nonzero, add edge
+        {
+            ae(S, x, y, z);
+            ae(S, y, x, S->one - z);
+
+            ai(S, y, S->ri[x], z); // and update flow counter for paper-institution pair
+
+            cnr(S, S->tot); // remove edge if flow is already integral
+        }
+    }
+
+    push_flows(S, n);
+
+    // the edge from the reviewer of the k-th nonzero flow has pointer 2k + 2
+    int p = 2;
+    for(int i = 0; i < nedges; i++)
+    {
+        if(flows[i] != 0)
+        {
+            flows[i] = S->f[p] == S->one;
+            p += 2;
+        }
+    }
+
+    free_buffers(S);
+    return 0;
+}
+
+// pushes flow along paths / cycles of fractional edges until every edge is integral
+void push_flows(bvn_state* S, int n)
+{
+    while(S->m) // while there are still fractional edges left
+    {
+        if(debug) printf("%d\n", S->m);
+        memset(S->s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
+        for(int i = 1; i <= n; i++) // try to find paths / cycles starting from vertices with fractional load
+            if(!in(S, S->c[i]))
+            {
+                S->top = 0;
+                if(go(S, i, 0, 1)) break;
+            }
+
+        memset(S->s, 0, (n + 1) * sizeof(int)); // mark all vertices unvisited
+        for(int i = 1; i <= n; i++) // now try to find cycles only starting from all vertices
+        {
+            S->top = 0;
+            if(go(S, i, 0, 0)) break;
+        }
+    }
+}
+
 // main algorithm logic, searches for a path/cycle and pushes flow when found
-int go(int x, int y, int p) // x: current vertex, y: previous edge, p: whether finding a path
+int go(bvn_state* S, int x, int y, int p) // x: current vertex, y: previous edge, p: whether finding a path
 {
-    if(debug) printf("%d %d %d %d\n", x, y, p, top);
-    if(y) st[++top] = y; // push incoming edge into stack
+    if(debug) printf("%d %d %d %d\n", x, y, p, S->top);
+    if(y) S->st[++S->top] = y; // push incoming edge into stack
     int ret = 0, t = 0, yi = 0, zi = 0;
 
-    if(!hi[x]) // x is a reviewer
+    if(!S->hi[x]) // x is a reviewer
     {
-        if(debug) printf("c: %d\n", c[x]);
-        if(s[x]) // found a cycle
+        if(debug) printf("c: %d\n", S->c[x]);
+        if(S->s[x]) // found a cycle
         {
-            fw = bw = one;
-            btm = 0;
+            S->fw = S->bw = S->one;
+            S->btm = 0;
 
-            for(int i = 1; i <= top; i++) // cycle starts from previous edge leaving x
-                if(u[st[i]] == x)
+            for(int i = 1; i <= S->top; i++) // cycle starts from previous edge leaving x
+                if(S->u[S->st[i]] == x)
                 {
-                    btm = i;
+                    S->btm = i;
                     break;
                 }
 
-            if(debug) printf("r cycle: %d\n", btm);
+            if(debug) printf("r cycle: %d\n", S->btm);
 
             return 1;
         }
 
-        if(y && p && (!in(c[x]))) // found a path
+        if(y && p && (!in(S, S->c[x]))) // found a path
         {
-            fw = ce(c[x]) - c[x];
-            bw = c[x] - fl(c[x]);
-            btm = 1; // path always starts from first edge
-            if(debug) printf("r path: %d\n", btm);
+            S->fw = ce(S, S->c[x]) - S->c[x];
+            S->bw = S->c[x] - fl(S, S->c[x]);
+            S->btm = 1; // path always starts from first edge
+            if(debug) printf("r path: %d\n", S->btm);
             return 1;
         }
 
-        s[x] = 1; // mark reviewer visited
-        t = tr(x, 0);
+        S->s[x] = 1; // mark reviewer visited
+        t = tr(S, x, 0);
 
         if(!t) // for some reason no fractional edge is available (should only happen when y = 0)
         {
             if(debug && y) printf("r dead end\n");
-            fw = bw = 0;
+            S->fw = S->bw = 0;
             return 0;
         }
-        if(debug) printf("f[t]: %d\n", f[t]);
-        se[t] = se[t ^ 1] = 1; // mark outgoing edge visited
-        ret = go(v[t], t, p); // go to next vertex (which should be a paper)
-        se[t] = se[t ^ 1] = 0; // and then unmark
-        fw = min(fw, f[t]);
-        bw = min(bw, f[t ^ 1]);
+        if(debug) printf("f[t]: %d\n", S->f[t]);
+        S->se[t] = S->se[t ^ 1] = 1; // mark outgoing edge visited
+        ret = go(S, S->v[t], t, p); // go to next vertex (which should be a paper)
+        S->se[t] = S->se[t ^ 1] = 0; // and then unmark
+        S->fw = min(S->fw, S->f[t]);
+        S->bw = min(S->bw, S->f[t ^ 1]);
     }
     else // x is a paper
     {
-        yi = fi(x, ri[u[y]]); // set yi to institution of incoming edge
+        yi = fi(S, x, S->ri[S->u[y]]); // set yi to institution of incoming edge
 
-        if(debug) printf("c: %d, ci: %d\n", c[x], ci[yi]);
+        if(debug) printf("c: %d, ci: %d\n", S->c[x], S->ci[yi]);
 
-        if(si[yi]) // found an ``even'' cycle (never happens when y = yi = 0)
+        if(S->si[yi]) // found an ``even'' cycle (never happens when y = yi = 0)
         {
-            fw = bw = one;
-            btm = 0;
+            S->fw = S->bw = S->one;
+            S->btm = 0;
 
-            for(int i = 1; i <= top; i++)
-                if(u[st[i]] == x && ri[v[st[i]]] == vi[yi]) // find first edge in stack (1) leaving x and (2) going to institution of incoming edge -- cycle starts there
+            for(int i = 1; i <= S->top; i++)
+                if(S->u[S->st[i]] == x && S->ri[S->v[S->st[i]]] == S->vi[yi]) // find first edge in stack (1) leaving x and (2) going to institution of incoming edge -- cycle starts there
                 {
-                    btm = i;
+                    S->btm = i;
                     break;
                 }
 
-            if(debug) printf("p even cycle: %d\n", btm);
+            if(debug) printf("p even cycle: %d\n", S->btm);
 
             return 1;
         }
 
-        if(s[x] && !in(ci[yi])) // found an ``odd'' cycle
+        if(S->s[x] && !in(S, S->ci[yi])) // found an ``odd'' cycle
         {
-            fw = ci[yi] - fl(ci[yi]);
-            bw = ce(ci[yi]) - ci[yi];
-            btm = 0;
+            S->fw = S->ci[yi] - fl(S, S->ci[yi]);
+            S->bw = ce(S, S->ci[yi]) - S->ci[yi];
+            S->btm = 0;
 
             int wi = 0;
 
-            for(int i = 1; i <= top; i++) // cycle starts from first edge leaving x which belongs to a fractional institution
-                if(u[st[i]] == x)
+            for(int i = 1; i <= S->top; i++) // cycle starts from first edge leaving x which belongs to a fractional institution
+                if(S->u[S->st[i]] == x)
                 {
-                    wi = fi(x, ri[v[st[i]]]);
-                    if(!in(ci[wi]))
+                    wi = fi(S, x, S->ri[S->v[S->st[i]]]);
+                    if(!in(S, S->ci[wi]))
                     {
-                        btm = i;
+                        S->btm = i;
                         break;
                     }
                 }
 
-            fw = min(fw, ce(ci[wi]) - ci[wi]);
-            bw = min(bw, ci[wi] - fl(ci[wi]));
+            S->fw = min(S->fw, ce(S, S->ci[wi]) - S->ci[wi]);
+            S->bw = min(S->bw, S->ci[wi] - fl(S, S->ci[wi]));
 
-            if(debug) printf("p odd cycle: %d\n", btm);
+            if(debug) printf("p odd cycle: %d\n", S->btm);
 
             return 1;
         }
 
-        if(y && p && (!in(c[x])) && (!in(ci[yi]))) // found a path
+        if(y && p && (!in(S, S->c[x])) && (!in(S, S->ci[yi]))) // found a path
         {
-            fw = ce(c[x]) - c[x];
-            bw = c[x] - fl(c[x]);
-            fw = min(fw, ci[yi] - fl(ci[yi]));
-            bw = min(bw, ce(ci[yi]) - ci[yi]);
-            btm = 1; // path always starts from first edge
-            if(debug) printf("p path: %d\n", btm);
+            S->fw = ce(S, S->c[x]) - S->c[x];
+            S->bw = S->c[x] - fl(S, S->c[x]);
+            S->fw = min(S->fw, S->ci[yi] - fl(S, S->ci[yi]));
+            S->bw = min(S->bw, ce(S, S->ci[yi]) - S->ci[yi]);
+            S->btm = 1; // path always starts from first edge
+            if(debug) printf("p path: %d\n", S->btm);
             return 1;
         }
 
-        if(in(ci[yi])) // integral institution load -- leave through the same institution (equivalent to the other case when y = yi = 0)
-            t = tr(x, vi[yi]);
+        if(in(S, S->ci[yi])) // integral institution load -- leave through the same institution (equivalent to the other case when y = yi = 0)
+            t = tr(S, x, S->vi[yi]);
         else // leave through any fractional institution
-            t = tr(x, 0);
+            t = tr(S, x, 0);
 
         if(!t) // should only happen when y = 0
         {
-            fw = bw = 0;
+            S->fw = S->bw = 0;
             if(debug && y) printf("p dead end\n");
             return 0;
         }
 
-        if(debug) printf("f[t]: %d\n", f[t]);
+        if(debug) printf("f[t]: %d\n", S->f[t]);
 
-        zi = fi(x, ri[v[t]]); // set zi to instituion of outgoing edge
-        si[zi] = 1; // mark paper-instution pair visited
-        se[t] = se[t ^ 1] = 1; // mark edge visited
-        if(!in(ci[zi])) s[x] = 1; // and if leaving through a fractional instituion -- mark vertex visited
+        zi = fi(S, x, S->ri[S->v[t]]); // set zi to instituion of outgoing edge
+        S->si[zi] = 1; // mark paper-instution pair visited
+        S->se[t] = S->se[t ^ 1] = 1; // mark edge visited
+        if(!in(S, S->ci[zi])) S->s[x] = 1; // and if leaving through a fractional instituion -- mark vertex visited
 
-        ret = go(v[t], t, p); // go to next vertex (which should be a reviewer)
+        ret = go(S, S->v[t], t, p); // go to next vertex (which should be a reviewer)
 
-        si[zi] = 0; // unmark institution
-        se[t] = se[t ^ 1] = 0; // and unmark edge
+        S->si[zi] = 0; // unmark institution
+        S->se[t] = S->se[t ^ 1] = 0; // and unmark edge
 
-        fw = min(fw, f[t]);
-        bw = min(bw, f[t ^ 1]);
+        S->fw = min(S->fw, S->f[t]);
+        S->bw = min(S->bw, S->f[t ^ 1]);
     }
 
-    if(t == st[btm] && fw + bw != 0) // if path / cycle starts from current edge, clear path / cycle
+    if(t == S->st[S->btm] && S->fw + S->bw != 0) // if path / cycle starts from current edge, clear path / cycle
     {
         if((!y) && p) // it's a path
         {
-            fw = min(fw, c[x] - fl(c[x]));
-            bw = min(bw, ce(c[x]) - c[x]);
-            if(hi[x]) // need to consider load of paper-insitution pair of outgoing edge too
+            S->fw = min(S->fw, S->c[x] - fl(S, S->c[x]));
+            S->bw = min(S->bw, ce(S, S->c[x]) - S->c[x]);
+            if(S->hi[x]) // need to consider load of paper-insitution pair of outgoing edge too
             {
-                int yi = fi(x, ri[v[t]]);
-                fw = min(fw, ce(ci[yi]) - ci[yi]);
-                bw = min(bw, ci[yi] - fl(ci[yi]));
+                int yi = fi(S, x, S->ri[S->v[t]]);
+                S->fw = min(S->fw, ce(S, S->ci[yi]) - S->ci[yi]);
+                S->bw = min(S->bw, S->ci[yi] - fl(S, S->ci[yi]));
             }
         }
-        if(debug) printf("clearing a path/cycle: %d %d\n", fw, bw);
+        if(debug) printf("clearing a path/cycle: %d %d\n", S->fw, S->bw);
         int r, d;
-        if(((double)rand()) / RAND_MAX < ((double)bw) / (fw + bw)) // update forward wp bw / (fw + bw), etc
+        if(random_double(S) < ((double)S->bw) / (S->fw + S->bw)) // update forward wp bw / (fw + bw), etc
         {
             d = 1;
-            r = fw;
+            r = S->fw;
         }
         else
         {
             d = -1;
-            r = bw;
+            r = S->bw;
         }
 
-        for(int i = btm; i <= top; i++) upd(st[i], r * d); // update every edge on path / cycle
-        fw = bw = 0;
+        for(int i = S->btm; i <= S->top; i++) upd(S, S->st[i], r * d); // update every edge on path / cycle
+        S->fw = S->bw = 0;
     }
 
-    if(hi[x] && yi != zi) // this part of update must happen after clearing cycle / path
+    if(S->hi[x] && yi != zi) // this part of update must happen after clearing cycle / path
     {
-        fw = min(fw, ce(ci[zi]) - ci[zi]);
-        bw = min(bw, ci[zi] - fl(ci[zi]));
+        S->fw = min(S->fw, ce(S, S->ci[zi]) - S->ci[zi]);
+        S->bw = min(S->bw, S->ci[zi] - fl(S, S->ci[zi]));
 
-        fw = min(fw, ci[yi] - fl(ci[yi]));
-        bw = min(bw, ce(ci[yi]) - ci[yi]);
+        S->fw = min(S->fw, S->ci[yi] - fl(S, S->ci[yi]));
+        S->bw = min(S->bw, ce(S, S->ci[yi]) - S->ci[yi]);
     }
 
     return ret;
@@ -341,96 +428,96 @@ int go(int x, int y, int p) // x: current vertex, y: previous edge, p: whether f
 
 /* FLOW GRAPH MODIFICATION FUNCTIONS */
 
-void ae(int x, int y, int z) // add an edge from x to y with flow z (and implicitly with capacity 1); also add a co-edge from y to x; note that co-edge of an edge with pointer p has pointer p ^ 1
+void ae(bvn_state* S, int x, int y, int z) // add an edge from x to y with flow z (and implicitly with capacity 1); also add a co-edge from y to x; note that co-edge of an edge with pointer p has pointer p ^ 1
 {
-    ++m;
-    u[++tot] = x;
-    v[tot] = y;
-    f[tot] = z;
-    l[tot] = h[x];
-    h[x] = tot;
+    ++S->m;
+    S->u[++S->tot] = x;
+    S->v[S->tot] = y;
+    S->f[S->tot] = z;
+    S->l[S->tot] = S->h[x];
+    S->h[x] = S->tot;
 }
 
-int fi(int p, int i) // find the pointer at paper p for instution i
+int fi(bvn_state* S, int p, int i) // find the pointer at paper p for instution i
 {
-    for(int j = hi[p]; j; j = li[j])
-        if(vi[j] == i) return j;
+    for(int j = S->hi[p]; j; j = S->li[j])
+        if(S->vi[j] == i) return j;
     return 0;
 }
 
-void ai(int p, int i, int w) // add an amount of load, w, to a paper-instution pair (p, i)
+void ai(bvn_state* S, int p, int i, int w) // add an amount of load, w, to a paper-instution pair (p, i)
 {
-    int j = fi(p, i);
+    int j = fi(S, p, i);
     if(j)
-        ci[j] += w;
+        S->ci[j] += w;
     else
     {
-        vi[++ti] = i;
-        li[ti] = hi[p];
-        ci[ti] = w;
-        hi[p] = ti;
+        S->vi[++S->ti] = i;
+        S->li[S->ti] = S->hi[p];
+        S->ci[S->ti] = w;
+        S->hi[p] = S->ti;
     }
 }
 
-void re(int x) // remove edge with pointer x
+void re(bvn_state* S, int x) // remove edge with pointer x
 {
-    --m;
-    int t = u[x];
-    if(x == h[t])
+    --S->m;
+    int t = S->u[x];
+    if(x == S->h[t])
     {
-        h[t] = l[x];
+        S->h[t] = S->l[x];
         return;
     }
-    int i = h[t];
-    while(l[i] != x)
-        i = l[i];
-    l[i] = l[x];
+    int i = S->h[t];
+    while(S->l[i] != x)
+        i = S->l[i];
+    S->l[i] = S->l[x];
 }
 
-int tr(int x, int i) // find a fractional edge adjacent to x not visited yet belonging to institution i (or any insitution with fractional paper-instituion load when i = 0)
+int tr(bvn_state* S, int x, int i) // find a fractional edge adjacent to x not visited yet belonging to institution i (or any insitution with fractional paper-instituion load when i = 0)
 {
-    if(!hi[x])
+    if(!S->hi[x])
     {
-        for(int j = h[x]; j; j = l[j])
-            if(!se[j]) return j;
+        for(int j = S->h[x]; j; j = S->l[j])
+            if(!S->se[j]) return j;
     }
     else if(!i)
     {
-        for(int j = hi[x]; j; j = li[j])
-            if(!in(ci[j]))
+        for(int j = S->hi[x]; j; j = S->li[j])
+            if(!in(S, S->ci[j]))
             {
-                int t = tr(x, vi[j]);
+                int t = tr(S, x, S->vi[j]);
                 if(t) return t;
             }
     }
     else
-        for(int j = h[x]; j; j = l[j])
-            if(ri[v[j]] == i && !se[j]) return j;
+        for(int j = S->h[x]; j; j = S->l[j])
+            if(S->ri[S->v[j]] == i && !S->se[j]) return j;
     return 0;
 }
 
-void cnr(int x) // if edge with pointer x has flow 0 or 1, then remove it and its co-edge
+void cnr(bvn_state* S, int x) // if edge with pointer x has flow 0 or 1, then remove it and its co-edge
 {
-    if(f[x] == 0 || f[x] == one)
+    if(S->f[x] == 0 || S->f[x] == S->one)
     {
-        re(x);
-        re(x ^ 1);
+        re(S, x);
+        re(S, x ^ 1);
     }
 }
 
-void upd(int x, int y) // add flow y to edge with pointer x; update all load counters associated with the edge
+void upd(bvn_state* S, int x, int y) // add flow y to edge with pointer x; update all load counters associated with the edge
 {
-    f[x] -= y;
-    f[x ^ 1] += y;
-    c[u[x]] -= y;
-    c[v[x]] += y;
+    S->f[x] -= y;
+    S->f[x ^ 1] += y;
+    S->c[S->u[x]] -= y;
+    S->c[S->v[x]] += y;
 
-    if(hi[v[x]])
-        ai(v[x], ri[u[x]], -y);
+    if(S->hi[S->v[x]])
+        ai(S, S->v[x], S->ri[S->u[x]], -y);
     else
-        ai(u[x], ri[v[x]], y);
+        ai(S, S->u[x], S->ri[S->v[x]], y);
 
-    cnr(x);
+    cnr(S, x);
 }
 
 
@@ -456,45 +543,62 @@ int min(int a, int b)
 	return (a <= b) ? a : b;
 }
 
-int fl(int x) // floor
+int fl(bvn_state* S, int x) // floor
+{
+    return floor(((double)x) / S->one) * S->one;
+}
+
+int ce(bvn_state* S, int x) // ceiling
 {
-    return floor(((double)x) / one) * one;
+    return ceil(((double)x) / S->one) * S->one;
 }
 
-int ce(int x) // ceiling
+int in(bvn_state* S, int x) // whether a number is ``integral''
 {
-    return ceil(((double)x) / one) * one;
+    return x == fl(S, x) || x == ce(S, x);
 }
 
-int in(int x) // whether a number is ``integral''
+void initialize_state(bvn_state* S, int vsize, int esize, int one_, uint64_t seed)
 {
-    return x == fl(x) || x == ce(x);
+	S->one = one_;
+	S->h = alloc_int(vsize);
+	S->u = alloc_int(esize);
+	S->v = alloc_int(esize);
+	S->l = alloc_int(esize);
+	S->se = alloc_int(esize);
+	S->s = alloc_int(vsize);
+	S->ri = alloc_int(vsize);
+	S->hi = alloc_int(vsize);
+	S->vi = alloc_int(esize);
+	S->li = alloc_int(esize);
+	S->si = alloc_int(esize);
+	S->st = alloc_int(esize);
+	S->f = alloc_int(esize);
+	S->c = alloc_int(vsize);
+	S->ci = alloc_int(esize);
+	S->fw = 0;
+	S->bw = 0;
+	S->m = 0;
+	S->ti = 0;
+	S->top = 0;
+	S->btm = 0;
+	S->tot = 1;
+
+	// scramble the seed with splitmix64, so that close seeds give unrelated
+	// sequences, and avoid the all-zero state xorshift cannot leave
+	seed += 0x9E3779B97F4A7C15ULL;
+	seed = (seed ^ (seed >> 30)) * 0xBF58476D1CE4E5B9ULL;
+	seed = (seed ^ (seed >> 27)) * 0x94D049BB133111EBULL;
+	seed ^= seed >> 31;
+	S->rng = seed ? seed : 0x9E3779B97F4A7C15ULL;
 }
 
-void initialize_state(int vsize, int esize)
+double random_double(bvn_state* S) // uniform random number in [0, 1) from the xorshift64* generator
 {
-	h = alloc_int(vsize);
-	u = alloc_int(esize);
-	v = alloc_int(esize);
-	l = alloc_int(esize);
-	se = alloc_int(esize);
-	s = alloc_int(vsize);
-	ri = alloc_int(vsize);
-	hi = alloc_int(vsize);
-	vi = alloc_int(esize);
-	li = alloc_int(esize);
-	si = alloc_int(esize);
-	st = alloc_int(esize);
-	f = alloc_int(esize);
-	c = alloc_int(vsize);
-	ci = alloc_int(esize);
-	fw = 0;
-	bw = 0;
-	m = 0;
-	ti = 0;
-	top = 0;
-	btm = 0;
-	tot = 1;
+	S->rng ^= S->rng >> 12;
+	S->rng ^= S->rng << 25;
+	S->rng ^= S->rng >> 27;
+	return ((S->rng * 0x2545F4914F6CDD1DULL) >> 11) * (1.0 / 9007199254740992.0);
 }
 
 int* alloc_int(int size)
@@ -502,21 +606,21 @@ int* alloc_int(int size)
 	return (int*) calloc(size, sizeof(int));
 }
 
-void free_buffers(void)
+void free_buffers(bvn_state* S)
 {
-	free(h);
-	free(u);
-	free(v);
-	free(l);
-	free(se);
-	free(s);
-	free(ri);
-	free(hi);
-	free(vi);
-	free(li);
-	free(si);
-	free(st);
-	free(f);
-	free(c);
-	free(ci);
+	free(S->h);
+	free(S->u);
+	free(S->v);
+	free(S->l);
+	free(S->se);
+	free(S->s);
+	free(S->ri);
+	free(S->hi);
+	free(S->vi);
+	free(S->li);
+	free(S->si);
+	free(S->st);
+	free(S->f);
+	free(S->c);
+	free(S->ci);
 }
@@ -6,13 +6,16 @@ from cffi import FFI
 
 ffibuilder = FFI()
 
-header = (
-    "int run_bvn(int* flows, int* subsets, int nrevs, int npaps, int one_);"
-)
+header = """
+int run_bvn(int* flows, int* subsets, int nrevs, int npaps, int one_,
+            uint64_t seed);
+int run_bvn_sparse(int* paps, int* revs, int* flows, int nedges, int* subsets,
+                   int npaps, int nrevs, int one_, uint64_t seed);
+"""
 ffibuilder.cdef(header)
 ffibuilder.set_source(
     "_bvn_extension",  # extension name
-    header,
+    "#include <stdint.h>\n" + header,
     sources=["matcher/solvers/bvn_extension/bvn.c"],
     libraries=["m"],
 )  # link with the math library
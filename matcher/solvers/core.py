@@ -1,4 +1,83 @@
+import sys
+import time
+
+import numpy as np
+
+
 class SolverException(Exception):
     """Exception wrapper class for errors related to the SimpleSolver"""
 
     pass
+
+
+class Deadline:
+    """
+    A time budget in seconds, counted from construction. A budget of None
+    never runs out. Solvers check it between the steps of their searches and
+    keep their best feasible result when it runs out.
+    """
+
+    def __init__(self, time_budget=None):
+        if time_budget is not None and time_budget <= 0:
+            raise SolverException(
+                "time_budget ({}) must be positive".format(time_budget)
+            )
+        self.time_budget = time_budget
+        self.start = time.monotonic()
+
+    def remaining(self):
+        """Seconds left in the budget, or None without a budget"""
+        if self.time_budget is None:
+            return None
+        return max(0.0, self.time_budget - (time.monotonic() - self.start))
+
+    def expired(self):
+        """Whether the budget has run out"""
+        return self.time_budget is not None and self.remaining() == 0
+
+    def allows(self, duration):
+        """Whether a step expected to take `duration` seconds fits in the budget"""
+        return self.time_budget is None or self.remaining() >= duration
+
+
+def issparse(matrix):
+    """
+    scipy.sparse.issparse, without importing scipy: a sparse matrix can only
+    exist once scipy.sparse has been imported.
+    """
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(matrix)
+
+
+def reviewers_without_known_affinity(
+    score_matrix, constraint_matrix, allow_forced=False, chunk_cells=1 << 20
+):
+    """
+    Return the indices of reviewers with no non-zero score for any paper they
+    are not constrained on. Both matrices are (#papers, #reviewers); if
+    `allow_forced` is True, forced pairs (constraint 1) also count as known.
+
+    Papers are checked in chunks of about `chunk_cells` cells, so only small
+    boolean masks are built and the matrices keep their own dtypes.
+    """
+    num_papers, num_reviewers = np.shape(score_matrix)
+    chunk_size = max(1, chunk_cells // max(1, num_reviewers))
+    has_known_affinity = np.zeros(num_reviewers, dtype=bool)
+    for start in range(0, num_papers, chunk_size):
+        rows = slice(start, start + chunk_size)
+        constraints = constraint_matrix[rows]
+        allowed = constraints >= 0 if allow_forced else constraints == 0
+        has_known_affinity |= np.logical_and(
+            score_matrix[rows] != 0, allowed
+        ).any(axis=0)
+    return np.flatnonzero(~has_known_affinity)
+
+
+def random_matrix_like(matrix):
+    """
+    Return uniform [0, 1) values with the shape of `matrix`, used in place of
+    all-zero scores. The dtype is float32 for float32 input and float64 otherwise.
+    """
+    return np.random.rand(*np.shape(matrix)).astype(
+        np.promote_types(matrix.dtype, np.float32), copy=False
+    )
@@ -3,7 +3,12 @@ from ortools.graph.python import min_cost_flow
 import numpy as np
 import uuid
 import time
-from .core import SolverException
+from .core import (
+    Deadline,
+    SolverException,
+    reviewers_without_known_affinity,
+    random_matrix_like,
+)
 import logging
 
 
@@ -30,6 +35,8 @@ class FairFlow(object):
     the matching.
     """
 
+    supports_time_budget = True
+
     def __init__(
         self,
         minimums,
@@ -39,6 +46,7 @@ class FairFlow(object):
         allow_zero_score_assignments=False,
         solution=None,
         logger=logging.getLogger(__name__),
+        time_budget=None,
     ):
         """
         Initialize a makespan flow matcher
@@ -50,9 +58,14 @@ class FairFlow(object):
         :param allow_zero_score_assignments: bool to allow pairs with zero affinity in the solution.
             unknown matching scores default to 0. set to True to allow zero (unknown) affinity in solution.
         :param solution: a matrix of assignments (same shape as encoder.affinity_matrix)
+        :param time_budget: seconds the makespan search may take, or None. When they run out,
+            the search stops at the best makespan found so far.
 
         :return: initialized makespan matcher.
         """
+        self.deadline = Deadline(time_budget)
+        self.time_budget_exhausted = False
+        self.makespan_gap = None
         self.logger = logger
         self.allow_zero_score_assignments = allow_zero_score_assignments
         self.logger.debug("Init FairFlow")
@@ -65,7 +78,7 @@ class FairFlow(object):
         # make sure that all weights are positive:
         self.affinity_matrix = affinity_matrix.copy()
         if not self.affinity_matrix.any():
-            self.affinity_matrix = np.random.rand(*affinity_matrix.shape)
+            self.affinity_matrix = random_matrix_like(affinity_matrix)
 
         self.orig_affinities = self.affinity_matrix.copy()
 
@@ -74,13 +87,9 @@ class FairFlow(object):
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.affinity_matrix * (self.constraint_matrix == 0).T)
-                    == 0,
-                    axis=1,
-                )
-            )[0]
+            bad_affinity_reviewers = reviewers_without_known_affinity(
+                self.affinity_matrix.T, self.constraint_matrix
+            )
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -148,6 +157,20 @@ class FairFlow(object):
         """Get the objective value of the RAP."""
         return np.sum(self.sol_as_mat() * self.orig_affinities)
 
+    def get_additional_status_info(self):
+        """
+        With a time budget, whether it ran out, the objective, and the makespan
+        with the width of the interval the search left it in.
+        """
+        if self.deadline.time_budget is None or not self.valid:
+            return {}
+        return {
+            "time_budget_exhausted": str(self.time_budget_exhausted),
+            "objective": str(self.objective_val()),
+            "makespan": str(self.makespan),
+            "makespan_gap": str(self.makespan_gap),
+        }
+
     def _refresh_internal_vars(self):
         """Set start, end, caps, costs to be empty."""
         self.min_cost_flow = min_cost_flow.SimpleMinCostFlow()
@@ -654,7 +677,16 @@ class FairFlow(object):
         best = None
         best_worst_pap_score = 0.0
 
+        iteration_time = 0.0
         for i in range(10):
+            if not self.deadline.allows(iteration_time):
+                self.logger.debug(
+                    "#info FairFlow:time budget exhausted after %s iterations"
+                    % i
+                )
+                self.time_budget_exhausted = True
+                break
+            iteration_start = time.time()
             self.logger.debug("#info FairFlow:ITERATION %s ms %s" % (i, ms))
             try:
                 s1, s3 = self.try_improve_ms()
@@ -713,6 +745,9 @@ class FairFlow(object):
                 ms -= (ms - mn) / 2.0
             self.makespan = ms
             self.solution = self.starter_solution.copy()
+            iteration_time = time.time() - iteration_start
+        # the best makespan is at least mn and less than mx
+        self.makespan_gap = mx - mn
         self.logger.debug("#info FairFlow:Best found %s" % best)
         self.logger.debug(
             "#info FairFlow:Best Worst Paper Score found %s"
@@ -5,7 +5,7 @@ import logging
 import math
 import json
 import psutil
-from .core import SolverException
+from .core import Deadline, SolverException, reviewers_without_known_affinity
 
 from .basic_gurobi import Basic
 from gurobipy import *
@@ -17,6 +17,8 @@ class FairIR(Basic):
 
     """
 
+    supports_time_budget = True
+
     def __init__(
         self,
         minimums,
@@ -26,7 +28,8 @@ class FairIR(Basic):
         thresh=0.0,
         ##thresh=0.005, ## default value for NeurIPS
         allow_zero_score_assignments=False,
-        logger=logging.getLogger(__name__)
+        logger=logging.getLogger(__name__),
+        time_budget=None
         ):
         """Initialize.
 
@@ -40,11 +43,20 @@ class FairIR(Basic):
             weights (stored in encoder) - the affinity matrix (np.array) of papers to reviewers.
                    Rows correspond to reviewers and columns correspond to
                    papers.
+            time_budget - seconds the solve may take, or None. Each LP gets the
+                   time left as its Gurobi TimeLimit; when it runs out, the
+                   makespan search stops at the best makespan found and the
+                   fairness constraints are dropped to round the solution.
 
             Returns:
                 initialized makespan matcher.
         """
 
+        self.deadline = Deadline(time_budget)
+        self.time_budget_exhausted = False
+        self.fairness_dropped = False
+        self.makespan_gap = None
+
         # TODO: To allow zero score assignment, add small epsilon to all zero valued entries to avoid loss of data
         #     : during sparsification
 
@@ -111,13 +123,9 @@ class FairIR(Basic):
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (encoder.aggregate_score_matrix.T * (encoder.constraint_matrix == 0).T)
-                    == 0,
-                    axis=1,
-                )
-            )[0]
+            bad_affinity_reviewers = reviewers_without_known_affinity(
+                encoder.aggregate_score_matrix, encoder.constraint_matrix
+            )
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -398,6 +406,42 @@ class FairIR(Basic):
             self.fix_assignment(i, j, 0.0)
             integral_assignments[i][j] = 0.0
 
+    def _optimize(self):
+        """Optimize the model within the time left in the budget."""
+        remaining = self.deadline.remaining()
+        if remaining is not None and not self.fairness_dropped:
+            self.m.setParam('TimeLimit', remaining)
+        self.m.optimize()
+
+    def _drop_fairness(self):
+        """Remove the makespan constraints once the time budget has run out.
+
+        Without them (and without attribute constraints) the LP only has load
+        and coverage constraints, so its optimal vertex is integral and the
+        rounding finishes in one more solve, which gets no time limit.
+        """
+        self._log_and_profile('#info FairIR:time budget exhausted, dropping the makespan constraints')
+        self.time_budget_exhausted = True
+        self.fairness_dropped = True
+        self.m.setParam('TimeLimit', GRB.INFINITY)
+        self.change_makespan(0.0)
+        self.name_to_constraint = {
+            name: c for name, c in self.name_to_constraint.items()
+            if not name.startswith(self.ms_constr_prefix)
+        }
+
+    def get_additional_status_info(self):
+        """With a time budget, whether it ran out, the objective, and the
+        makespan with the width of the interval the search left it in."""
+        if self.deadline.time_budget is None or self.solution is None:
+            return {}
+        return {
+            "time_budget_exhausted": str(self.time_budget_exhausted),
+            "objective": str(np.sum(self.solution * self.weights)),
+            "makespan": str(self.makespan),
+            "makespan_gap": str(self.makespan_gap),
+        }
+
     def find_ms(self):
         self._log_and_profile('#info FairIR:FIND_MS call')
         """Find an the highest possible makespan.
@@ -418,10 +462,15 @@ class FairIR(Basic):
         best = None
         self.change_makespan(ms)
         start = time.time()
-        self.m.optimize()
-        self._log_and_profile('#info FairIR:Time to solve %s' % (time.time() - start))
+        self._optimize()
+        iteration_time = time.time() - start
+        self._log_and_profile('#info FairIR:Time to solve %s' % iteration_time)
         for i in range(10):
             self._log_and_profile('#info FairIR:ITERATION %s ms %s' % (i, ms))
+            if self.m.status == GRB.TIME_LIMIT:
+                self._log_and_profile('#info FairIR:time budget exhausted after %s iterations' % i)
+                self.time_budget_exhausted = True
+                break
             if self.m.status == GRB.INFEASIBLE:
                 mx = ms
                 ms -= (ms - mn) / 2.0
@@ -431,10 +480,17 @@ class FairIR(Basic):
                 best = ms
                 mn = ms
                 ms += (mx - ms) / 2.0
+            if not self.deadline.allows(iteration_time):
+                self._log_and_profile('#info FairIR:time budget exhausted after %s iterations' % (i + 1))
+                self.time_budget_exhausted = True
+                break
             self.change_makespan(ms)
             start = time.time()
-            self.m.optimize()
-            self._log_and_profile('#info FairIR:Time to solve %s' % (time.time() - start))
+            self._optimize()
+            iteration_time = time.time() - start
+            self._log_and_profile('#info FairIR:Time to solve %s' % iteration_time)
+        # the best makespan is at least mn and less than mx
+        self.makespan_gap = mx - mn
         self._log_and_profile(f'#info RETURN FairIR:FIND_MS call ms={best}')
 
         if best is None:
@@ -524,7 +580,12 @@ class FairIR(Basic):
         """
 
         start = time.time()
-        self.m.optimize()
+        if self.deadline.expired() and not self.fairness_dropped:
+            self._drop_fairness()
+        self._optimize()
+        if self.m.status == GRB.TIME_LIMIT:
+            self._drop_fairness()
+            self.m.optimize()
 
         self._log_and_profile('#info FairIR:Time to solve %s' % (time.time() - start))
 
@@ -1,9 +1,15 @@
 import math
 import numpy as np
+from collections import namedtuple
 from sortedcontainers import SortedList
 import time
 import uuid
-from .core import SolverException
+from .core import (
+    Deadline,
+    SolverException,
+    reviewers_without_known_affinity,
+    random_matrix_like,
+)
 import logging
 
 
@@ -15,6 +21,10 @@ class PickingSequenceException(Exception):
     pass
 
 
+# the matrices MinMaxSolver reads from an encoder
+CostMatrices = namedtuple("CostMatrices", ["cost_matrix", "constraint_matrix"])
+
+
 class FairSequence(object):
     """
     Assign reviewers using a modified version of the Greedy Reviewer Round-Robin algorithm
@@ -32,6 +42,8 @@ class FairSequence(object):
     during the process and potentially making some reviewer trades if necessary.
     """
 
+    supports_time_budget = True
+
     def __init__(
         self,
         minimums,
@@ -41,6 +53,7 @@ class FairSequence(object):
         allow_zero_score_assignments=False,
         solution=None,
         logger=logging.getLogger(__name__),
+        time_budget=None,
     ):
         """
         Initialize a FairSequence matcher
@@ -52,15 +65,21 @@ class FairSequence(object):
         :param allow_zero_score_assignments: bool to allow pairs with zero affinity in the solution.
             unknown matching scores default to 0. set to True to allow zero (unknown) affinity in solution.
         :param solution: a matrix of assignments (same shape as encoder.affinity_matrix)
+        :param time_budget: seconds the picking sequence may take, or None. When they run out,
+            the demand left is assigned by a min-cost flow, without the WEF1 guarantee.
 
         :return: initialized FairSequence matcher.
         """
+        self.deadline = Deadline(time_budget)
+        self.time_budget_exhausted = False
+        self.completed_pairs = 0
         self.logger = logger
         self.allow_zero_score_assignments = allow_zero_score_assignments
         self.logger.debug("Init FairSequence")
         self.constraint_matrix = encoder.constraint_matrix.transpose()
+        # integer scores are promoted to float, float32 scores stay float32
         affinity_matrix = encoder.aggregate_score_matrix.transpose().astype(
-            np.float64
+            np.promote_types(encoder.aggregate_score_matrix.dtype, np.float32)
         )
 
         self.maximums = np.array(maximums)
@@ -69,7 +88,7 @@ class FairSequence(object):
 
         self.affinity_matrix = affinity_matrix.copy()
         if not self.affinity_matrix.any():
-            self.affinity_matrix = np.random.rand(*affinity_matrix.shape)
+            self.affinity_matrix = random_matrix_like(affinity_matrix)
 
         self.orig_affinities = self.affinity_matrix.copy()
 
@@ -78,13 +97,9 @@ class FairSequence(object):
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no non-zero affinity edges after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.affinity_matrix * (self.constraint_matrix == 0))
-                    == 0,
-                    axis=1,
-                )
-            )[0]
+            bad_affinity_reviewers = reviewers_without_known_affinity(
+                self.affinity_matrix.T, self.constraint_matrix.T
+            )
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -429,6 +444,64 @@ class FairSequence(object):
             "Could not find an existing reviewer-paper pair to trade with."
         )
 
+    def _complete_allocation(self, matrix_alloc, maximums, minimums):
+        """Assign the demand left by an interrupted picking sequence.
+
+        Once the time budget has run out, the pairs picked so far are kept and
+        the rest of the demand is assigned by a min-cost flow over the reviewer
+        loads left, maximizing affinity. The result is feasible but not WEF1.
+
+        Args:
+            matrix_alloc - the partial allocation (reviewers x papers).
+            maximums - the loads each reviewer has left.
+            minimums - the loads each reviewer still needs to reach its minimum.
+
+        Returns:
+            The completed allocation, with the shape of matrix_alloc.
+        """
+        # imported here: the flow solver needs ortools, the picking sequence does not
+        from .minmax_solver import MinMaxSolver
+
+        self.time_budget_exhausted = True
+        demands = self.demands - matrix_alloc.sum(axis=0)
+        self.logger.debug(
+            "#info FairSequence:time budget exhausted, assigning the remaining "
+            "demand of %d with a min-cost flow" % demands.sum()
+        )
+        # pairs picked already or constrained either way cannot be assigned
+        constraint_matrix = np.where(
+            (self.constraint_matrix != 0) | matrix_alloc, -1, 0
+        )
+        solver = MinMaxSolver(
+            minimums.tolist(),
+            maximums.tolist(),
+            demands.tolist(),
+            # flow costs are integers: scale scores as the Encoder does
+            CostMatrices(-100 * self.affinity_matrix.T, constraint_matrix.T),
+            allow_zero_score_assignments=self.allow_zero_score_assignments,
+            logger=self.logger,
+        )
+        completion = solver.solve()
+        if not solver.solved:
+            raise SolverException(
+                "Solver could not complete the assignment within the time budget."
+            )
+        self.completed_pairs = int(completion.sum())
+        return matrix_alloc | completion.T.astype(bool)
+
+    def get_additional_status_info(self):
+        """
+        With a time budget, whether it ran out, the objective, and the number
+        of pairs assigned by the min-cost flow instead of the picking sequence.
+        """
+        if self.deadline.time_budget is None or not self.solved:
+            return {}
+        return {
+            "time_budget_exhausted": str(self.time_budget_exhausted),
+            "objective": str(self.objective_val()),
+            "completed_pairs": str(self.completed_pairs),
+        }
+
     def greedy_wef1(self):
         """Compute a WEF1 assignment via a picking sequence.
 
@@ -465,6 +538,11 @@ class FairSequence(object):
         start = time.time()
 
         while remaining_demand:
+            if self.deadline.expired():
+                return self._complete_allocation(
+                    matrix_alloc, maximums_copy, required_for_min
+                )
+
             if remaining_demand % 1000 == 0:
                 self.logger.debug(
                     "#info FairSequence:remaining paper demand is %d"
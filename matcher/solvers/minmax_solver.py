@@ -12,17 +12,42 @@ except that the "num_reviews" argument is replaced by "minimums" and "maximums".
         integer representing the minimum/maximum number of reviews a reviewer
         should be assigned.
 
+    "pricing_top_k":
+        None (default) or an integer. If given, the solver first builds its flow
+        network on the `pricing_top_k` least-cost reviewers of each paper and
+        papers of each reviewer only. Left-out pairs with a negative reduced
+        cost are then added and the problem is solved again, until there are
+        none left, so the solution is optimal over all pairs.
+
+    "time_budget":
+        None (default) or a number of seconds. Pricing rounds stop once it has
+        run out and a round has a solution, which is feasible but may not be
+        optimal. Without pricing, the two flow problems are always solved.
+
+The encoder's cost and constraint matrices may be scipy sparse matrices, in which
+case only their stored cells are considered as candidate assignments.
+
 """
 import numpy as np
 import logging
-from .simple_solver import SimpleSolver
-from .core import SolverException
+from .simple_solver import SimpleSolver, top_k_candidates
+from .core import (
+    Deadline,
+    SolverException,
+    reviewers_without_known_affinity,
+    random_matrix_like,
+    issparse,
+)
 import time
 
 
 class MinMaxSolver:
     """Implements a min/max assignment graph solver."""
 
+    supports_sparse = True
+    supports_pricing = True
+    supports_time_budget = True
+
     def __init__(
         self,
         minimums,
@@ -32,33 +57,51 @@ class MinMaxSolver:
         allow_zero_score_assignments=False,
         logger=logging.getLogger(__name__),
         limit_matrix=None,
+        pricing_top_k=None,
+        time_budget=None,
     ):
 
         self.minimums = minimums
         self.maximums = maximums
         self.demands = demands
         self.cost_matrix = encoder.cost_matrix
+        self.constraint_matrix = encoder.constraint_matrix
         self.allow_zero_score_assignments = allow_zero_score_assignments
-        if limit_matrix is None:
+        self.sparse = issparse(self.cost_matrix)
+
+        if self.sparse and self.cost_matrix.count_nonzero() == 0:
+            # random costs are dense, so there is nothing to gain from sparsity
+            self.sparse = False
+            self.cost_matrix = self.cost_matrix.toarray()
+            self.constraint_matrix = self.constraint_matrix.toarray()
+
+        if self.sparse:
+            # sparse solvers use an implicit limit of 1 on every arc
+            self.limit_matrix = limit_matrix
+        elif limit_matrix is None:
             self.limit_matrix = np.ones(
-                np.shape(self.cost_matrix), dtype=np.int64
+                np.shape(self.cost_matrix), dtype=np.int8
             )
         else:
             self.limit_matrix = limit_matrix
 
-        if not self.cost_matrix.any():
-            self.cost_matrix = np.random.rand(*encoder.cost_matrix.shape)
-
-        self.constraint_matrix = encoder.constraint_matrix
+        if not self.sparse and not self.cost_matrix.any():
+            self.cost_matrix = random_matrix_like(encoder.cost_matrix)
 
         if not self.allow_zero_score_assignments:
             # Find reviewers with no known cost edges (non-zero) after constraints are applied and remove their load_lb
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.cost_matrix * (self.constraint_matrix == 0)) == 0,
-                    axis=0,
+            if self.sparse:
+                known_cost = self.cost_matrix != 0
+                known_edges = known_cost.astype(np.int8) - known_cost.multiply(
+                    self.constraint_matrix != 0
+                )
+                bad_affinity_reviewers = np.where(
+                    np.asarray(known_edges.sum(axis=0)).ravel() == 0
+                )[0]
+            else:
+                bad_affinity_reviewers = reviewers_without_known_affinity(
+                    self.cost_matrix, self.constraint_matrix
                 )
-            )[0]
             logging.debug(
                 "Setting minimum load for {} reviewers to 0 because "
                 "they do not have known affinity with any paper".format(
@@ -74,6 +117,36 @@ class MinMaxSolver:
         self.cost = None
         self.logger = logger
 
+        if pricing_top_k is not None and self.sparse:
+            self.logger.warning(
+                "Pricing is not supported with sparse input, solving over "
+                "all stored pairs instead"
+            )
+            pricing_top_k = None
+        if pricing_top_k is not None and pricing_top_k < 1:
+            raise SolverException(
+                "pricing_top_k ({}) must be at least 1".format(pricing_top_k)
+            )
+        self.pricing_top_k = pricing_top_k
+        self.deadline = Deadline(time_budget)
+        self.time_budget_exhausted = False
+        self.pricing_rounds = 0
+        self.candidate_matrix = None
+        self.priced_pairs = 0
+        # the SimpleSolver flow network, built on the first solve and then
+        # re-targeted in place for each phase
+        self.network = None
+
+    def reuse_network(self, other):
+        """
+        Solve on the flow network of `other`, a solved MinMaxSolver over the
+        same cost and constraint matrices, instead of building a new one. Only
+        capacities and supplies differ between the problems, so the network's
+        arcs are kept and `other` must not be solved concurrently.
+        """
+        self.network = other.network
+        self.cost_matrix = other.cost_matrix
+
     def _validate_input_range(self):
         """Validate if demand is in the range of min supply and max supply"""
         self.logger.debug("Checking if demand is in range")
@@ -97,23 +170,122 @@ class MinMaxSolver:
 
         self.logger.debug("Finished checking graph inputs")
 
+    def get_additional_status_info(self):
+        """
+        Return the number of pricing rounds and final candidate pairs, if
+        priced, and with a time budget whether it ran out and the objective,
+        the cost of the solution.
+        """
+        status_info = {}
+        if self.pricing_top_k is not None:
+            status_info["pricing_rounds"] = str(self.pricing_rounds)
+            status_info["pricing_candidates"] = str(
+                np.count_nonzero(self.candidate_matrix)
+            )
+        if self.deadline.time_budget is not None and self.solved:
+            status_info["time_budget_exhausted"] = str(
+                self.time_budget_exhausted
+            )
+            status_info["objective"] = str(self.cost)
+        return status_info
+
+    def _price(self):
+        """
+        Add the pairs that could lower the cost of the solved network to the
+        candidate pairs, so that the next pricing round can use them.
+        """
+        if self.candidate_matrix is None or not self.network.solved:
+            return
+        papers, reviewers = self.network.violating_pairs(self.limit_matrix)
+        self.candidate_matrix[papers, reviewers] = True
+        self.priced_pairs += len(papers)
+
     def solve(self):
-        """Computes combined solution of two SimpleSolvers"""
+        """
+        Computes combined solution of two SimpleSolvers, over the candidate
+        pairs grown by pricing rounds if `pricing_top_k` is set
+        """
         self._validate_input_range()
 
-        start_time = time.time()
-        self.logger.debug("Min Solver started at={}".format(start_time))
-        minimum_solver = SimpleSolver(
-            self.minimums,
-            self.demands,
+        if self.pricing_top_k is None:
+            return self._solve_phases()
+
+        top_k = self.pricing_top_k
+        self.candidate_matrix = top_k_candidates(
             self.cost_matrix,
             self.constraint_matrix,
+            top_k,
             allow_zero_score_assignments=self.allow_zero_score_assignments,
-            logger=self.logger,
-            strict=False,
             limit_matrix=self.limit_matrix,
-        )  # strict=False prevents errors from being thrown for supply/demand mismatch
-        minimum_result = minimum_solver.solve()
+        )
+        self.pricing_rounds = 0
+        while True:
+            self.pricing_rounds += 1
+            self.priced_pairs = 0
+            # the arcs change with the candidate pairs, so build a new network
+            self.network = None
+            flow_matrix = self._solve_phases()
+            self.logger.debug(
+                "Pricing round {} on {} candidate pairs added {} pairs".format(
+                    self.pricing_rounds,
+                    np.count_nonzero(self.candidate_matrix),
+                    self.priced_pairs,
+                )
+            )
+            if not self.solved and top_k < max(np.shape(self.cost_matrix)):
+                # too few candidate pairs may leave demands unmet
+                top_k *= 2
+                self.candidate_matrix |= top_k_candidates(
+                    self.cost_matrix,
+                    self.constraint_matrix,
+                    top_k,
+                    allow_zero_score_assignments=self.allow_zero_score_assignments,
+                    limit_matrix=self.limit_matrix,
+                )
+            elif not self.solved or not self.priced_pairs:
+                break
+            elif self.deadline.expired():
+                self.logger.info(
+                    "Time budget exhausted, stopping pricing with {} pairs "
+                    "left to add".format(self.priced_pairs)
+                )
+                self.time_budget_exhausted = True
+                break
+
+        self.logger.info(
+            "Pricing finished after {} rounds with {} candidate pairs".format(
+                self.pricing_rounds, np.count_nonzero(self.candidate_matrix)
+            )
+        )
+        return flow_matrix
+
+    def _solve_phases(self):
+        """Solves the minimum and then the maximum problem on one network"""
+        start_time = time.time()
+        self.logger.debug("Min Solver started at={}".format(start_time))
+        if self.network is None:
+            self.network = SimpleSolver(
+                self.minimums,
+                self.demands,
+                self.cost_matrix,
+                self.constraint_matrix,
+                allow_zero_score_assignments=self.allow_zero_score_assignments,
+                logger=self.logger,
+                strict=False,
+                limit_matrix=self.limit_matrix,
+                candidate_matrix=self.candidate_matrix,
+            )  # strict=False prevents errors from being thrown for supply/demand mismatch
+        else:
+            self.network.reset(
+                self.minimums,
+                self.demands,
+                self.network.arc_limits(self.limit_matrix),
+                strict=False,
+            )
+        minimum_result = self.network.solve()
+        minimum_solved = self.network.solved
+        minimum_optimal_cost = self.network.min_cost_flow.optimal_cost()
+        self._price()
         stop_time = time.time()
         self.logger.debug(
             "Min Solver finished at {} and took {} seconds".format(
@@ -121,28 +293,25 @@ class MinMaxSolver:
             )
         )
 
-        adjusted_constraints = self.constraint_matrix
-        adjusted_limits = self.limit_matrix - minimum_solver.flow_matrix
-        adjusted_maximums = self.maximums - np.sum(
-            minimum_solver.flow_matrix, axis=0
-        )
-        adjusted_demands = self.demands - np.sum(
-            minimum_solver.flow_matrix, axis=1
+        # the maximum problem has the same arcs: only the reviewer capacities,
+        # paper demands and arc limits left over by the minimum flow change
+        adjusted_maximums = self.maximums - np.asarray(
+            minimum_result.sum(axis=0)
+        ).ravel()
+        adjusted_demands = self.demands - np.asarray(
+            minimum_result.sum(axis=1)
+        ).ravel()
+        adjusted_limits = (
+            self.network.capacities[self.network.assignment_arcs]
+            - self.network.arc_flows
         )
 
         start_time = time.time()
         self.logger.debug("Max Solver started at={}".format(start_time))
-        maximum_solver = SimpleSolver(
-            adjusted_maximums,
-            adjusted_demands,
-            self.cost_matrix,
-            adjusted_constraints,
-            allow_zero_score_assignments=self.allow_zero_score_assignments,
-            logger=self.logger,
-            limit_matrix=adjusted_limits,
-        )
+        self.network.reset(adjusted_maximums, adjusted_demands, adjusted_limits)
 
-        maximum_result = maximum_solver.solve()
+        maximum_result = self.network.solve()
+        self._price()
         stop_time = time.time()
         self.logger.debug(
             "Max Solver finished at {} and took {} seconds".format(
@@ -150,14 +319,16 @@ class MinMaxSolver:
             )
         )
 
-        self.solved = minimum_solver.solved and maximum_solver.solved
+        self.solved = minimum_solved and self.network.solved
 
         self.optimal_cost = (
-            minimum_solver.min_cost_flow.optimal_cost()
-            + maximum_solver.min_cost_flow.optimal_cost()
+            minimum_optimal_cost + self.network.min_cost_flow.optimal_cost()
         )
 
         self.flow_matrix = minimum_result + maximum_result
-        self.cost = np.sum(self.flow_matrix * self.cost_matrix)
+        if self.sparse:
+            self.cost = self.flow_matrix.multiply(self.cost_matrix).sum()
+        else:
+            self.cost = np.sum(self.flow_matrix * self.cost_matrix)
 
         return self.flow_matrix
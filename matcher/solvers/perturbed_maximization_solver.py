@@ -11,12 +11,14 @@ a sampling program written in C.
 import logging
 import numpy as np
 import gurobipy as gp
-from cffi import FFI
-from .core import SolverException
-from .bvn_extension import run_bvn
+from .core import Deadline, SolverException, reviewers_without_known_affinity
+from .bvn_extension import sample_matrix
 from .minmax_solver import MinMaxSolver
 
 class PerturbedMaximizationSolver:
+    supports_time_budget = True
+    supports_sampling = True
+
     def __init__(
         self,
         minimums,
@@ -25,13 +27,33 @@ class PerturbedMaximizationSolver:
         encoder,
         allow_zero_score_assignments=False,
         logger=logging.getLogger(__name__),
+        time_budget=None,
+        num_samples=1,
+        max_workers=None,
+        seed=None,
     ):
         """
         Initialize the solver with the given encoder and constraints.
+
+        With `num_samples` > 1, the fractional assignment is sampled from that
+        many times, in `max_workers` threads (one per CPU if None). The
+        assignment returned by `solve` is the first sample, and all of them
+        are given by `get_samples`. The samples and alternates are
+        reproducible with a `seed`, whatever `max_workers` is.
+
+        With a `time_budget` in seconds, the quadratic program gets the time
+        left as its Gurobi TimeLimit. If it runs out before Gurobi has a
+        solution, the fractional assignment without perturbation (computed
+        when there are bad match thresholds) is sampled instead.
         """
         
+        self.deadline = Deadline(time_budget)
+        self.time_budget_exhausted = False
         self.logger = logger
         self.logger.debug("[PerturbedMaximization]: Initializing ...")
+        self.num_samples = num_samples
+        self.max_workers = max_workers
+        self.rng = np.random.default_rng(seed)
 
         # Store the inputs
         self.num_paps, self.num_revs = encoder.cost_matrix.shape
@@ -49,15 +71,10 @@ class PerturbedMaximizationSolver:
 
         # Reduce the minimums of reviewers with no known affinity with any paper to 0
         if not self.allow_zero_score_assignments:
-            self.constraint_matrix[
-                np.where(self.cost_matrix == 0)
-            ] = -1
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.cost_matrix * (self.constraint_matrix >= 0)) == 0,
-                    axis=0,
-                )
-            )[0]
+            self.constraint_matrix[self.cost_matrix == 0] = -1
+            bad_affinity_reviewers = reviewers_without_known_affinity(
+                self.cost_matrix, self.constraint_matrix, allow_forced=True
+            )
             self.logger.debug(
                 "[PerturbedMaximization]: Setting minimum load for {} reviewers to 0 "
                 "because they do not have known affinity with any paper".format(
@@ -76,6 +93,7 @@ class PerturbedMaximizationSolver:
         self.fractional_assignment_cost = None
         self.sampled_assignment_matrix = None
         self.sampled_assignment_cost = None
+        self.samples = None
         self.alternate_probability_matrix = None
 
         # Compute the deterministic max-affinity assignment ingoring probability limits
@@ -354,7 +372,8 @@ class PerturbedMaximizationSolver:
 
     def sample_assignment(self):
         """
-        Sample an assignment from the fractional assignment matrix.
+        Sample `num_samples` assignments from the fractional assignment
+        matrix, and keep the first as the sampled assignment.
         """
 
         self.logger.debug("[PerturbedMaximization]: Sampling assignment ...")
@@ -369,31 +388,20 @@ class PerturbedMaximizationSolver:
         # Round the fractional assignment matrix to integers to a certain precision
         # in order to use the sampling program in C. See also the RandomizedSolver.
         self.precision = 1000000
-        self.rounded_assignment_matrix = np.zeros(
-            (self.num_paps, self.num_revs), dtype=int
+        self.rounded_assignment_matrix = np.round(
+            self.fractional_assignment_matrix * self.precision
+        ).astype(int)
+
+        self.samples = sample_matrix(
+            self.rounded_assignment_matrix,
+            self.precision,
+            self.num_samples,
+            self.max_workers,
+            self.rng,
         )
-        for i in range(self.num_paps):
-            for j in range(self.num_revs):
-                self.rounded_assignment_matrix[i][j] = np.round(
-                    self.fractional_assignment_matrix[i][j] * self.precision
-                )
+        self.sampled_assignment_matrix = self.samples.assignment(0)
 
-        # Construct CFFI interface to use the sampling extension in C
-        ffi = FFI()
-        F = self.rounded_assignment_matrix.flatten()
-        Fbuf = ffi.new("int[]", self.num_paps * self.num_revs)
-        for i in range(F.size):
-            Fbuf[i] = F[i]
-        Sbuf = ffi.new("int[]", self.num_revs)
-        for i in range(self.num_revs):
-            Sbuf[i] = 1
-        run_bvn(Fbuf, Sbuf, self.num_paps, self.num_revs, self.precision)
-
-        # Obtain the sampled assignment matrix and compute properties
-        self.sampled_assignment_matrix = np.zeros((self.num_paps, self.num_revs))
-        for i in range(F.size):
-            coords = np.unravel_index(i, (self.num_paps, self.num_revs))
-            self.sampled_assignment_matrix[coords] = Fbuf[i]
+        # Compute properties of the sampled assignment
         self.sampled_assignment_cost = self._compute_expected_cost(self.sampled_assignment_matrix)
         sampled_cost_ratio = 1.0
         if self.deterministic_assignment_cost != 0:
@@ -478,16 +486,30 @@ class PerturbedMaximizationSolver:
                     bad_matches += assignment[i][j] * (self.cost_matrix[i][j] > threshold)
             solver.addConstr(bad_matches <= no_perturbation_bad_matches)
         # Run the Gurobi solver
+        remaining = self.deadline.remaining()
+        if remaining is not None:
+            solver.setParam('TimeLimit', remaining)
         solver.optimize()
-        if solver.status != gp.GRB.OPTIMAL:
+        if solver.status == gp.GRB.TIME_LIMIT:
+            self.time_budget_exhausted = True
+        if solver.status == gp.GRB.OPTIMAL or (
+            solver.status == gp.GRB.TIME_LIMIT and solver.SolCount > 0
+        ):
+            self.fractional_assignment_matrix = np.array([
+                [assignment[i][j].x for j in range(self.num_revs)] for i in range(self.num_paps)
+            ])
+        elif solver.status == gp.GRB.TIME_LIMIT and len(self.bad_match_thresholds) != 0:
+            self.logger.debug(
+                "[PerturbedMaximization]: Time budget exhausted, using the "
+                "fractional assignment without perturbation"
+            )
+            self.fractional_assignment_matrix = self.no_perturbation_assignment_matrix
+        else:
             self.solved = False
             self.logger.debug("[PerturbedMaximization]: Gurobi solver failed")
             return None
         # Compute properties of the fractional assignment
         self.solved = True
-        self.fractional_assignment_matrix = np.array([
-            [assignment[i][j].x for j in range(self.num_revs)] for i in range(self.num_paps)
-        ])
         self.fractional_assignment_cost = self._compute_expected_cost(self.fractional_assignment_matrix)
         self.logger.debug(
             "[PerturbedMaximization]: Finished solving the fractional assignment "
@@ -499,6 +521,33 @@ class PerturbedMaximizationSolver:
         self.sample_assignment()
         return self.sampled_assignment_matrix
 
+    def get_additional_status_info(self):
+        """
+        With a time budget, whether it ran out and the objective, the perturbed
+        cost of the fractional assignment.
+        """
+        if self.deadline.time_budget is None or not self.solved:
+            return {}
+        assignment = self.fractional_assignment_matrix
+        return {
+            "time_budget_exhausted": str(self.time_budget_exhausted),
+            "objective": str(
+                np.sum(
+                    (assignment - self.perturbation * assignment**2)
+                    * self.cost_matrix
+                )
+            ),
+        }
+
+    def get_samples(self):
+        """
+        Return the Samples drawn by the last `sample_assignment`, of which
+        `samples.marginals()` gives the empirical marginal probabilities.
+        """
+        if not self.solved:
+            raise SolverException("Fractional solver not solved yet")
+        return self.samples
+
     def get_alternates(self, num_alternates):
         """
         Get a list of alternates for each paper.
@@ -523,7 +572,7 @@ class PerturbedMaximizationSolver:
         )
 
         # Get the alternates for each paper and return them
-        rng = np.random.default_rng()
+        rng = self.rng
         alternates_by_index = {}
         for i in range(self.num_paps):
             unassigned = []
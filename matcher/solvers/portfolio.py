@@ -0,0 +1,323 @@
+"""
+A solver that races a portfolio of solvers on the same problem.
+
+Each solver of the portfolio runs in its own process. Processes are forked
+where the platform allows it, so they read the encoder's matrices from the
+parent's memory instead of receiving a copy. Results are collected as the
+solvers finish, and the winner is picked by a scoring rule:
+
+    "affinity":
+        the largest total affinity score of the assignment.
+
+    "min_paper_score":
+        the largest affinity score of the worst-off paper, ties broken by
+        total affinity.
+
+    "time":
+        the first solver to find a solution. The others are cancelled as soon
+        as it has.
+
+With a `time_budget`, solvers that support one are given it, and once it has
+run out the solvers still running are cancelled. If none has a solution by
+then, the portfolio has none either.
+"""
+
+import importlib
+import logging
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from .core import Deadline, SolverException
+
+DEFAULT_SOLVERS = ("FairFlow", "FairSequence", "FairIR")
+SCORING_RULES = ("affinity", "min_paper_score", "time")
+
+
+def _run_member(solver_class, args, kwargs, num_alternates, connection):
+    """
+    Solve the problem with one solver of the portfolio, in its own process,
+    and send a dict with the solution and what the Matcher reads from a
+    solved solver through `connection`.
+    """
+    start = time.monotonic()
+    try:
+        solver = solver_class(*args, **kwargs)
+        result = {"solution": solver.solve(), "solved": solver.solved}
+        if solver.solved:
+            if hasattr(solver, "get_alternates"):
+                result["alternates"] = solver.get_alternates(num_alternates)
+            if hasattr(solver, "get_fraction_of_opt"):
+                result["fraction_of_opt"] = solver.get_fraction_of_opt()
+            if hasattr(solver, "get_additional_status_info"):
+                result["status_info"] = solver.get_additional_status_info()
+    except Exception as error:
+        result = {"solved": False, "error": str(error)}
+    result["time"] = time.monotonic() - start
+    connection.send(result)
+    connection.close()
+
+
+class Portfolio:
+    """
+    Runs the solvers of a portfolio concurrently and keeps the solution of
+    the best one. It has the interface of the solvers it runs, so the Matcher
+    can use it in their place.
+
+    Arguments are those of the other solvers, plus:
+    - `solvers`:
+        a dict of name -> solver class. None runs FairFlow, FairSequence and
+        FairIR.
+
+    - `scoring`:
+        the rule picking the winner: "affinity", "min_paper_score" or "time".
+
+    - `num_alternates`:
+        the number of alternates that solvers with `get_alternates` pick.
+
+    - `time_budget`:
+        None or a number of seconds, after which the solvers still running are
+        cancelled, with or without a solution.
+    """
+
+    supports_time_budget = True
+    is_portfolio = True
+
+    def __init__(
+        self,
+        minimums,
+        maximums,
+        demands,
+        encoder,
+        allow_zero_score_assignments=False,
+        logger=logging.getLogger(__name__),
+        solvers=None,
+        scoring="affinity",
+        num_alternates=0,
+        time_budget=None,
+    ):
+        if scoring not in SCORING_RULES:
+            raise SolverException(
+                "Unknown portfolio scoring rule {}, expected one of {}".format(
+                    scoring, SCORING_RULES
+                )
+            )
+        if solvers is None:
+            package = importlib.import_module(__package__)
+            solvers = {
+                name: getattr(package, name) for name in DEFAULT_SOLVERS
+            }
+        if not solvers:
+            raise SolverException("The portfolio has no solvers")
+
+        self.deadline = Deadline(time_budget)
+        self.minimums = minimums
+        self.maximums = maximums
+        self.demands = demands
+        self.encoder = encoder
+        self.allow_zero_score_assignments = allow_zero_score_assignments
+        self.logger = logger
+        self.solvers = dict(solvers)
+        self.scoring = scoring
+        self.num_alternates = num_alternates
+
+        self.solved = False
+        self.flow_matrix = None
+        self.results = {}
+        self.winner = None
+
+    def _member_kwargs(self, solver_class):
+        kwargs = {
+            "allow_zero_score_assignments": self.allow_zero_score_assignments,
+            "logger": self.logger,
+        }
+        if self.deadline.time_budget is not None and getattr(
+            solver_class, "supports_time_budget", False
+        ):
+            kwargs["time_budget"] = self.deadline.time_budget
+        return kwargs
+
+    def _score(self, result):
+        """Add the total and the worst paper's affinity scores to a solved result"""
+        solution = np.asarray(result["solution"], dtype=float)
+        paper_scores = np.sum(
+            solution * self.encoder.aggregate_score_matrix, axis=1
+        )
+        papers = np.asarray(self.demands) > 0
+        result["affinity"] = float(paper_scores.sum())
+        result["min_paper_score"] = (
+            float(paper_scores[papers].min()) if papers.any() else 0.0
+        )
+
+    def _pick_winner(self):
+        solved = [
+            name for name, result in self.results.items() if result["solved"]
+        ]
+        if not solved:
+            return None
+        if self.scoring == "time":
+            return min(solved, key=lambda name: self.results[name]["time"])
+        if self.scoring == "min_paper_score":
+            return max(
+                solved,
+                key=lambda name: (
+                    self.results[name]["min_paper_score"],
+                    self.results[name]["affinity"],
+                ),
+            )
+        return max(solved, key=lambda name: self.results[name]["affinity"])
+
+    def solve(self):
+        """Race the solvers and return the winner's solution"""
+        # forked processes share the encoder's matrices with this one
+        context = multiprocessing.get_context(
+            "fork"
+            if "fork" in multiprocessing.get_all_start_methods()
+            else None
+        )
+        start = time.monotonic()
+        pending = {}
+        for name, solver_class in self.solvers.items():
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_member,
+                args=(
+                    solver_class,
+                    (
+                        list(self.minimums),
+                        list(self.maximums),
+                        list(self.demands),
+                        self.encoder,
+                    ),
+                    self._member_kwargs(solver_class),
+                    self.num_alternates,
+                    sender,
+                ),
+                daemon=True,
+            )
+            process.start()
+            sender.close()
+            pending[receiver] = (name, process)
+        self.logger.debug(
+            "Portfolio started {} solvers: {}".format(
+                len(pending), ", ".join(self.solvers)
+            )
+        )
+
+        while pending:
+            has_solution = any(
+                result["solved"] for result in self.results.values()
+            )
+            if self.deadline.expired():
+                if not has_solution:
+                    self.logger.warning(
+                        "Portfolio time budget ran out before any solver "
+                        "found a solution"
+                    )
+                break
+            if has_solution and self.scoring == "time":
+                break
+            for receiver in wait(
+                list(pending), timeout=self.deadline.remaining()
+            ):
+                name, process = pending.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    result = {
+                        "solved": False,
+                        "error": "process exited with code {}".format(
+                            process.exitcode
+                        ),
+                        "time": time.monotonic() - start,
+                    }
+                process.join()
+                if result["solved"]:
+                    self._score(result)
+                self.results[name] = result
+                self.logger.debug(
+                    "Portfolio solver {} finished in {:.2f} seconds, solved: {}".format(
+                        name, result["time"], result["solved"]
+                    )
+                )
+
+        for receiver, (name, process) in pending.items():
+            process.terminate()
+            process.join()
+            self.results[name] = {
+                "solved": False,
+                "cancelled": True,
+                "time": time.monotonic() - start,
+            }
+            self.logger.debug("Portfolio cancelled solver {}".format(name))
+
+        self.winner = self._pick_winner()
+        if self.winner is None:
+            errors = [
+                "{}: {}".format(name, result["error"])
+                for name, result in self.results.items()
+                if "error" in result
+            ]
+            if len(errors) == len(self.results):
+                raise SolverException(
+                    "No solver in the portfolio found a solution. "
+                    + "; ".join(errors)
+                )
+            return None
+
+        result = self.results[self.winner]
+        self.logger.info(
+            "Portfolio picked {} by {}".format(self.winner, self.scoring)
+        )
+        self.solved = True
+        self.flow_matrix = result["solution"]
+        if "alternates" in result:
+            self.get_alternates = self._get_alternates
+        if "fraction_of_opt" in result:
+            self.get_fraction_of_opt = self._get_fraction_of_opt
+        return self.flow_matrix
+
+    def _get_alternates(self, num_alternates):
+        """
+        Alternates picked by the winning solver, with the `num_alternates`
+        given to the constructor.
+        """
+        return self.results[self.winner]["alternates"]
+
+    def _get_fraction_of_opt(self):
+        return self.results[self.winner]["fraction_of_opt"]
+
+    def get_additional_status_info(self):
+        """
+        The winning solver, its own status info, and the time, outcome and
+        objectives of every solver of the portfolio.
+        """
+        status_info = {}
+        if self.winner is not None:
+            status_info.update(
+                self.results[self.winner].get("status_info", {})
+            )
+            status_info["portfolio_winner"] = self.winner
+        for name, result in self.results.items():
+            if result["solved"]:
+                outcome = "solved"
+            elif result.get("cancelled"):
+                outcome = "cancelled"
+            elif "error" in result:
+                outcome = "error"
+            else:
+                outcome = "no solution"
+            status_info["portfolio_{}_status".format(name)] = outcome
+            status_info["portfolio_{}_time".format(name)] = "{:.3f}".format(
+                result["time"]
+            )
+            if result["solved"]:
+                status_info["portfolio_{}_affinity".format(name)] = str(
+                    result["affinity"]
+                )
+                status_info["portfolio_{}_min_paper_score".format(name)] = str(
+                    result["min_paper_score"]
+                )
+        return status_info
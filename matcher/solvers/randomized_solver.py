@@ -13,16 +13,28 @@ are maintained even if all alternates are used.
 """
 
 from .minmax_solver import MinMaxSolver
-from .core import SolverException
-from .bvn_extension import run_bvn
+from .core import (
+    SolverException,
+    reviewers_without_known_affinity,
+    random_matrix_like,
+)
+from .bvn_extension import sample_matrix
 from ortools.linear_solver import pywraplp
-from cffi import FFI
 import logging
 import numpy as np
-from itertools import product
 
 
 class RandomizedSolver:
+    """
+    With `num_samples` > 1, the fractional assignment is sampled from that
+    many times, in `max_workers` threads (one per CPU if None). The
+    assignment returned by `solve` is the first sample, and all of them are
+    given by `get_samples`. The samples and alternates are reproducible with
+    a `seed`, whatever `max_workers` is.
+    """
+
+    supports_sampling = True
+
     def __init__(
         self,
         minimums,
@@ -31,6 +43,9 @@ class RandomizedSolver:
         encoder,
         allow_zero_score_assignments=False,
         logger=logging.getLogger(__name__),
+        num_samples=1,
+        max_workers=None,
+        seed=None,
     ):
         self.minimums = minimums
         self.maximums = maximums
@@ -39,24 +54,24 @@ class RandomizedSolver:
         self.num_paps, self.num_revs = self.cost_matrix.shape
         self.allow_zero_score_assignments = allow_zero_score_assignments
         self.logger = logger
+        self.num_samples = num_samples
+        self.max_workers = max_workers
+        self.rng = np.random.default_rng(seed)
         self.encoder = (
             encoder  # for passing cost and constraint matrices to MinMaxSolver
         )
 
         if not self.cost_matrix.any():
-            self.cost_matrix = np.random.rand(*encoder.cost_matrix.shape)
+            self.cost_matrix = random_matrix_like(encoder.cost_matrix)
 
         self.constraint_matrix = encoder.constraint_matrix
 
         self.prob_limit_matrix = encoder.prob_limit_matrix
 
         if not self.allow_zero_score_assignments:
-            bad_affinity_reviewers = np.where(
-                np.all(
-                    (self.cost_matrix * (self.constraint_matrix == 0)) == 0,
-                    axis=0,
-                )
-            )[0]
+            bad_affinity_reviewers = reviewers_without_known_affinity(
+                self.cost_matrix, self.constraint_matrix
+            )
             self.logger.debug(
                 "Setting minimum load for {} reviewers to 0 because "
                 "they do not have known affinity with any paper".format(
@@ -71,6 +86,7 @@ class RandomizedSolver:
         self.expected_cost = None  # expected cost of the fractional assignment
         self.flow_matrix = None
         self.cost = None  # actual cost of the sampled assignment
+        self.samples = None  # all sampled assignments
         self.alternate_probability_matrix = (
             None  # marginal probability for each alternate
         )
@@ -208,24 +224,20 @@ class RandomizedSolver:
             self.logger.debug("fractional_assignment solving failed")
             return
 
-        self.logger.debug("start iterating papers and reviewers")
-        self.integer_fractional_assignment_matrix = np.zeros(
-            (self.num_paps, self.num_revs), dtype=np.intc
+        self.logger.debug("start rounding the LP solution")
+        result_matrix = np.asarray(result_matrix, dtype=float)
+        rounded_matrix = np.round(result_matrix)
+        deviations = np.abs(rounded_matrix - result_matrix)
+        num_not_integral = np.count_nonzero(deviations > 1e-5)
+        if num_not_integral:
+            self.logger.debug(
+                "LP solution not integral at {} pairs, with a maximum "
+                "deviation of {}".format(num_not_integral, deviations.max())
+            )
+        # assumes that round does not ruin paper load integrality
+        self.integer_fractional_assignment_matrix = rounded_matrix.astype(
+            np.intc
         )
-        for i, j in product(range(self.num_paps), range(self.num_revs)):
-            actual_value = result_matrix[i, j]
-            if np.round(actual_value) - actual_value > 1e-5:
-                self.logger.debug(
-                    "LP solution not integral at "
-                    + str(i)
-                    + ","
-                    + str(j)
-                    + " with value of "
-                    + str(actual_value)
-                )
-            self.integer_fractional_assignment_matrix[i, j] = np.round(
-                actual_value
-            )  # assumes that round does not ruin paper load integrality
         if not np.all(
             np.sum(self.integer_fractional_assignment_matrix, axis=1)
             % self.one
@@ -241,6 +253,11 @@ class RandomizedSolver:
 
         self.logger.debug("start deterministic_assignment_solver")
 
+        # the deterministic problem only differs in its limits and supplies,
+        # so it is solved on the fractional problem's network
+        self.deterministic_assignment_solver.reuse_network(
+            self.fractional_assignment_solver
+        )
         result_matrix = self.deterministic_assignment_solver.solve()
         self.opt_solved = self.deterministic_assignment_solver.solved
         self.opt_cost = self.deterministic_assignment_solver.cost
@@ -264,48 +281,62 @@ class RandomizedSolver:
         return self.flow_matrix
 
     def sample_assignment(self):
-        """Sample a deterministic assignment from the fractional assignment"""
+        """
+        Sample `num_samples` deterministic assignments from the fractional
+        assignment, and keep the first as the solution
+        """
         self.logger.debug("sample_assignment")
 
         assert (
             self.solved
         ), "Solver not solved. Run self.solve() before sampling."
 
-        # construct CFFI interface to the sampling extension in C
-        ffi = FFI()
-        F = self.integer_fractional_assignment_matrix.flatten()
-        Fbuf = ffi.new("int[]", self.num_paps * self.num_revs)
-        for i in range(F.size):
-            Fbuf[i] = F[i]
-        Sbuf = ffi.new("int[]", self.num_revs)
-        for i in range(self.num_revs):
-            Sbuf[i] = 1
-
-        run_bvn(Fbuf, Sbuf, self.num_paps, self.num_revs, self.one)
-
-        self.flow_matrix = np.zeros((self.num_paps, self.num_revs))
-        for i in range(F.size):
-            coords = np.unravel_index(i, (self.num_paps, self.num_revs))
-            self.flow_matrix[coords] = Fbuf[i]
+        self.samples = sample_matrix(
+            self.integer_fractional_assignment_matrix,
+            self.one,
+            self.num_samples,
+            self.max_workers,
+            self.rng,
+        )
+        self.flow_matrix = self.samples.assignment(0)
 
         self.cost = np.sum(self.flow_matrix * self.cost_matrix)
 
-        # check that sampled assignment is valid
-        pap_loads = np.sum(self.flow_matrix, axis=1)
-        rev_loads = np.sum(self.flow_matrix, axis=0)
-        if not (
-            np.all(pap_loads == np.array(self.demands))
-            and np.all(
-                np.logical_and(
-                    rev_loads <= np.array(self.maximums),
-                    rev_loads >= np.array(self.minimums),
-                )
+        # check that sampled assignments are valid
+        for assignment in self.samples.assignments:
+            pap_loads = np.bincount(
+                self.samples.papers,
+                weights=assignment,
+                minlength=self.num_paps,
             )
-        ):
-            raise SolverException("Sampled assignment is invalid")
+            rev_loads = np.bincount(
+                self.samples.reviewers,
+                weights=assignment,
+                minlength=self.num_revs,
+            )
+            if not (
+                np.all(pap_loads == np.array(self.demands))
+                and np.all(
+                    np.logical_and(
+                        rev_loads <= np.array(self.maximums),
+                        rev_loads >= np.array(self.minimums),
+                    )
+                )
+            ):
+                raise SolverException("Sampled assignment is invalid")
 
         self.logger.debug("Finished sample_assignment")
 
+    def get_samples(self):
+        """
+        Return the Samples drawn by the last `sample_assignment`, of which
+        `samples.marginals()` gives the empirical marginal probabilities
+        """
+        assert (
+            self.solved
+        ), "Solver not solved. Run self.solve() before sampling."
+        return self.samples
+
     def get_alternates(self, num_alternates):
         """Sample alternates in order to respect probability guarantees"""
         self.logger.debug("get_alternates")
@@ -314,7 +345,7 @@ class RandomizedSolver:
             self.solved
         ), "Solver not solved. Run self.solve() before sampling."
 
-        rng = np.random.default_rng()
+        rng = self.rng
 
         alternates_by_index = {}
         for i in range(self.num_paps):
@@ -37,6 +37,16 @@ SimpleSolver is initialized with the following arguments:
         a #papers by #reviewers numpy array representing the limit on the flow
         between that reviewer and paper (usually 1)
 
+    "candidate_matrix":
+        None (default) or a #papers by #reviewers boolean numpy array. If
+        given, arcs are only created for its True cells, e.g. the pairs picked
+        by `top_k_candidates`. Whether the solution is also optimal for all
+        pairs can then be checked with `violating_pairs` (see MinMaxSolver).
+
+The cost and constraint matrices may also be scipy sparse matrices. In that
+case arcs are only created for the stored (non-zero) cells, every arc has a
+limit of 1, and the resulting flow matrix is a scipy CSR matrix.
+
 
 Node is a namedtuple that is used to represent nodes in the graph:
 
@@ -61,11 +71,65 @@ from collections import namedtuple
 import logging
 import numpy as np
 from ortools.graph.python import min_cost_flow
-from .core import SolverException
+from .core import SolverException, issparse
 
 Node = namedtuple("Node", ["number", "index", "supply"])
 
 
+def top_k_candidates(
+    cost_matrix,
+    constraint_matrix,
+    top_k,
+    allow_zero_score_assignments=False,
+    limit_matrix=None,
+    chunk_cells=1 << 20,
+):
+    """
+    Return a #papers by #reviewers boolean candidate matrix holding, among
+    the pairs that can be assigned, the `top_k` least-cost reviewers of every
+    paper and the `top_k` least-cost papers of every reviewer, as well as
+    every pair with a constraint of 1. Matrices must be dense.
+    """
+    num_papers, num_reviewers = np.shape(cost_matrix)
+    candidates = np.asarray(constraint_matrix) == 1
+    unassignable = np.iinfo(np.int64).max
+
+    def block_costs(block):
+        costs = np.asarray(cost_matrix[block]).astype(np.int64)
+        assignable = np.asarray(constraint_matrix[block]) == 0
+        if not allow_zero_score_assignments:
+            assignable &= costs != 0
+        if limit_matrix is not None:
+            assignable &= np.asarray(limit_matrix[block]) > 0
+        return np.where(assignable, costs, unassignable)
+
+    # least-cost reviewers of each paper, a block of papers at a time
+    chunk_size = max(1, chunk_cells // max(1, num_reviewers))
+    k = min(top_k, num_reviewers)
+    for start in range(0, num_papers if k else 0, chunk_size):
+        block = slice(start, start + chunk_size)
+        costs = block_costs(block)
+        columns = np.argpartition(costs, k - 1, axis=1)[:, :k]
+        rows = np.arange(costs.shape[0])[:, np.newaxis]
+        candidates[block][rows, columns] |= (
+            costs[rows, columns] != unassignable
+        )
+
+    # least-cost papers of each reviewer, a block of reviewers at a time
+    chunk_size = max(1, chunk_cells // max(1, num_papers))
+    k = min(top_k, num_papers)
+    for start in range(0, num_reviewers if k else 0, chunk_size):
+        block = (slice(None), slice(start, start + chunk_size))
+        costs = block_costs(block)
+        rows = np.argpartition(costs, k - 1, axis=0)[:k]
+        columns = np.arange(costs.shape[1])[np.newaxis, :]
+        candidates[block][rows, columns] |= (
+            costs[rows, columns] != unassignable
+        )
+
+    return candidates
+
+
 class SimpleSolver:
     """Main class that represents the graph"""
 
@@ -79,6 +143,7 @@ class SimpleSolver:
         logger=logging.getLogger(__name__),
         strict=True,
         limit_matrix=None,
+        candidate_matrix=None,
     ):
 
         self.logger = logger
@@ -88,22 +153,18 @@ class SimpleSolver:
         self.solved = False
         self.cost_matrix = cost_matrix
         self.constraint_matrix = constraint_matrix
-        self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
+        self.sparse = issparse(cost_matrix)
         self.num_reviews = num_reviews
         self.demands = demands
-        self.num_papers = np.size(cost_matrix, axis=0)
-        self.num_reviewers = np.size(cost_matrix, axis=1)
+        self.num_papers, self.num_reviewers = self.cost_matrix.shape
         self.current_offset = 0
-        if limit_matrix is None:
-            limit_matrix = np.ones(np.shape(self.cost_matrix), dtype=np.int64)
+        self.limit_matrix = limit_matrix
+        self.candidate_matrix = candidate_matrix
 
         self._check_inputs(strict)
 
-        self.start_nodes = []
-        self.end_nodes = []
-        self.capacities = []
-        self.costs = []
         self.node_by_number = {}
+        self.forced_cost = None
 
         total_supply = min(sum(self.num_reviews), sum(self.demands))
 
@@ -126,44 +187,286 @@ class SimpleSolver:
 
         # -- Add Edges --
 
-        # connect the source node to all reviewer nodes.
-        for r_node in self.reviewer_nodes:
-            capacity = self.num_reviews[r_node.index]
-            self.add_edge(self.source_node, r_node, capacity, cost=0)
-
-        for r_node in self.reviewer_nodes:
-            for p_node in self.paper_nodes:
-
-                coordinates = (p_node.index, r_node.index)
-                arc_cost = int(self.cost_matrix[coordinates])
-                arc_constraint = self.constraint_matrix[coordinates]
-
-                # a constraint of 0 means there's no constraint, so apply the cost as normal
-                # a constraint of 1 means that this user was explicitly assigned to this paper
-                # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
-                if arc_constraint == 0 and (
-                    self.allow_zero_score_assignments or arc_cost != 0
-                ):
-                    self.add_edge(
-                        r_node, p_node, limit_matrix[coordinates], arc_cost
-                    )
-                elif arc_constraint == 1:
-                    # TODO: this should be handled as a hard constraint
-                    arc_cost = self._least_cost() - 1
-                    self.add_edge(
-                        r_node,
-                        p_node,
-                        limit_matrix[coordinates],
-                        int(arc_cost),
-                    )
-
-        # connect paper nodes to the sink node.
-        for p_node in self.paper_nodes:
-            capacity = self.demands[p_node.index]
-            self.add_edge(p_node, self.sink_node, capacity, cost=0)
+        # Edges are represented virtually by Node numbers in the aligned arrays
+        # `self.start_nodes` and `self.end_nodes`; there is no "Edge" object.
+        reviewer_numbers = np.array(
+            [n.number for n in self.reviewer_nodes], dtype=np.int32
+        )
+        paper_numbers = np.array(
+            [n.number for n in self.paper_nodes], dtype=np.int32
+        )
+        (
+            self.arc_reviewers,
+            self.arc_papers,
+            arc_capacities,
+            arc_costs,
+        ) = self._assignment_arcs(limit_matrix)
+        # arc numbers of the reviewer -> paper arcs, which follow the source arcs
+        self.assignment_arcs = slice(
+            self.num_reviewers, self.num_reviewers + len(self.arc_reviewers)
+        )
+        self._clear_flows()
+
+        # source -> reviewers, reviewers -> papers, papers -> sink
+        self.start_nodes = np.concatenate(
+            [
+                np.full(self.num_reviewers, self.source_node.number),
+                reviewer_numbers[self.arc_reviewers],
+                paper_numbers,
+            ]
+        ).astype(np.int32)
+        self.end_nodes = np.concatenate(
+            [
+                reviewer_numbers,
+                paper_numbers[self.arc_papers],
+                np.full(self.num_papers, self.sink_node.number),
+            ]
+        ).astype(np.int32)
+        # cast to int64 because SimpleMinCostFlow takes integer capacities and costs
+        self.capacities = np.concatenate(
+            [
+                np.asarray(self.num_reviews).astype(np.int64),
+                arc_capacities,
+                np.asarray(self.demands).astype(np.int64),
+            ]
+        )
+        self.costs = np.concatenate(
+            [
+                np.zeros(self.num_reviewers, dtype=np.int64),
+                arc_costs,
+                np.zeros(self.num_papers, dtype=np.int64),
+            ]
+        )
 
         self.construct_solver()
 
+    def arc_limits(self, limit_matrix):
+        """
+        Return the values of a #papers by #reviewers limit matrix on the
+        reviewer -> paper arcs, as int64 capacities. None means a limit of 1.
+        """
+        if limit_matrix is None:
+            return np.ones(len(self.arc_papers), dtype=np.int64)
+        return (
+            np.asarray(limit_matrix[self.arc_papers, self.arc_reviewers])
+            .ravel()
+            .astype(np.int64)
+        )
+
+    def reset(self, num_reviews, demands, limits, strict=True):
+        """
+        Re-target the network to new reviewer capacities, paper demands and
+        reviewer -> paper arc capacities (`limits`, aligned with `arc_papers`
+        and `arc_reviewers`), so that it can be solved again without
+        rebuilding its arcs. The capacity and supply arrays are updated in place.
+        """
+        self.num_reviews = num_reviews
+        self.demands = demands
+        self._check_inputs(strict)
+
+        self.capacities[: self.num_reviewers] = np.asarray(num_reviews)
+        self.capacities[self.assignment_arcs] = limits
+        self.capacities[self.assignment_arcs.stop :] = np.asarray(demands)
+
+        total_supply = int(min(sum(self.num_reviews), sum(self.demands)))
+        self.source_node = self.source_node._replace(supply=total_supply)
+        self.sink_node = self.sink_node._replace(supply=-total_supply)
+        for node in [self.source_node, self.sink_node]:
+            self.node_by_number[node.number] = node
+
+        self.min_cost_flow.set_arc_capacities(
+            np.arange(len(self.capacities), dtype=np.int32), self.capacities
+        )
+        self.min_cost_flow.set_nodes_supplies(
+            np.array(
+                [self.source_node.number, self.sink_node.number],
+                dtype=np.int32,
+            ),
+            np.array([total_supply, -total_supply], dtype=np.int64),
+        )
+
+        self.cost = 0
+        self.solved = False
+        self._clear_flows()
+
+    def _clear_flows(self):
+        """Reset the flows to 0, as they are until the network is solved."""
+        self.arc_flows = np.zeros(len(self.arc_papers), dtype=np.int64)
+        if self.sparse:
+            import scipy.sparse
+
+            self.flow_matrix = scipy.sparse.csr_matrix(self.cost_matrix.shape)
+        else:
+            self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
+
+    def node_potentials(self):
+        """
+        Return an int64 array of node potentials, indexed by Node number, for
+        the solved network: shortest path distances in the residual graph
+        from a virtual root linked to every node. Every residual arc has a
+        non-negative reduced cost (cost + potential(tail) - potential(head)).
+        """
+        flows = self.min_cost_flow.flows(
+            np.arange(self.min_cost_flow.num_arcs(), dtype=np.int32)
+        )
+        forward = flows < self.capacities
+        backward = flows > 0
+        tails = np.concatenate(
+            [self.start_nodes[forward], self.end_nodes[backward]]
+        )
+        heads = np.concatenate(
+            [self.end_nodes[forward], self.start_nodes[backward]]
+        )
+        weights = np.concatenate([self.costs[forward], -self.costs[backward]])
+        order = np.argsort(heads, kind="stable")
+        tails, heads, weights = tails[order], heads[order], weights[order]
+        nodes, first_arcs = np.unique(heads, return_index=True)
+
+        # Bellman-Ford, relaxing all arcs at once until no distance improves.
+        # The root's arcs have cost 0, so every distance starts at 0.
+        potentials = np.zeros(self.current_offset, dtype=np.int64)
+        for _ in range(self.current_offset + 1):
+            if len(nodes) == 0:
+                break
+            shortest = np.minimum.reduceat(
+                potentials[tails] + weights, first_arcs
+            )
+            improved = shortest < potentials[nodes]
+            if not improved.any():
+                break
+            potentials[nodes[improved]] = shortest[improved]
+        else:
+            raise SolverException(
+                "The residual graph has a negative cycle, the flow is not optimal"
+            )
+        return potentials
+
+    def violating_pairs(self, limit_matrix=None, chunk_cells=1 << 20):
+        """
+        Return (paper indices, reviewer indices) of the pairs left out by
+        `candidate_matrix` whose arcs would have a negative reduced cost in
+        the solved network, i.e. the pairs that could still lower its cost.
+        Pairs without an arc (conflicts, unknown scores, a limit of 0) are
+        never returned. The solution is optimal over all pairs if there are none.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if self.candidate_matrix is None:
+            return empty, empty
+
+        potentials = self.node_potentials()
+        reviewer_potentials = potentials[
+            [n.number for n in self.reviewer_nodes]
+        ]
+        paper_potentials = potentials[[n.number for n in self.paper_nodes]]
+
+        chunk_size = max(1, chunk_cells // max(1, self.num_papers))
+        papers, reviewers = [empty], [empty]
+        for start in range(0, self.num_reviewers, chunk_size):
+            block = slice(start, start + chunk_size)
+            keep, costs = self._arc_costs(
+                self.cost_matrix[:, block], self.constraint_matrix[:, block]
+            )
+            keep &= ~self.candidate_matrix[:, block]
+            if limit_matrix is not None:
+                keep &= limit_matrix[:, block] > 0
+            keep &= (
+                costs
+                + reviewer_potentials[block]
+                - paper_potentials[:, np.newaxis]
+                < 0
+            )
+            block_papers, block_reviewers = np.nonzero(keep)
+            papers.append(block_papers)
+            reviewers.append(block_reviewers + start)
+
+        return np.concatenate(papers), np.concatenate(reviewers)
+
+    def _assignment_arcs(self, limit_matrix, chunk_cells=1 << 20):
+        """
+        Return (reviewer indices, paper indices, capacities, costs) arrays for
+        the reviewer -> paper arcs, ordered by reviewer and then by paper.
+
+        Dense matrices are processed a block of reviewers at a time, so only
+        masks of about `chunk_cells` cells are built. Sparse inputs only give
+        arcs for stored cells, each with a capacity of 1.
+        """
+        if self.sparse:
+            pattern = (
+                (self.cost_matrix != 0).astype(np.int8)
+                + (self.constraint_matrix != 0).astype(np.int8)
+            ).tocoo()
+            order = np.lexsort((pattern.row, pattern.col))
+            papers = pattern.row[order].astype(np.int64)
+            reviewers = pattern.col[order].astype(np.int64)
+            if len(papers) == 0:
+                costs = constraints = np.zeros(0)
+            else:
+                costs = np.asarray(
+                    self.cost_matrix.tocsr()[papers, reviewers]
+                ).ravel()
+                constraints = np.asarray(
+                    self.constraint_matrix.tocsr()[papers, reviewers]
+                ).ravel()
+            keep, costs = self._arc_costs(costs, constraints)
+            return (
+                reviewers[keep],
+                papers[keep],
+                np.ones(np.count_nonzero(keep), dtype=np.int64),
+                costs[keep],
+            )
+
+        chunk_size = max(1, chunk_cells // max(1, self.num_papers))
+        parts = []
+        for start in range(0, self.num_reviewers, chunk_size):
+            block = slice(start, start + chunk_size)
+            # (reviewers, papers) views, so nonzero() yields reviewer-major order
+            keep, costs = self._arc_costs(
+                self.cost_matrix[:, block].T,
+                self.constraint_matrix[:, block].T,
+            )
+            if self.candidate_matrix is not None:
+                keep &= self.candidate_matrix[:, block].T
+            reviewers, papers = np.nonzero(keep)
+            if limit_matrix is None:
+                capacities = np.ones(len(reviewers), dtype=np.int64)
+            else:
+                capacities = limit_matrix[:, block].T[reviewers, papers]
+            parts.append(
+                (
+                    reviewers + start,
+                    papers,
+                    capacities.astype(np.int64),
+                    costs[reviewers, papers],
+                )
+            )
+
+        if not parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+    def _arc_costs(self, costs, constraints):
+        """
+        Return (mask of pairs that get an arc, integer arc costs) for arrays of
+        pair costs and constraints.
+
+        a constraint of 0 means there's no constraint, so apply the cost as normal
+        a constraint of 1 means that this user was explicitly assigned to this paper
+        a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
+        """
+        costs = costs.astype(np.int64)
+        keep = constraints == 0
+        if not self.allow_zero_score_assignments:
+            keep &= costs != 0
+        forced = constraints == 1
+        if forced.any():
+            # TODO: this should be handled as a hard constraint
+            if self.forced_cost is None:
+                self.forced_cost = int(self._least_cost() - 1)
+            costs[forced] = self.forced_cost
+            keep |= forced
+        return keep, costs
+
     def _check_inputs(self, strict):
         """Validate inputs (e.g. that matrix and array dimensions are correct)"""
         self.logger.debug("Checking graph inputs")
@@ -172,11 +475,40 @@ class SimpleSolver:
         num_reviewers = np.size(self.cost_matrix, axis=1)
 
         for matrix in [self.cost_matrix, self.constraint_matrix]:
-            if not isinstance(matrix, np.ndarray):
+            if self.sparse:
+                if not issparse(matrix):
+                    raise SolverException(
+                        "cost and constraint matrices must both be sparse or both be of type numpy.ndarray"
+                    )
+            elif not isinstance(matrix, np.ndarray):
                 raise SolverException(
                     "cost and constraint matrices must be of type numpy.ndarray"
                 )
 
+        if self.sparse and self.limit_matrix is not None:
+            raise SolverException(
+                "limit_matrix is not supported with sparse cost and constraint matrices"
+            )
+
+        if self.sparse and self.candidate_matrix is not None:
+            raise SolverException(
+                "candidate_matrix is not supported with sparse cost and constraint matrices"
+            )
+
+        if self.candidate_matrix is not None and np.shape(
+            self.candidate_matrix
+        ) != np.shape(self.cost_matrix):
+            raise SolverException(
+                "candidate matrix {} must have the same shape as the cost matrix {}".format(
+                    np.shape(self.candidate_matrix), np.shape(self.cost_matrix)
+                )
+            )
+
+        if self.sparse and self.allow_zero_score_assignments:
+            raise SolverException(
+                "allow_zero_score_assignments requires dense cost and constraint matrices"
+            )
+
         if not np.shape(self.cost_matrix) == np.shape(self.constraint_matrix):
             raise SolverException(
                 "cost {} and constraint {} matrices must be the same shape".format(
@@ -237,15 +569,19 @@ class SimpleSolver:
                 )
             )
 
-        if any([not isinstance(i, int) for i in self.capacities]):
-            raise SolverException(
-                "capacities list may not contain integers of type numpy.int64"
-            )
-
-        if any([not isinstance(i, int) for i in self.costs]):
-            raise SolverException(
-                "costs list may not contain integers of type numpy.int64"
-            )
+        # SimpleMinCostFlow takes int32 node numbers and int64 capacities and costs
+        for name, dtype in [
+            ("start_nodes", np.int32),
+            ("end_nodes", np.int32),
+            ("capacities", np.int64),
+            ("costs", np.int64),
+        ]:
+            if getattr(self, name).dtype != dtype:
+                raise SolverException(
+                    "{} must be an array of type numpy.{}".format(
+                        name, np.dtype(dtype).name
+                    )
+                )
 
     def _boundary_cost(self, boundary_function):
         """
@@ -253,10 +589,7 @@ class SimpleSolver:
 
         """
         if self.cost_matrix.shape > (0, 0):
-            cost_boundary = self.cost_matrix[
-                np.unravel_index(boundary_function(), self.cost_matrix.shape)
-            ]
-            return cost_boundary
+            return boundary_function()
 
         return None
 
@@ -265,14 +598,14 @@ class SimpleSolver:
         finds the greatest value in cost_matrix.
 
         """
-        return self._boundary_cost(self.cost_matrix.argmax)
+        return self._boundary_cost(self.cost_matrix.max)
 
     def _least_cost(self):
         """
         finds the lowest value in cost_matrix.
 
         """
-        return self._boundary_cost(self.cost_matrix.argmin)
+        return self._boundary_cost(self.cost_matrix.min)
 
     def add_node(self, index, supply=0):
         """
@@ -297,21 +630,6 @@ class SimpleSolver:
             self.current_offset += 1
             return new_node
 
-    def add_edge(self, start_node, end_node, capacity, cost):
-        """
-        Adds an "edge" between `start_node` and `end_node` with the given capacity and cost.
-
-        Edges are represented virtually by the presence of Node numbers in the aligned arrays
-        `self.start_nodes` and `self.end_nodes`; there is no "Edge" object.
-        """
-        self.start_nodes.append(start_node)
-        self.end_nodes.append(end_node)
-
-        # cast `capacity` to Python int because SimpleMinCostFlow can't handle other int types
-        # (e.g. numpy.int64)
-        self.capacities.append(int(capacity))
-        self.costs.append(cost)
-
     def construct_solver(self):
         """
         Constructs the OR-Tools MinCostFlow solver with this SimpleSolver's Nodes and edges.
@@ -320,16 +638,15 @@ class SimpleSolver:
 
         self.min_cost_flow = min_cost_flow.SimpleMinCostFlow()
 
-        for arc_index in range(len(self.start_nodes)):
-            self.min_cost_flow.add_arcs_with_capacity_and_unit_cost(
-                self.start_nodes[arc_index].number,
-                self.end_nodes[arc_index].number,
-                self.capacities[arc_index],
-                self.costs[arc_index],
-            )
+        self.min_cost_flow.add_arcs_with_capacity_and_unit_cost(
+            self.start_nodes, self.end_nodes, self.capacities, self.costs
+        )
 
-        for node in self.node_by_number.values():
-            self.min_cost_flow.set_nodes_supplies(node.number, node.supply)
+        nodes = list(self.node_by_number.values())
+        self.min_cost_flow.set_nodes_supplies(
+            np.array([node.number for node in nodes], dtype=np.int32),
+            np.array([node.supply for node in nodes], dtype=np.int64),
+        )
 
     def solve(self):
         """
@@ -344,19 +661,26 @@ class SimpleSolver:
         solver_status = self.min_cost_flow.solve()
         if solver_status == self.min_cost_flow.OPTIMAL:
             self.solved = True
-            for i in range(self.min_cost_flow.num_arcs()):
-                self.cost += self.min_cost_flow.flow(
-                    i
-                ) * self.min_cost_flow.unit_cost(i)
-                r_node = self.node_by_number[self.min_cost_flow.tail(i)]
-                p_node = self.node_by_number[self.min_cost_flow.head(i)]
-                flow = self.min_cost_flow.flow(i)
-
-                if (
-                    r_node in self.reviewer_nodes
-                    and p_node in self.paper_nodes
-                ):
-                    self.flow_matrix[p_node.index, r_node.index] = flow
+            flows = self.min_cost_flow.flows(
+                np.arange(self.min_cost_flow.num_arcs(), dtype=np.int32)
+            )
+            self.cost = int(np.dot(flows, self.costs))
+            self.arc_flows = flows[self.assignment_arcs]
+
+            if self.sparse:
+                import scipy.sparse
+
+                self.flow_matrix = scipy.sparse.csr_matrix(
+                    (self.arc_flows, (self.arc_papers, self.arc_reviewers)),
+                    shape=self.cost_matrix.shape,
+                )
+                self.flow_matrix.eliminate_zeros()
+            else:
+                # a new matrix, so results of earlier solves are kept intact
+                self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
+                self.flow_matrix[
+                    self.arc_papers, self.arc_reviewers
+                ] = self.arc_flows
         else:
             logging.debug("Solver status: {}".format(solver_status))
             self.solved = False
@@ -37,6 +37,7 @@ setup(
     ],
     extras_require={
         "full": ["flower"],
+        "arrow": ["pyarrow"],
     },
     zip_safe=False,
 )
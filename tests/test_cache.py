@@ -0,0 +1,187 @@
+"""
+Unit test suite for `matcher/cache.py`
+"""
+
+import os
+import shutil
+import time
+
+import pytest
+import numpy as np
+import scipy.sparse
+
+from matcher.cache import EncoderCache, fingerprint
+from matcher.core import Matcher
+from matcher.encoder import Encoder, EncoderError
+
+
+def _encoder_inputs():
+    papers = ["paper{}".format(i) for i in range(3)]
+    reviewers = ["reviewer{}".format(i) for i in range(4)]
+    scores_by_type = {
+        "affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.5),
+                ("paper1", "reviewer2", 0.25),
+                ("paper2", "reviewer3", 0.75),
+            ]
+        }
+    }
+    return dict(
+        reviewers=reviewers,
+        papers=papers,
+        constraints=[("paper0", "reviewer1", -1)],
+        scores_by_type=scores_by_type,
+        weight_by_type={"affinity": 1},
+        probability_limits=[("paper1", "reviewer2", 0.5)],
+    )
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_cache_round_trip(tmp_path, sparse):
+    """A stored encoder is loaded back with the same matrices and indexes"""
+    encoder = Encoder(sparse=sparse, **_encoder_inputs())
+    cache = EncoderCache(str(tmp_path))
+    key = fingerprint(_encoder_inputs(), sparse)
+
+    assert cache.load(key) is None
+    cache.store(key, encoder)
+    cached = cache.load(key)
+
+    assert cached.sparse == sparse
+    assert cached.reviewers == encoder.reviewers
+    assert cached.papers == encoder.papers
+    assert cached.index_by_user == encoder.index_by_user
+    assert cached.prob_limit_default == encoder.prob_limit_default
+    for name in [
+        "cost_matrix",
+        "constraint_matrix",
+        "prob_limit_matrix",
+        "aggregate_score_matrix",
+    ]:
+        matrix = getattr(cached, name)
+        assert scipy.sparse.issparse(matrix) == sparse
+        if sparse:
+            matrix = matrix.toarray()
+            expected = getattr(encoder, name).toarray()
+        else:
+            expected = getattr(encoder, name)
+        assert np.array_equal(matrix, expected)
+    assert cache.load_ids(key) == (encoder.reviewers, encoder.papers)
+
+
+def test_cache_copy_on_write(tmp_path):
+    """Modifying a loaded encoder does not change the cache entry"""
+    cache = EncoderCache(str(tmp_path))
+    cache.store("key", Encoder(**_encoder_inputs()))
+
+    cache.load("key").constraint_matrix[0, 1] = 1
+    assert cache.load("key").constraint_matrix[0, 1] == -1
+
+
+def test_cache_fingerprint():
+    """Fingerprints only change with the inputs"""
+    inputs = _encoder_inputs()
+    assert fingerprint(inputs) == fingerprint(_encoder_inputs())
+
+    inputs["weight_by_type"] = {"affinity": 2}
+    assert fingerprint(inputs) != fingerprint(_encoder_inputs())
+
+    columns = (np.arange(3), np.arange(3), np.ones(3))
+    assert fingerprint(columns) == fingerprint(
+        (np.arange(3), np.arange(3), np.ones(3))
+    )
+    assert fingerprint(columns) != fingerprint(
+        (np.arange(3), np.arange(3), np.zeros(3))
+    )
+
+    edges = [("paper{}".format(i), "reviewer0", i / 7) for i in range(1000)]
+    assert fingerprint(edges) == fingerprint(list(edges))
+    assert fingerprint(edges) != fingerprint(edges[:-1])
+    assert fingerprint(edges) != fingerprint(tuple(edges))
+    assert fingerprint([[1, 2], 3]) != fingerprint([[1], 2, 3])
+    assert fingerprint([np.arange(2000)]) != fingerprint(
+        [np.arange(2000) % 1000]
+    )
+
+
+def test_cache_eviction(tmp_path):
+    """Least recently used entries are evicted once the cache is too large"""
+    cache = EncoderCache(str(tmp_path))
+    cache.store("first", Encoder(**_encoder_inputs()))
+    entry_size = sum(
+        entry.stat().st_size for entry in os.scandir(tmp_path / "first")
+    )
+
+    cache.max_bytes = 2 * entry_size
+    time.sleep(0.01)
+    cache.store("second", Encoder(**_encoder_inputs()))
+    time.sleep(0.01)
+    # loading an entry marks it as recently used
+    cache.load("first")
+    time.sleep(0.01)
+    cache.store("third", Encoder(**_encoder_inputs()))
+
+    assert sorted(os.listdir(tmp_path)) == ["first", "third"]
+
+
+def test_matcher_cache(tmp_path):
+    """Matcher stores the encoding on the first run and loads it on later runs"""
+    inputs = _encoder_inputs()
+    match_data = dict(
+        inputs,
+        minimums=[0] * 4,
+        maximums=[1] * 4,
+        demands=[1] * 3,
+        cache_dir=str(tmp_path),
+        cache_key="run",
+        assignments_output=str(tmp_path / "assignments.json"),
+        alternates_output=str(tmp_path / "alternates.json"),
+    )
+    matcher = Matcher(datasource=match_data, solver_class="MinMax")
+    matcher.run()
+    assert matcher.get_status() == "Complete"
+    assert os.path.exists(tmp_path / "run" / "meta.json")
+
+    # later runs only need the cache key, not the edges
+    match_data.update(constraints=[], scores_by_type={}, probability_limits=[])
+    cached_matcher = Matcher(datasource=match_data, solver_class="MinMax")
+    cached_matcher.run()
+    assert cached_matcher.get_status() == "Complete"
+    assert cached_matcher.assignments == matcher.assignments
+
+    # an encoder loaded beforehand is used even if its entry is evicted
+    encoder = EncoderCache(str(tmp_path)).load("run")
+    shutil.rmtree(tmp_path / "run")
+    match_data.update(encoder=encoder)
+    loaded_matcher = Matcher(datasource=match_data, solver_class="MinMax")
+    loaded_matcher.run()
+    assert loaded_matcher.get_status() == "Complete"
+    assert loaded_matcher.assignments == matcher.assignments
+
+
+@pytest.mark.parametrize("keep_score_matrices", [False, True])
+def test_matcher_cache_delta(tmp_path, keep_score_matrices):
+    """Encoders the Matcher cached take score deltas if it keeps score matrices"""
+    match_data = dict(
+        _encoder_inputs(),
+        minimums=[0] * 4,
+        maximums=[1] * 4,
+        demands=[1] * 3,
+        keep_score_matrices=keep_score_matrices,
+        cache_dir=str(tmp_path),
+        cache_key="run",
+        assignments_output=str(tmp_path / "assignments.json"),
+        alternates_output=str(tmp_path / "alternates.json"),
+    )
+    Matcher(datasource=match_data, solver_class="MinMax").run()
+
+    encoder = EncoderCache(str(tmp_path)).load("run")
+    encoder.apply_delta(constraint_updates=[("paper2", "reviewer0", -1)])
+    added_edges = {"affinity": [("paper1", "reviewer1", 1.0)]}
+    if keep_score_matrices:
+        encoder.apply_delta(added_edges=added_edges)
+        assert encoder.aggregate_score_matrix[1, 1] == 1.0
+    else:
+        with pytest.raises(EncoderError):
+            encoder.apply_delta(added_edges=added_edges)
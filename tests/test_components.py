@@ -0,0 +1,209 @@
+"""
+Unit test suite for `matcher/components.py`
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from matcher import Matcher
+from matcher.components import ComponentSolver, connected_components
+from matcher.encoder import Encoder
+from matcher.solvers import FairIR, MinMaxSolver
+
+
+def _problem(num_groups=3, num_papers=4, num_reviewers=5, seed=0):
+    """Groups of papers and reviewers with scores only within each group"""
+    rng = np.random.default_rng(seed)
+    reviewers, papers, scores = [], [], []
+    for group in range(num_groups):
+        group_reviewers = [
+            "reviewer{}_{}".format(group, index)
+            for index in range(num_reviewers)
+        ]
+        group_papers = [
+            "paper{}_{}".format(group, index) for index in range(num_papers)
+        ]
+        reviewers += group_reviewers
+        papers += group_papers
+        scores += [
+            (paper, reviewer, float(rng.random()))
+            for paper, reviewer in itertools.product(
+                group_papers, group_reviewers
+            )
+        ]
+    return reviewers, papers, scores
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_connected_components(sparse):
+    """Conflicts and unknown scores separate components, forced pairs join them"""
+    reviewers = ["reviewer{}".format(index) for index in range(5)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        ("paper0", "reviewer0", 0.5),
+        ("paper1", "reviewer0", 0.5),
+        ("paper1", "reviewer1", 0.5),
+        ("paper2", "reviewer2", 0.5),
+        ("paper2", "reviewer3", 0.5),
+    ]
+    constraints = [
+        ("paper2", "reviewer3", -1),
+        ("paper3", "reviewer3", 1),
+    ]
+    encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": scores}},
+        {"Affinity": 1},
+        sparse=sparse,
+    )
+    components = [
+        (papers.tolist(), reviewers.tolist())
+        for papers, reviewers in connected_components(encoder)
+    ]
+
+    assert components == [
+        ([0, 1], [0, 1]),
+        ([2], [2]),
+        ([3], [3]),
+        ([], [4]),
+    ]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_matcher_split_components(num_workers, tmp_path):
+    """Solving components separately gives the assignment of the whole problem"""
+    reviewers, papers, scores = _problem()
+
+    results = []
+    for split_components in [False, True]:
+        test_matcher = Matcher(
+            {
+                "reviewers": reviewers,
+                "papers": papers,
+                "scores_by_type": {"affinity": {"edges": scores}},
+                "weight_by_type": {"affinity": 1},
+                "minimums": [1] * len(reviewers),
+                "maximums": [2] * len(reviewers),
+                "demands": [2] * len(papers),
+                "num_alternates": 2,
+                "split_components": split_components,
+                "num_workers": num_workers,
+                "assignments_output": str(tmp_path / "assignments.json"),
+                "alternates_output": str(tmp_path / "alternates.json"),
+            },
+            solver_class="MinMax",
+        )
+        test_matcher.run()
+
+        assert test_matcher.get_status() == "Complete"
+        results.append(test_matcher)
+
+    np.testing.assert_array_equal(results[0].solution, results[1].solution)
+    assert results[0].assignments == results[1].assignments
+    assert results[0].alternates == results[1].alternates
+
+
+def test_matcher_split_components_alternates(tmp_path):
+    """Alternates picked by the solver in each component use global IDs"""
+    reviewers, papers, scores = _problem(num_reviewers=6)
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * len(reviewers),
+            "maximums": [2] * len(reviewers),
+            "demands": [2] * len(papers),
+            "num_alternates": 2,
+            "probability_limits": 0.5,
+            "split_components": True,
+            "num_workers": 1,
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+        },
+        solver_class="Randomized",
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    assert set(test_matcher.alternates) == set(papers)
+    # alternates are sampled, so papers may get fewer than 2
+    assert any(test_matcher.alternates.values())
+    for paper, alternates in test_matcher.alternates.items():
+        group = paper.split("_")[0][len("paper") :]
+        assigned = {entry["user"] for entry in test_matcher.assignments[paper]}
+        assert len(alternates) <= 2
+        for entry in alternates:
+            assert entry["user"].startswith("reviewer{}_".format(group))
+            assert entry["user"] not in assigned
+
+
+def test_matcher_split_components_infeasible(tmp_path):
+    """A component whose demand exceeds its supply has no solution"""
+    reviewers, papers, scores = _problem()
+    maximums = [2] * len(reviewers)
+    # the whole problem has enough supply, the last group does not
+    maximums[-5:] = [1] * 5
+    maximums[0] = 10
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * len(reviewers),
+            "maximums": maximums,
+            "demands": [2] * len(papers),
+            "split_components": True,
+            "num_workers": 1,
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+        },
+        solver_class="MinMax",
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "No Solution"
+
+
+@pytest.mark.parametrize("solver_class", [MinMaxSolver, FairIR])
+def test_component_status_info_time_budget(solver_class):
+    """With a time budget, the status info of the components is combined, not dropped"""
+    reviewers, papers, scores = _problem(
+        num_groups=2, num_papers=3, num_reviewers=4
+    )
+    encoder = Encoder(
+        reviewers, papers, [], {"affinity": {"edges": scores}}, {"affinity": 1}
+    )
+    problem = ([0] * len(reviewers), [2] * len(reviewers), [2] * len(papers))
+
+    solver = ComponentSolver(
+        solver_class,
+        connected_components(encoder),
+        *problem,
+        encoder,
+        max_workers=1,
+        time_budget=5,
+    )
+    solver.solve()
+    status_info = solver.get_additional_status_info()
+
+    whole = solver_class(*problem, encoder, time_budget=5)
+    whole.solve()
+    whole_status_info = whole.get_additional_status_info()
+
+    assert status_info["components"] == "2"
+    assert status_info["time_budget_exhausted"] == "False"
+    assert float(status_info["objective"]) == pytest.approx(
+        float(whole_status_info["objective"])
+    )
+    if "makespan" in whole_status_info:
+        assert float(status_info["makespan"]) == pytest.approx(
+            float(whole_status_info["makespan"])
+        )
+        assert float(status_info["makespan_gap"]) >= 0
@@ -3,6 +3,7 @@ Unit test suite for `matcher/encoder.py`
 """
 
 import itertools
+import json
 from collections import namedtuple
 
 import pytest
@@ -547,3 +548,401 @@ def test_encoder_no_papers(encoder_context):
         )
 
     assert "Papers List can not be empty." == str(exc.value)
+
+
+def test_encoder_sparse_matches_dense(encoder_context):
+    """A sparse encoding should hold the same values as the dense encoding"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.4),
+                ("paper1", "reviewer1", 0.5),
+                ("paper2", "reviewer3", 0.1),
+                ("paper2", "reviewer3", 0.2),  # later duplicates win
+            ]
+        },
+        "Bid": {
+            "edges": [
+                ("paper0", "reviewer0", 1.0),
+                ("paper0", "reviewer2", 0.5),
+            ]
+        },
+    }
+    weight_by_type = {"Affinity": 1, "Bid": 2}
+    constraints = [("paper1", "reviewer2", -1), ("paper2", "reviewer0", 1)]
+    prob_limits = [("paper0", "reviewer1", 0.0), ("paper1", "reviewer1", 0.5)]
+
+    kwargs = dict(normalization_types=["Bid"], probability_limits=prob_limits)
+    dense = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        scores_by_type,
+        weight_by_type,
+        **kwargs,
+    )
+    sparse = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        scores_by_type,
+        weight_by_type,
+        sparse=True,
+        **kwargs,
+    )
+
+    assert sparse.aggregate_score_matrix.nnz == 4
+    assert_arrays(
+        sparse.aggregate_score_matrix.toarray().flatten(),
+        dense.aggregate_score_matrix.flatten(),
+    )
+    assert_arrays(
+        sparse.constraint_matrix.toarray().flatten(),
+        dense.constraint_matrix.flatten(),
+    )
+
+    mock_solution = np.asarray([[1, 0, 0, 0], [0, 1, 0, 1], [0, 0, 1, 0]])
+    assert sparse.decode_assignments(
+        mock_solution
+    ) == dense.decode_assignments(mock_solution)
+    assert sparse.decode_alternates(
+        mock_solution, 2
+    ) == dense.decode_alternates(mock_solution, 2)
+
+    sparse.densify()
+    assert not sparse.sparse
+    assert_arrays(sparse.cost_matrix.flatten(), dense.cost_matrix.flatten())
+    assert np.all(sparse.prob_limit_matrix == dense.prob_limit_matrix)
+
+
+def test_encoder_sparse_nonzero_default(encoder_context):
+    """Sparse encodings can not represent a non-zero default score"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    scores_by_type = {"Bid": {"default": 0.25, "edges": []}}
+
+    with pytest.raises(EncoderError):
+        Encoder(reviewers, papers, [], scores_by_type, {"Bid": 1}, sparse=True)
+
+
+def test_encoder_columnar_edges(encoder_context):
+    """Edges may be given as triples, as a tuple of arrays, or as a DataFrame"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    triples = [
+        ("paper0", "reviewer1", 0.1),
+        ("paper2", "reviewer3", 0.2),
+        ("paper0", "reviewer1", 0.3),  # later duplicates win
+    ]
+    columns = tuple(np.array(column) for column in zip(*triples))
+    constraints = (
+        np.array(["paper1", "paper1"]),
+        np.array(["reviewer0", "reviewer0"]),
+        np.array([1, -1]),
+    )
+
+    from_triples = Encoder(
+        reviewers,
+        papers,
+        [],
+        {"Affinity": {"edges": triples}},
+        {"Affinity": 1},
+    )
+    from_columns = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": columns}},
+        {"Affinity": 1},
+    )
+
+    expected = np.zeros(matrix_shape)
+    expected[0, 1] = 0.3
+    expected[2, 3] = 0.2
+    assert np.all(from_triples.aggregate_score_matrix == expected)
+    assert np.all(from_columns.aggregate_score_matrix == expected)
+    assert from_columns.constraint_matrix[1, 0] == -1
+
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame(triples, columns=["head", "tail", "weight"])
+    from_frame = Encoder(
+        reviewers, papers, [], {"Affinity": {"edges": frame}}, {"Affinity": 1}
+    )
+    assert np.all(from_frame.aggregate_score_matrix == expected)
+
+
+def test_encoder_unknown_id(encoder_context):
+    """Edges that refer to an unknown paper or reviewer are rejected"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    scores_by_type = {
+        "Affinity": {"edges": [("paper0", "reviewer_unknown", 0.5)]}
+    }
+
+    with pytest.raises(KeyError):
+        Encoder(reviewers, papers, [], scores_by_type, {"Affinity": 1})
+
+
+def test_encoder_compact(encoder_context):
+    """A compact encoding should use small dtypes and hold the same values"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.4),
+                ("paper1", "reviewer1", 0.5),
+                ("paper2", "reviewer3", 0.2),
+            ]
+        },
+        "Bid": {"edges": [("paper0", "reviewer2", "0.5")]},
+    }
+    weight_by_type = {"Affinity": 1, "Bid": 2}
+    constraints = [("paper1", "reviewer2", "-1"), ("paper2", "reviewer0", 1)]
+
+    kwargs = dict(normalization_types=["Bid"], probability_limits=0.5)
+    dense = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        scores_by_type,
+        weight_by_type,
+        **kwargs,
+    )
+    compact = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        scores_by_type,
+        weight_by_type,
+        compact=True,
+        **kwargs,
+    )
+
+    assert compact.aggregate_score_matrix.dtype == np.float32
+    assert compact.cost_matrix.dtype == np.float32
+    assert compact.constraint_matrix.dtype == np.int8
+    assert compact.prob_limit_matrix.dtype == np.float64
+    assert np.allclose(compact.cost_matrix, dense.cost_matrix)
+    assert np.array_equal(compact.constraint_matrix, dense.constraint_matrix)
+
+    mock_solution = np.asarray([[1, 0, 0, 0], [0, 1, 0, 1], [0, 0, 1, 0]])
+    # decoded scores are plain floats, so the output stays JSON serializable
+    json.dumps(compact.decode_assignments(mock_solution))
+    json.dumps(compact.decode_alternates(mock_solution, 2))
+
+
+def test_encoder_decode_alternates_ties(encoder_context):
+    """Alternates are ranked by score, ties keep reviewer order, assigned reviewers are skipped"""
+    papers, reviewers, matrix_shape = encoder_context(
+        n_reviewers=5, n_papers=2
+    )
+
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.5),
+                ("paper0", "reviewer1", 0.9),
+                ("paper0", "reviewer2", 0.5),
+                ("paper0", "reviewer3", 0.5),
+                ("paper0", "reviewer4", 0.9),
+                ("paper1", "reviewer3", 0.1),
+            ]
+        }
+    }
+    encoder = Encoder(reviewers, papers, [], scores_by_type, {"Affinity": 1})
+    mock_solution = np.asarray([[0, 0, 0, 0, 1], [1, 1, 1, 1, 1]])
+
+    alternates = encoder.decode_alternates(mock_solution, 3)
+    assert alternates == {
+        "paper0": [
+            {"aggregate_score": 0.9, "user": "reviewer1"},
+            {"aggregate_score": 0.5, "user": "reviewer0"},
+            {"aggregate_score": 0.5, "user": "reviewer2"},
+        ],
+        "paper1": [],
+    }
+    assert encoder.decode_assignments(mock_solution)["paper0"] == [
+        {"aggregate_score": 0.9, "user": "reviewer4"}
+    ]
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_encoder_apply_delta(encoder_context, sparse):
+    """Applying a delta gives the same encoding as encoding the updated problem"""
+    papers, reviewers, matrix_shape = encoder_context()
+    new_papers = ["paper3"]
+    new_reviewers = ["reviewer4", "reviewer5"]
+
+    affinity = [
+        ("paper0", "reviewer0", 0.4),
+        ("paper1", "reviewer1", 0.5),
+        ("paper2", "reviewer3", 0.2),
+    ]
+    bids = [("paper0", "reviewer0", 1.0), ("paper1", "reviewer2", 0.5)]
+    constraints = [("paper1", "reviewer2", -1)]
+    added_affinity = [
+        ("paper3", "reviewer4", 0.7),
+        ("paper0", "reviewer0", 0.9),
+    ]
+    added_bids = [("paper2", "reviewer5", 0.25)]
+    constraint_updates = [
+        ("paper1", "reviewer2", 0),
+        ("paper3", "reviewer5", -1),
+    ]
+
+    kwargs = dict(
+        weight_by_type={"Affinity": 1, "Bid": 2},
+        normalization_types=["Bid"],
+        probability_limits=0.5,
+        sparse=sparse,
+    )
+    encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": affinity}, "Bid": {"edges": bids}},
+        **kwargs,
+    )
+    encoder.apply_delta(
+        added_edges={"Affinity": added_affinity, "Bid": added_bids},
+        removed_edges={"Bid": [("paper1", "reviewer2")]},
+        constraint_updates=constraint_updates,
+        new_reviewers=new_reviewers,
+        new_papers=new_papers,
+    )
+
+    expected = Encoder(
+        reviewers + new_reviewers,
+        papers + new_papers,
+        constraints + constraint_updates,
+        {
+            "Affinity": {"edges": affinity + added_affinity},
+            "Bid": {"edges": bids[:1] + added_bids},
+        },
+        **kwargs,
+    )
+
+    assert encoder.matrix_shape == (4, 6)
+    assert encoder.index_by_user == expected.index_by_user
+    assert encoder.index_by_forum == expected.index_by_forum
+    encoder.densify()
+    expected.densify()
+    for name in [
+        "aggregate_score_matrix",
+        "cost_matrix",
+        "constraint_matrix",
+        "prob_limit_matrix",
+    ]:
+        assert np.array_equal(getattr(encoder, name), getattr(expected, name))
+
+    with pytest.raises(EncoderError):
+        encoder.apply_delta(new_reviewers=["reviewer0"])
+    with pytest.raises(EncoderError):
+        encoder.apply_delta(added_edges={"Unknown": []})
+
+
+def test_encoder_streaming_aggregation(encoder_context):
+    """Without kept score matrices, the aggregate scores are unchanged"""
+    papers, reviewers, matrix_shape = encoder_context()
+
+    scores_by_type = {
+        "Affinity": {
+            "edges": [
+                ("paper0", "reviewer0", 0.4),
+                ("paper1", "reviewer1", 0.5),
+            ]
+        },
+        "Bid": {"edges": [("paper0", "reviewer0", 1.0)]},
+        "Recommendation": {"edges": [("paper0", "reviewer2", 1.0)]},
+    }
+    weight_by_type = {"Affinity": 1, "Bid": 2, "Recommendation": 1}
+    kwargs = dict(normalization_types=["Bid", "Recommendation"])
+
+    kept = Encoder(
+        reviewers, papers, [], scores_by_type, weight_by_type, **kwargs
+    )
+    streamed = Encoder(
+        reviewers,
+        papers,
+        [],
+        scores_by_type,
+        weight_by_type,
+        keep_score_matrices=False,
+        **kwargs,
+    )
+
+    assert streamed.score_matrices == {}
+    assert np.array_equal(
+        streamed.aggregate_score_matrix, kept.aggregate_score_matrix
+    )
+    assert streamed.aggregate_score_matrix[0, 0] == 1.4
+    assert streamed.aggregate_score_matrix[0, 2] == 1.0
+
+    streamed.apply_delta(constraint_updates=[("paper0", "reviewer1", -1)])
+    assert streamed.constraint_matrix[0, 1] == -1
+    with pytest.raises(EncoderError):
+        streamed.apply_delta(added_edges={"Bid": [("paper1", "reviewer1", 1)]})
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_encoder_subset(encoder_context, sparse):
+    """A subset encodes like the problem restricted to its papers and reviewers"""
+    papers, reviewers, matrix_shape = encoder_context()
+    affinity = [
+        ("paper0", "reviewer0", 0.4),
+        ("paper1", "reviewer1", 0.5),
+        ("paper2", "reviewer3", 0.2),
+        ("paper2", "reviewer1", 0.1),
+    ]
+    constraints = [("paper2", "reviewer0", -1)]
+    probability_limits = [("paper2", "reviewer1", 0.25)]
+    attribute_constraints = {
+        "seniors": {
+            "comparator": ">=",
+            "bound": 1,
+            "members": ["reviewer0", "reviewer3"],
+        }
+    }
+    encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": affinity}},
+        {"Affinity": 1},
+        probability_limits=probability_limits,
+        attribute_constraints=attribute_constraints,
+        sparse=sparse,
+    )
+    subset = encoder.subset([0, 2], [0, 1, 3])
+
+    kept = [edge for edge in affinity if edge[0] != "paper1"]
+    expected = Encoder(
+        ["reviewer0", "reviewer1", "reviewer3"],
+        ["paper0", "paper2"],
+        constraints,
+        {"Affinity": {"edges": kept}},
+        {"Affinity": 1},
+        probability_limits=probability_limits,
+        attribute_constraints=attribute_constraints,
+        sparse=sparse,
+    )
+
+    assert subset.matrix_shape == (2, 3)
+    assert subset.index_by_user == expected.index_by_user
+    assert subset.index_by_forum == expected.index_by_forum
+    assert subset.attribute_constraints == expected.attribute_constraints
+    assert subset.sparse == sparse
+    subset.densify()
+    expected.densify()
+    for name in [
+        "aggregate_score_matrix",
+        "cost_matrix",
+        "constraint_matrix",
+        "prob_limit_matrix",
+    ]:
+        assert np.array_equal(getattr(subset, name), getattr(expected, name))
+    # the original encoding is untouched
+    assert encoder.matrix_shape == matrix_shape
@@ -0,0 +1,97 @@
+"""
+Import-time tests: importing the matcher must not load the dependencies of
+solvers that are not used, and cold-start latencies are recorded.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import matcher.solvers
+from matcher.core import SOLVER_MAP
+
+SOLVER_DEPENDENCIES = ["gurobipy", "ortools", "scipy", "psutil", "cffi"]
+
+# subprocesses import the matcher from this checkout, whatever their cwd
+ENV = dict(
+    os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(matcher.__file__))
+)
+
+
+def _loaded_modules(code):
+    """Run `code` in a fresh interpreter and return the solver dependencies it loaded."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            code
+            + "\nimport json, sys"
+            + "\nprint(json.dumps([m for m in {} if m in sys.modules]))".format(
+                SOLVER_DEPENDENCIES
+            ),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=ENV,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_matcher_is_lazy():
+    """Importing matcher loads no solver dependencies"""
+    assert _loaded_modules("import matcher") == []
+
+
+def test_solver_map_imports_selected_solver():
+    """Looking up a solver only imports that solver's dependencies"""
+    loaded = _loaded_modules(
+        "from matcher.core import SOLVER_MAP\nSOLVER_MAP['MinMax']"
+    )
+    assert loaded == ["ortools"]
+
+
+def test_lazy_solver_attributes():
+    """Every solver class can be imported from matcher.solvers"""
+    for name in matcher.solvers.__all__:
+        assert getattr(matcher.solvers, name).__name__ == name
+    assert set(SOLVER_MAP) == {
+        "MinMax",
+        "FairFlow",
+        "Randomized",
+        "FairSequence",
+        "FairIR",
+        "PerturbedMaximization",
+        "Portfolio",
+    }
+    assert "Unknown" not in SOLVER_MAP
+
+    with pytest.raises(AttributeError):
+        matcher.solvers.UnknownSolver
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["-c", "import matcher"],
+        ["-m", "matcher", "--help"],
+        ["-c", "import matcher.service.celery_tasks"],
+    ],
+    ids=["import", "cli", "worker"],
+)
+def test_cold_start_time(command, record_property, tmp_path):
+    """Record the cold-start latency of the CLI and the Celery worker module"""
+    # the CLI writes its log file to the cwd
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable] + command,
+        check=True,
+        capture_output=True,
+        cwd=tmp_path,
+        env=ENV,
+    )
+    record_property("cold_start_seconds", time.perf_counter() - start)
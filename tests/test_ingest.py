@@ -0,0 +1,226 @@
+"""
+Unit test suite for `matcher/ingest.py`
+"""
+
+import numpy as np
+import pytest
+
+from matcher import ingest
+from matcher.encoder import Encoder
+
+
+@pytest.fixture(params=["arrow", "csv"])
+def backend(request, monkeypatch):
+    """Run each test with pyarrow (if installed) and with the csv fallback"""
+    if request.param == "arrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(ingest, "_read_columns_arrow", lambda *args: None)
+    return request.param
+
+
+def _ids(column):
+    return [column.categories[code] for code in column.codes]
+
+
+def test_read_edges(tmp_path, backend):
+    """Fields are stripped, short rows skipped and empty scores flagged"""
+    path = tmp_path / "scores.csv"
+    path.write_text(
+        "paper0, reviewer0,0.5\n"
+        "paper0,reviewer1 ,\n"
+        "paper1\n"
+        "paper1,reviewer0, 0.25\n"
+    )
+    edges = ingest.read_edges(str(path), allow_missing=True)
+
+    assert _ids(edges.papers) == ["paper0", "paper0", "paper1"]
+    assert _ids(edges.reviewers) == ["reviewer0", "reviewer1", "reviewer0"]
+    assert edges.missing.tolist() == [False, True, False]
+    assert edges.values[~edges.missing].tolist() == [0.5, 0.25]
+    assert ingest.used_ids(edges.reviewers, ~edges.missing) == ["reviewer0"]
+
+    with pytest.raises(ingest.IngestError):
+        ingest.read_edges(str(path))
+
+
+def test_read_edges_extra_fields(tmp_path, backend):
+    """Fields after the value are ignored"""
+    path = tmp_path / "constraints.csv"
+    path.write_text("paper0,reviewer0,-1,note\npaper1,reviewer1,1\n")
+    edges = ingest.read_edges(str(path), dtype=int)
+
+    assert _ids(edges.papers) == ["paper0", "paper1"]
+    assert edges.values.tolist() == [-1, 1]
+    assert edges.values.dtype.kind == "i"
+
+
+def test_read_loads(tmp_path, backend):
+    """Load files are read with an optional header"""
+    path = tmp_path / "quota.csv"
+    path.write_text("user,quota\nreviewer0, 3\nreviewer1,1\n")
+    loads = ingest.read_loads(str(path), skip_header=True)
+
+    assert _ids(loads.users) == ["reviewer0", "reviewer1"]
+    assert loads.values.tolist() == [3, 1]
+
+
+def test_assign_loads(tmp_path, backend):
+    """Loads are assigned by reviewer index and unknown users are reported"""
+    path = tmp_path / "max_papers.csv"
+    path.write_text("reviewer2,4\nreviewer9,1\nreviewer0,3\nreviewer2,5\n")
+    loads = ingest.read_loads(str(path))
+
+    maximums = np.full(3, 2)
+    index_by_user = {"reviewer0": 0, "reviewer1": 1, "reviewer2": 2}
+    missing = ingest.assign_loads(maximums, loads, index_by_user)
+
+    assert maximums.tolist() == [3, 2, 5]
+    assert missing == ["reviewer9"]
+
+
+def test_indexed_edges_encoder(tmp_path, backend):
+    """IndexedEdges encode like the equivalent ID triples"""
+    scores_path = tmp_path / "scores.csv"
+    scores_path.write_text(
+        "paper0,reviewer0,0.5\n"
+        "paper1,reviewer1,0.75\n"
+        "paper1,reviewer0,\n"
+        "paper2,reviewer2,0.25\n"
+    )
+    constraints_path = tmp_path / "constraints.csv"
+    constraints_path.write_text("paper1,reviewer0,1\npaper0,reviewer1,-1\n")
+
+    columns = ingest.read_all(
+        {
+            "scores": (
+                ingest.read_edges,
+                (str(scores_path),),
+                {"allow_missing": True},
+            ),
+            "constraints": (
+                ingest.read_edges,
+                (str(constraints_path),),
+                {"dtype": int},
+            ),
+        }
+    )
+    scores, constraints = columns["scores"], columns["constraints"]
+
+    # reviewer2 is left out, so its edges are dropped
+    papers = ["paper0", "paper1", "paper2"]
+    reviewers = ["reviewer0", "reviewer1"]
+    index_by_paper = {paper: index for index, paper in enumerate(papers)}
+    index_by_reviewer = {
+        reviewer: index for index, reviewer in enumerate(reviewers)
+    }
+    conflicts = ingest.indexed_edges(
+        scores,
+        index_by_paper,
+        index_by_reviewer,
+        mask=scores.missing,
+        value=-1,
+    )
+    encoder = Encoder(
+        reviewers=reviewers,
+        papers=papers,
+        scores_by_type={
+            "affinity": {
+                "edges": ingest.indexed_edges(
+                    scores,
+                    index_by_paper,
+                    index_by_reviewer,
+                    mask=~scores.missing,
+                )
+            }
+        },
+        weight_by_type={"affinity": 1},
+        constraints=ingest.concat_indexed_edges(
+            [
+                conflicts,
+                ingest.indexed_edges(
+                    constraints, index_by_paper, index_by_reviewer
+                ),
+            ]
+        ),
+    )
+    expected = Encoder(
+        reviewers=reviewers,
+        papers=papers,
+        scores_by_type={
+            "affinity": {
+                "edges": [
+                    ("paper0", "reviewer0", 0.5),
+                    ("paper1", "reviewer1", 0.75),
+                ]
+            }
+        },
+        weight_by_type={"affinity": 1},
+        constraints=[("paper1", "reviewer0", 1), ("paper0", "reviewer1", -1)],
+    )
+
+    assert np.array_equal(encoder.cost_matrix, expected.cost_matrix)
+    assert np.array_equal(
+        encoder.constraint_matrix, expected.constraint_matrix
+    )
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+def test_read_edges_arrow_formats(tmp_path, extension):
+    """Parquet and Arrow IPC files keep their dictionary-encoded IDs"""
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = pa.table(
+        {
+            "papers": pa.array(
+                ["paper0", "paper1", "paper1"]
+            ).dictionary_encode(),
+            "reviewers": pa.array(["reviewer0", "reviewer0", "reviewer1"]),
+            "values": pa.array([0.5, None, 0.25]),
+        }
+    )
+    path = str(tmp_path / ("scores" + extension))
+    if extension == ".parquet":
+        pq.write_table(table, path)
+    else:
+        feather.write_feather(table, path)
+    edges = ingest.read_edges(path, allow_missing=True)
+
+    assert edges.papers.categories == ["paper0", "paper1"]
+    assert _ids(edges.papers) == ["paper0", "paper1", "paper1"]
+    assert _ids(edges.reviewers) == ["reviewer0", "reviewer0", "reviewer1"]
+    assert edges.missing.tolist() == [False, True, False]
+    assert edges.values[~edges.missing].tolist() == [0.5, 0.25]
+
+    with pytest.raises(ingest.IngestError):
+        ingest.read_edges(path)
+
+
+def test_read_npz(tmp_path):
+    """NPZ files hold IDs or integer codes with their categories"""
+    path = str(tmp_path / "scores.npz")
+    np.savez(
+        path,
+        papers=np.array([1, 0, 1]),
+        papers_categories=np.array(["paper0", "paper1"]),
+        reviewers=np.array(["reviewer1", "reviewer0", "reviewer0"]),
+        values=np.array([0.5, np.nan, 0.25]),
+    )
+    edges = ingest.read_edges(path, allow_missing=True)
+
+    assert _ids(edges.papers) == ["paper1", "paper0", "paper1"]
+    assert _ids(edges.reviewers) == ["reviewer1", "reviewer0", "reviewer0"]
+    assert edges.missing.tolist() == [False, True, False]
+    assert edges.values.tolist() == [0.5, 0, 0.25]
+
+    loads_path = str(tmp_path / "quota.npz")
+    np.savez(
+        loads_path,
+        users=np.array(["reviewer0", "reviewer1"]),
+        values=np.array([3, 1]),
+    )
+    loads = ingest.read_loads(loads_path, skip_header=True)
+    assert _ids(loads.users) == ["reviewer0", "reviewer1"]
+    assert loads.values.tolist() == [3, 1]
@@ -6,6 +6,7 @@ import itertools
 import random
 import pytest
 import logging
+import numpy as np
 from numpy import testing as nptest
 from matcher import Matcher
 
@@ -127,6 +128,53 @@ def test_matcher_minmax_fixed_input():
     assert test_minmax_matcher.alternates
 
 
+def test_matcher_minmax_sparse_fixed_input():
+    reviewers = ["reviewer1", "reviewer2", "reviewer3"]
+    papers = ["paper1", "paper2", "paper3"]
+
+    scores = [
+        ("paper1", "reviewer1", 1),
+        ("paper1", "reviewer3", 0.25),
+        ("paper2", "reviewer1", 1),
+        ("paper2", "reviewer3", 0.25),
+        ("paper3", "reviewer1", 1),
+        ("paper3", "reviewer2", 0.2),
+        ("paper3", "reviewer3", 0.5),
+    ]
+
+    test_minmax_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0, 0, 0],
+            "maximums": [1, 1, 1],
+            "demands": [1, 1, 1],
+            "num_alternates": 1,
+            "sparse": True,
+        },
+        solver_class="MinMax",
+    )
+
+    test_minmax_matcher.run()
+
+    assert test_minmax_matcher.get_status() == "Complete"
+    assert (
+        nptest.assert_array_equal(
+            test_minmax_matcher.solution.toarray(),
+            [[1.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]],
+        )
+        is None
+    )
+    assert test_minmax_matcher.assignments["paper3"] == [
+        {"aggregate_score": 0.2, "user": "reviewer2"}
+    ]
+    assert test_minmax_matcher.alternates["paper1"] == [
+        {"aggregate_score": 0.25, "user": "reviewer3"}
+    ]
+
+
 def test_matcher_fairflow_fixed_input():
     reviewers = ["reviewer1", "reviewer2", "reviewer3"]
     papers = ["paper1", "paper2", "paper3"]
@@ -174,3 +222,185 @@ def test_matcher_fairflow_fixed_input():
     )
     assert test_fairflow_matcher.assignments
     assert test_fairflow_matcher.alternates
+
+
+@pytest.mark.parametrize(
+    "solver_class",
+    [
+        "MinMax",
+        "FairFlow",
+        "FairSequence",
+        "FairIR",
+        "Randomized",
+        "PerturbedMaximization",
+    ],
+)
+def test_matcher_compact(solver_class):
+    """Every solver accepts a compact (float32/int8) encoding"""
+    reviewers = ["reviewer1", "reviewer2", "reviewer3"]
+    papers = ["paper1", "paper2", "paper3"]
+
+    scores = [
+        ("paper1", "reviewer1", 1),
+        ("paper1", "reviewer3", 0.25),
+        ("paper2", "reviewer1", 1),
+        ("paper2", "reviewer3", 0.25),
+        ("paper3", "reviewer1", 1),
+        ("paper3", "reviewer2", 0.2),
+        ("paper3", "reviewer3", 0.5),
+    ]
+
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "constraints": [("paper1", "reviewer2", -1)],
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0, 0, 0],
+            "maximums": [1, 1, 1],
+            "demands": [1, 1, 1],
+            "num_alternates": 1,
+            "probability_limits": 1.0,
+            "perturbation": 0.5,
+            "compact": True,
+        },
+        solver_class=solver_class,
+    )
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    assert all(
+        isinstance(entry["aggregate_score"], float)
+        for entries in test_matcher.assignments.values()
+        for entry in entries
+    )
+    if solver_class == "MinMax":
+        nptest.assert_array_equal(
+            test_matcher.solution,
+            [[1.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]],
+        )
+
+
+def test_matcher_minmax_pricing():
+    """The MinMax solver accepts pricing_top_k from the datasource"""
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        (paper, reviewer, (index * 7 % 11 + 1) / 11)
+        for index, (paper, reviewer) in enumerate(
+            itertools.product(papers, reviewers)
+        )
+    ]
+
+    total_scores = []
+    for pricing_top_k in [None, 1]:
+        test_matcher = Matcher(
+            {
+                "reviewers": reviewers,
+                "papers": papers,
+                "scores_by_type": {"affinity": {"edges": scores}},
+                "weight_by_type": {"affinity": 1},
+                "minimums": [0] * 6,
+                "maximums": [2] * 6,
+                "demands": [2] * 4,
+                "num_alternates": 1,
+                "pricing_top_k": pricing_top_k,
+            },
+            solver_class="MinMax",
+        )
+        test_matcher.run()
+
+        assert test_matcher.get_status() == "Complete"
+        total_scores.append(
+            sum(
+                entry["aggregate_score"]
+                for entries in test_matcher.assignments.values()
+                for entry in entries
+            )
+        )
+
+    assert total_scores[0] == pytest.approx(total_scores[1])
+
+
+@pytest.mark.parametrize("solver_class", ["FairFlow", "FairSequence"])
+def test_matcher_time_budget(solver_class):
+    """Solvers return a complete assignment when the time budget runs out"""
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        (paper, reviewer, (index * 7 % 11 + 1) / 11)
+        for index, (paper, reviewer) in enumerate(
+            itertools.product(papers, reviewers)
+        )
+    ]
+
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * 6,
+            "maximums": [2] * 6,
+            "demands": [2] * 4,
+            "num_alternates": 1,
+            "time_budget": 1e-9,
+        },
+        solver_class=solver_class,
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    assert all(len(test_matcher.assignments[paper]) == 2 for paper in papers)
+
+
+@pytest.mark.parametrize(
+    "solver_class", ["Randomized", "PerturbedMaximization"]
+)
+def test_matcher_num_samples(solver_class, tmp_path):
+    """Randomized solvers write all samples and their marginals"""
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        (paper, reviewer, (index * 7 % 11 + 1) / 11)
+        for index, (paper, reviewer) in enumerate(
+            itertools.product(papers, reviewers)
+        )
+    ]
+
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * 6,
+            "maximums": [2] * 6,
+            "demands": [2] * 4,
+            "probability_limits": 0.5,
+            "perturbation": 0.5,
+            "num_samples": 8,
+            "num_workers": 2,
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+            "samples_output": str(tmp_path / "samples.npz"),
+        },
+        solver_class=solver_class,
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    samples = np.load(tmp_path / "samples.npz")
+    assert samples["paper_ids"].tolist() == papers
+    assert samples["reviewer_ids"].tolist() == reviewers
+    assert samples["assignments"].shape == (8, len(samples["papers"]))
+    nptest.assert_array_equal(
+        test_matcher.samples.assignment(0), test_matcher.solution
+    )
+    for assignment in samples["assignments"]:
+        assert np.all(np.bincount(samples["papers"], weights=assignment) == 2)
+    nptest.assert_array_equal(
+        samples["marginals"], samples["assignments"].mean(axis=0)
+    )
@@ -0,0 +1,160 @@
+"""
+Unit test suite for `matcher/presolve.py`
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from matcher import Matcher
+from matcher.encoder import Encoder
+from matcher.presolve import Presolve
+from matcher.solvers import SolverException
+
+
+def _problem(seed=0):
+    """Papers and reviewers with some unknown scores, a conflict and forced pairs"""
+    rng = np.random.default_rng(seed)
+    reviewers = ["reviewer{}".format(index) for index in range(10)]
+    papers = ["paper{}".format(index) for index in range(8)]
+    # reviewer9 has no scores
+    scores = [
+        (paper, reviewer, float(rng.random()))
+        for paper, reviewer in itertools.product(papers, reviewers[:-1])
+        if rng.random() < 0.7
+    ]
+    constraints = [
+        ("paper0", "reviewer1", 1),
+        ("paper2", "reviewer3", 1),
+        ("paper4", "reviewer0", -1),
+    ]
+    return reviewers, papers, scores, constraints
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_presolve(sparse):
+    """Forced pairs are fixed, papers and reviewers with nothing left are removed"""
+    reviewers, papers, scores, constraints = _problem()
+    encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": scores}},
+        {"Affinity": 1},
+        sparse=sparse,
+    )
+    maximums = [3] * 10
+    maximums[1] = 1
+    maximums[5] = 0
+    demands = [2] * 8
+    demands[7] = 0
+    presolve = Presolve(encoder, [1] * 10, maximums, demands)
+
+    # paper7 has no demand; reviewer1 is full, reviewer5 has no capacity
+    # and reviewer9 no scores
+    assert presolve.papers.tolist() == [0, 1, 2, 3, 4, 5, 6]
+    assert presolve.reviewers.tolist() == [0, 2, 3, 4, 6, 7, 8]
+    assert presolve.demands == [1, 2, 1, 2, 2, 2, 2]
+    assert presolve.maximums == [3, 3, 2, 3, 3, 3, 3]
+    assert presolve.minimums == [1, 1, 0, 1, 1, 1, 1]
+    assert presolve.encoder.matrix_shape == (7, 7)
+    assert presolve.encoder.reviewers == [
+        reviewers[index] for index in presolve.reviewers
+    ]
+    # the forced pair kept in the reduced problem cannot be assigned again
+    constraint_matrix = presolve.encoder.constraint_matrix
+    if sparse:
+        constraint_matrix = constraint_matrix.toarray()
+    assert constraint_matrix[2, 2] == -1
+    assert presolve.get_additional_status_info() == {
+        "presolve_forced_pairs": "2",
+        "presolve_removed_papers": "1",
+        "presolve_removed_reviewers": "3",
+    }
+
+    solution = np.zeros((7, 7))
+    solution[1, 0] = 1
+    restored = presolve.restore(solution)
+    if sparse:
+        restored = restored.toarray()
+    expected = np.zeros((8, 10))
+    expected[1, 0] = 1
+    expected[0, 1] = 1
+    expected[2, 3] = 1
+    np.testing.assert_array_equal(restored, expected)
+
+    assert presolve.restore_alternates({0: [1, 2]}) == {
+        0: [2, 3],
+        **{index: [] for index in range(1, 8)},
+    }
+
+
+def test_presolve_infeasible():
+    """Forced pairs beyond a load, or papers without reviewers, raise"""
+    reviewers, papers, scores, constraints = _problem()
+    encoder = Encoder(
+        reviewers,
+        papers,
+        constraints,
+        {"Affinity": {"edges": scores}},
+        {"Affinity": 1},
+    )
+    maximums = [3] * 10
+    maximums[1] = 0
+    with pytest.raises(SolverException, match="maximum load"):
+        Presolve(encoder, [0] * 10, maximums, [2] * 8)
+
+    demands = [2] * 8
+    demands[0] = 0
+    with pytest.raises(SolverException, match="demand"):
+        Presolve(encoder, [0] * 10, [3] * 10, demands)
+
+    # only reviewer9, without scores, has capacity left after forced pairs
+    maximums = [0] * 10
+    maximums[1] = maximums[3] = 1
+    maximums[9] = 3
+    with pytest.raises(SolverException, match="no reviewer"):
+        Presolve(encoder, [0] * 10, maximums, [2] * 8)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_matcher_presolve(sparse, tmp_path):
+    """Presolving gives the assignment of the whole problem"""
+    reviewers, papers, scores, constraints = _problem()
+    maximums = [3] * 10
+    maximums[5] = 0
+    demands = [2] * 8
+    demands[7] = 0
+
+    results = []
+    for presolve in [False, True]:
+        test_matcher = Matcher(
+            {
+                "reviewers": reviewers,
+                "papers": papers,
+                "constraints": constraints,
+                "scores_by_type": {"affinity": {"edges": scores}},
+                "weight_by_type": {"affinity": 1},
+                "minimums": [0] * len(reviewers),
+                "maximums": maximums,
+                "demands": demands,
+                "num_alternates": 2,
+                "presolve": presolve,
+                "sparse": sparse,
+                "assignments_output": str(tmp_path / "assignments.json"),
+                "alternates_output": str(tmp_path / "alternates.json"),
+            },
+            solver_class="MinMax",
+        )
+        test_matcher.run()
+
+        assert test_matcher.get_status() == "Complete"
+        results.append(test_matcher)
+
+    solutions = [result.solution for result in results]
+    if sparse:
+        solutions = [solution.toarray() for solution in solutions]
+    np.testing.assert_array_equal(solutions[0], solutions[1])
+    assert results[0].assignments == results[1].assignments
+    assert results[0].alternates == results[1].alternates
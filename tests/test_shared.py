@@ -0,0 +1,160 @@
+"""
+Unit test suite for `matcher/shared.py`
+"""
+
+import itertools
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from matcher import Matcher
+from matcher.components import ComponentSolver
+from matcher.encoder import Encoder
+from matcher.shared import SharedMatrices, attach
+from matcher.solvers import MinMaxSolver
+
+
+def _encoder(sparse):
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        (paper, reviewer, 0.1 * position)
+        for position, (paper, reviewer) in enumerate(
+            itertools.product(papers, reviewers)
+        )
+    ]
+    return Encoder(
+        reviewers,
+        papers,
+        [("paper0", "reviewer1", -1)],
+        {"Affinity": {"edges": scores}},
+        {"Affinity": 1},
+        sparse=sparse,
+    )
+
+
+def _dense(matrix):
+    return matrix.toarray() if hasattr(matrix, "toarray") else matrix
+
+
+def _read_encoder(encoder):
+    """Read a pickled encoder in a worker process"""
+    return (
+        _dense(encoder.cost_matrix),
+        _dense(encoder.constraint_matrix),
+        encoder.cost_matrix.data.flags.writeable
+        if encoder.sparse
+        else encoder.cost_matrix.flags.writeable,
+        encoder.subset([1, 2], [0, 3]).cost_matrix.shape,
+    )
+
+
+@pytest.mark.parametrize("in_files", [False, True], ids=["shm", "files"])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_shared_encoder(sparse, in_files, tmp_path):
+    """Workers attach to the shared matrices, read-only, instead of receiving them"""
+    encoder = _encoder(sparse)
+    unshared_size = len(pickle.dumps(encoder))
+    shared = encoder.share(str(tmp_path) if in_files else None)
+    assert shared.nbytes > 0
+    assert len(pickle.dumps(encoder)) < unshared_size
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        cost_matrix, constraint_matrix, writeable, subset_shape = pool.submit(
+            _read_encoder, encoder
+        ).result()
+    np.testing.assert_array_equal(cost_matrix, _dense(encoder.cost_matrix))
+    np.testing.assert_array_equal(
+        constraint_matrix, _dense(encoder.constraint_matrix)
+    )
+    assert not writeable
+    assert subset_shape == (2, 2)
+
+    encoder.unshare()
+    assert encoder.shared is None
+    assert len(pickle.dumps(encoder)) == unshared_size
+    if in_files:
+        assert list(tmp_path.iterdir()) == []
+
+
+def test_shared_matrices_close():
+    """Closed shared memory cannot be attached to"""
+    with SharedMatrices() as shared:
+        descriptor = shared.put(np.arange(6).reshape(2, 3))
+        empty = shared.put(np.zeros((0, 3)))
+    assert attach(empty).shape == (0, 3)
+    with pytest.raises(FileNotFoundError):
+        attach(descriptor)
+
+
+def test_component_args_shared(monkeypatch):
+    """Components sent to workers of a shared encoder are not copied in the parent"""
+    encoder = _encoder(False)
+    papers, reviewers = np.array([1, 2]), np.array([0, 3])
+    solver = ComponentSolver(
+        MinMaxSolver,
+        [(papers, reviewers)],
+        [0] * 6,
+        [2] * 6,
+        [1] * 4,
+        encoder,
+    )
+    encoder.share()
+    monkeypatch.setattr(encoder, "subset", pytest.fail, raising=False)
+    args = solver._component_args(papers, reviewers, in_worker=True)
+    assert args[4] is encoder
+    assert args[-1] == (papers, reviewers)
+
+    monkeypatch.undo()
+    encoder.unshare()
+    args = solver._component_args(papers, reviewers, in_worker=True)
+    assert args[4].cost_matrix.shape == (2, 2)
+    assert args[-1] is None
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_matcher_shared_memory(sparse, tmp_path):
+    """Components solved in processes attached to shared matrices give the same assignment"""
+    # two groups of papers and reviewers, with scores only within a group
+    reviewers = ["reviewer{}".format(index) for index in range(8)]
+    papers = ["paper{}".format(index) for index in range(6)]
+    scores = [
+        (paper, reviewer, (position % 7) / 7)
+        for group in range(2)
+        for position, (paper, reviewer) in enumerate(
+            itertools.product(
+                papers[3 * group : 3 * group + 3],
+                reviewers[4 * group : 4 * group + 4],
+            )
+        )
+    ]
+
+    results = []
+    for shared_memory in [False, True]:
+        test_matcher = Matcher(
+            {
+                "reviewers": reviewers,
+                "papers": papers,
+                "scores_by_type": {"affinity": {"edges": scores}},
+                "weight_by_type": {"affinity": 1},
+                "minimums": [1] * len(reviewers),
+                "maximums": [2] * len(reviewers),
+                "demands": [2] * len(papers),
+                "sparse": sparse,
+                "split_components": True,
+                "num_workers": 2,
+                "shared_memory": shared_memory,
+                "assignments_output": str(tmp_path / "assignments.json"),
+                "alternates_output": str(tmp_path / "alternates.json"),
+            },
+            solver_class="MinMax",
+        )
+        test_matcher.run()
+
+        assert test_matcher.get_status() == "Complete"
+        results.append(test_matcher)
+
+    assert results[0].assignments == results[1].assignments
+    assert results[0].alternates == results[1].alternates
@@ -626,3 +626,27 @@ def test_solver_fairflow_avoid_zero_scores_get_no_solution():
         SolverException, match=r".*Solver could not find a solution.*"
     ):
         res = solver.solve()
+
+
+def test_solvers_fairflow_time_budget():
+    """When the time budget runs out, the best makespan so far is used"""
+    rng = np.random.default_rng(0)
+    aggregate_score_matrix = rng.random((10, 15))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [3] * 10
+    solver = FairFlow(
+        [1] * 15,
+        [3] * 15,
+        demands,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        time_budget=1e-9,
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= 3)
+    status_info = solver.get_additional_status_info()
+    assert status_info["time_budget_exhausted"] == "True"
+    assert float(status_info["objective"]) == pytest.approx(
+        np.sum(res * aggregate_score_matrix)
+    )
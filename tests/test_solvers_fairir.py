@@ -330,4 +330,27 @@ def test_solvers_fairir_custom_demands_paper_with_0_demand():
     res_A = solver_A.solve()
     assert res_A.shape == (3, 4)
     result = [assignments for assignments in np.sum(res_A, axis=1)]
-    assert_arrays(result, demands)
\ No newline at end of file
+    assert_arrays(result, demands)
+
+def test_solvers_fairir_time_budget():
+    '''When the time budget runs out, the fairness constraints are dropped to round the solution'''
+    rng = np.random.default_rng(0)
+    aggregate_score_matrix = rng.random((10, 15))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [3] * 10
+    solver = FairIR(
+        [1] * 15,
+        [3] * 15,
+        demands,
+        encoder(aggregate_score_matrix, constraint_matrix, None),
+        time_budget=1e-9
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert_arrays(np.sum(res, axis=1), demands)
+    loads = np.sum(res, axis=0)
+    assert np.all((loads >= 1) & (loads <= 3))
+    assert np.all((res == 0) | (res == 1))
+    status_info = solver.get_additional_status_info()
+    assert status_info['time_budget_exhausted'] == 'True'
+    assert float(status_info['objective']) == pytest.approx(np.sum(res * aggregate_score_matrix))
@@ -917,3 +917,28 @@ def test_solvers_fairsequence_make_trades_2():
         ]
     )
     assert np.all(res_A == expected_solution)
+
+
+def test_solvers_fairsequence_time_budget():
+    """When the time budget runs out, a min-cost flow completes the assignment"""
+    rng = np.random.default_rng(0)
+    aggregate_score_matrix = rng.random((10, 15))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    constraint_matrix[0, :3] = -1
+    demands = [3] * 10
+    solver = FairSequence(
+        [1] * 15,
+        [3] * 15,
+        demands,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        time_budget=1e-9,
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert_arrays(np.sum(res, axis=1), demands)
+    loads = np.sum(res, axis=0)
+    assert np.all((loads >= 1) & (loads <= 3))
+    assert not np.any(res[0, :3])
+    status_info = solver.get_additional_status_info()
+    assert status_info["time_budget_exhausted"] == "True"
+    assert status_info["completed_pairs"] == "30"
@@ -2,6 +2,7 @@
 from collections import namedtuple
 import pytest
 import numpy as np
+import scipy.sparse
 from matcher.solvers import MinMaxSolver
 
 encoder = namedtuple("Encoder", ["cost_matrix", "constraint_matrix"])
@@ -299,6 +300,64 @@ def test_solver_minmax_find_lowest_cost_and_respect_constraints():
     check_solution(solver, solver.optimal_cost)
 
 
+def test_solver_minmax_sparse_matches_dense():
+    """
+    Sparse cost and constraint matrices should give the same optimal cost as
+    their dense counterparts, and never use a pair that is not stored.
+    """
+    cost_matrix = np.transpose(
+        np.array(
+            [
+                [-10, 0, -1, -10, -10],
+                [-100, -10, -10, -100, 0],
+                [0, -10, -10, -100, -100],
+                [-10, -100, -100, -10, -10],
+            ]
+        )
+    )
+    constraint_matrix = np.transpose(
+        np.array(
+            [
+                [0, 0, 0, 0, 1],
+                [-1, 0, 0, -1, 0],
+                [0, 0, 0, -1, -1],
+                [0, -1, -1, 0, 0],
+            ]
+        )
+    )
+
+    dense_solver = MinMaxSolver(
+        [1, 1, 1, 1],
+        [3, 3, 3, 3],
+        [2, 2, 2, 2, 2],
+        encoder(cost_matrix, constraint_matrix),
+    )
+    dense_res = dense_solver.solve()
+
+    sparse_solver = MinMaxSolver(
+        [1, 1, 1, 1],
+        [3, 3, 3, 3],
+        [2, 2, 2, 2, 2],
+        encoder(
+            scipy.sparse.csr_matrix(cost_matrix),
+            scipy.sparse.csr_matrix(constraint_matrix),
+        ),
+    )
+    sparse_res = sparse_solver.solve()
+
+    assert scipy.sparse.issparse(sparse_res)
+    assert sparse_res.shape == dense_res.shape
+    assert sparse_solver.solved
+    assert sparse_solver.cost == dense_solver.cost
+    assert sparse_solver.optimal_cost == dense_solver.optimal_cost
+
+    res = sparse_res.toarray()
+    assert np.all(res.sum(axis=1) == 2)
+    assert res[4, 0] == 1
+    assert not np.any(res[(cost_matrix == 0) & (constraint_matrix != 1)])
+    assert not np.any(res[constraint_matrix == -1])
+
+
 def test_solver4_minmax():
     """
     Tests 6 papers, 6 reviewers.   Reviewers review min: 2, max: 3 papers.   Each paper needs 2 reviews.
@@ -544,3 +603,222 @@ def test_solver_minmax_avoid_zero_scores_get_no_solution():
 
     res = solver.solve()
     assert solver.solved is False
+
+
+@pytest.mark.parametrize("chunk_cells", [1, 4, 1 << 20])
+def test_simple_solver_arcs(chunk_cells, monkeypatch):
+    """
+    Reviewer -> paper arcs are ordered by reviewer, skip conflicts and zero
+    costs, and give forced pairs a cost below every other cost
+    """
+    from matcher.solvers import SimpleSolver
+
+    monkeypatch.setattr(
+        SimpleSolver._assignment_arcs, "__defaults__", (chunk_cells,)
+    )
+    cost_matrix = np.array([[-10.5, 0, -3], [-2, -4, 0]])
+    constraint_matrix = np.array([[0, 0, -1], [0, 1, 1]])
+    limit_matrix = np.array([[1, 2, 1], [3, 1, 1]])
+    solver = SimpleSolver(
+        [1, 1, 1],
+        [1, 1],
+        cost_matrix,
+        constraint_matrix,
+        strict=False,
+        limit_matrix=limit_matrix,
+    )
+
+    # nodes: source 0, reviewers 1-3, papers 4-5, sink 6
+    num_reviewers, num_papers = 3, 2
+    arcs = slice(num_reviewers, len(solver.start_nodes) - num_papers)
+    assert solver.start_nodes[arcs].tolist() == [1, 1, 2, 3]
+    assert solver.end_nodes[arcs].tolist() == [4, 5, 5, 5]
+    assert solver.capacities[arcs].tolist() == [1, 3, 1, 1]
+    assert solver.costs[arcs].tolist() == [-10, -2, -11, -11]
+
+    # a sparse encoding gives the same arcs, with capacities of 1
+    sparse_solver = SimpleSolver(
+        [1, 1, 1],
+        [1, 1],
+        scipy.sparse.csr_matrix(cost_matrix),
+        scipy.sparse.csr_matrix(constraint_matrix),
+        strict=False,
+    )
+    assert sparse_solver.start_nodes.tolist() == solver.start_nodes.tolist()
+    assert sparse_solver.end_nodes.tolist() == solver.end_nodes.tolist()
+    assert sparse_solver.costs.tolist() == solver.costs.tolist()
+    assert sparse_solver.capacities[arcs].tolist() == [1, 1, 1, 1]
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_simple_solver_flows(sparse):
+    """Flows are scattered into the flow matrix and costed by arc"""
+    from matcher.solvers import SimpleSolver
+
+    cost_matrix = np.array([[-3, -1, -2], [-1, -3, -2]])
+    constraint_matrix = np.zeros(np.shape(cost_matrix), dtype=int)
+    if sparse:
+        cost_matrix = scipy.sparse.csr_matrix(cost_matrix)
+        constraint_matrix = scipy.sparse.csr_matrix(constraint_matrix)
+    solver = SimpleSolver([1, 1, 1], [1, 1], cost_matrix, constraint_matrix)
+    flow_matrix = solver.solve()
+    if sparse:
+        flow_matrix = flow_matrix.toarray()
+
+    assert solver.solved
+    assert flow_matrix.tolist() == [[1, 0, 0], [0, 1, 0]]
+    assert solver.cost == solver.min_cost_flow.optimal_cost() == -6
+
+
+def test_solver_minmax_builds_one_network(monkeypatch):
+    """Both phases are solved on one flow network"""
+    from matcher.solvers import minmax_solver
+
+    built = []
+
+    class CountingSolver(minmax_solver.SimpleSolver):
+        def __init__(self, *args, **kwargs):
+            built.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(minmax_solver, "SimpleSolver", CountingSolver)
+    cost_matrix = np.transpose(
+        np.array([[-1, -2, -3], [-3, -1, -2], [-2, -3, -1], [-1, -1, -1]])
+    )
+    solver = MinMaxSolver(
+        [1, 0, 0, 0],
+        [2, 2, 2, 2],
+        [2, 2, 2],
+        encoder(cost_matrix, np.zeros(np.shape(cost_matrix))),
+    )
+    res = solver.solve()
+
+    assert len(built) == 1
+    assert solver.solved
+    assert res.sum(axis=1).tolist() == [2, 2, 2]
+    assert res[:, 0].sum() >= 1
+    check_solution(solver, solver.optimal_cost)
+
+
+def test_simple_solver_reset():
+    """A reset network solves like a network built for the new capacities"""
+    from matcher.solvers import SimpleSolver
+
+    rng = np.random.default_rng(0)
+    cost_matrix = -rng.integers(0, 10, size=(4, 5))
+    constraint_matrix = rng.choice([0, 0, 0, -1, 1], size=(4, 5))
+    limit_matrix = rng.integers(0, 3, size=(4, 5))
+
+    network = SimpleSolver(
+        [1] * 5, [1] * 4, cost_matrix, constraint_matrix, strict=False
+    )
+    network.solve()
+    network.reset(
+        [2, 1, 3, 0, 2], [2, 1, 2, 3], network.arc_limits(limit_matrix)
+    )
+    fresh = SimpleSolver(
+        [2, 1, 3, 0, 2],
+        [2, 1, 2, 3],
+        cost_matrix,
+        constraint_matrix,
+        limit_matrix=limit_matrix,
+    )
+
+    assert np.array_equal(network.capacities, fresh.capacities)
+    assert np.array_equal(network.solve(), fresh.solve())
+    assert network.cost == fresh.cost
+
+
+def test_top_k_candidates():
+    """Candidates are the least-cost assignable pairs of each row and column"""
+    from matcher.solvers.simple_solver import top_k_candidates
+
+    cost_matrix = np.array(
+        [[-5, -1, -3, 0], [-2, -4, -6, -1], [-1, -2, -3, -4]]
+    )
+    constraint_matrix = np.array([[0, 0, -1, 0], [0, 0, 0, 1], [0, 0, 0, 0]])
+    for chunk_cells in [1, 5, 1 << 20]:
+        candidates = top_k_candidates(
+            cost_matrix, constraint_matrix, 1, chunk_cells=chunk_cells
+        )
+        # paper 0 skips the conflict and reviewer 3 the unknown score
+        assert candidates.astype(int).tolist() == [
+            [1, 0, 0, 0],
+            [0, 1, 1, 1],
+            [0, 0, 0, 1],
+        ]
+
+
+@pytest.mark.parametrize("top_k", [1, 2, 10])
+def test_solver_minmax_pricing(top_k):
+    """Pricing rounds reach the cost of solving over all pairs"""
+    rng = np.random.default_rng(top_k)
+    for _ in range(20):
+        # widely spread costs, so that the first phase has a unique optimal flow
+        cost_matrix = -rng.integers(1, 10**6, size=(8, 12)) * (
+            rng.random((8, 12)) > 0.1
+        )
+        constraint_matrix = np.where(rng.random((8, 12)) < 0.1, -1, 0)
+        solvers = [
+            MinMaxSolver(
+                [1] * 12,
+                [3] * 12,
+                [2] * 8,
+                encoder(cost_matrix, constraint_matrix),
+                pricing_top_k=pricing_top_k,
+            )
+            for pricing_top_k in [None, top_k]
+        ]
+        for solver in solvers:
+            solver.solve()
+
+        assert solvers[0].solved == solvers[1].solved
+        if solvers[0].solved:
+            check_solution(solvers[1], solvers[0].cost)
+        status_info = solvers[1].get_additional_status_info()
+        assert int(status_info["pricing_rounds"]) >= 1
+        assert int(status_info["pricing_candidates"]) <= 8 * 12
+    assert solvers[0].get_additional_status_info() == {}
+
+
+def test_solver_minmax_pricing_grows_candidates():
+    """Candidates are added when the first candidate pairs cannot meet the demands"""
+    # every paper prefers reviewer 0, who can only review one paper
+    cost_matrix = np.array([[-9, -1, -1], [-9, -1, -1], [-9, -1, -1]])
+    solver = MinMaxSolver(
+        [0, 0, 0],
+        [1, 1, 1],
+        [1, 1, 1],
+        encoder(cost_matrix, np.zeros((3, 3))),
+        pricing_top_k=1,
+    )
+    res = solver.solve()
+
+    assert solver.solved
+    assert res.sum(axis=0).tolist() == [1, 1, 1]
+    check_solution(solver, -11)
+    assert solver.pricing_rounds >= 2
+
+
+def test_node_potentials():
+    """Residual arcs have non-negative reduced costs under the node potentials"""
+    from matcher.solvers import SimpleSolver
+
+    rng = np.random.default_rng(0)
+    cost_matrix = -rng.integers(1, 100, size=(6, 9))
+    network = SimpleSolver(
+        [2] * 9, [2] * 6, cost_matrix, np.zeros((6, 9), dtype=int)
+    )
+    network.solve()
+    potentials = network.node_potentials()
+
+    flows = network.min_cost_flow.flows(
+        np.arange(network.min_cost_flow.num_arcs(), dtype=np.int32)
+    )
+    reduced_costs = (
+        network.costs
+        + potentials[network.start_nodes]
+        - potentials[network.end_nodes]
+    )
+    assert np.all(reduced_costs[flows < network.capacities] >= 0)
+    assert np.all(reduced_costs[flows > 0] <= 0)
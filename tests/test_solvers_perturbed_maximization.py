@@ -702,3 +702,25 @@ def test_identical_costs():
     )
     for _ in range(1000):
         check_test_solution(solver, T=1)
+
+
+def test_time_budget():
+    """When the time budget runs out, the assignment without perturbation is sampled"""
+    S = np.transpose(np.array([[1, 0.1], [1, 1], [0.3, 0.6], [0.5, 0.8]]))
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.75)
+    solver = PerturbedMaximizationSolver(
+        [0, 0, 0, 0],
+        [1, 1, 1, 1],
+        [2, 2],
+        encoder(-S, M, Q, 0.5, [0.5]),
+        time_budget=1e-9,
+    )
+    solver.solve()
+    assert solver.solved
+    assert solver.get_additional_status_info()["time_budget_exhausted"] == "True"
+    assert np.allclose(
+        solver.fractional_assignment_matrix,
+        solver.no_perturbation_assignment_matrix,
+    )
+    check_sampled_solution(solver)
@@ -0,0 +1,215 @@
+"""
+Unit test suite for `matcher/solvers/portfolio.py`
+"""
+
+import itertools
+import time
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from matcher import Matcher
+from matcher.solvers import FairFlow, MinMaxSolver, Portfolio, SolverException
+
+encoder = namedtuple(
+    "Encoder", ["aggregate_score_matrix", "cost_matrix", "constraint_matrix"]
+)
+
+
+class SlowSolver:
+    """A solver that does not finish before it is cancelled"""
+
+    def __init__(self, minimums, maximums, demands, encoder, **kwargs):
+        self.solved = False
+
+    def solve(self):
+        time.sleep(60)
+
+
+class FailingSolver:
+    """A solver whose problem is always infeasible"""
+
+    def __init__(self, minimums, maximums, demands, encoder, **kwargs):
+        self.solved = False
+
+    def solve(self):
+        raise SolverException("infeasible")
+
+
+def _encoder(num_papers=6, num_reviewers=8, seed=0):
+    scores = np.random.default_rng(seed).random((num_papers, num_reviewers))
+    return encoder(scores, -100 * scores, np.zeros(np.shape(scores)))
+
+
+@pytest.mark.parametrize("scoring", ["affinity", "min_paper_score"])
+def test_portfolio_scoring(scoring):
+    """The winner has the best score, every solver reports its objectives"""
+    portfolio = Portfolio(
+        [0] * 8,
+        [2] * 8,
+        [2] * 6,
+        _encoder(),
+        solvers={"MinMax": MinMaxSolver, "FairFlow": FairFlow},
+        scoring=scoring,
+    )
+    solution = portfolio.solve()
+
+    assert portfolio.solved
+    assert np.all(np.sum(solution, axis=1) == 2)
+    status_info = portfolio.get_additional_status_info()
+    scores = {
+        name: float(status_info["portfolio_{}_{}".format(name, scoring)])
+        for name in ["MinMax", "FairFlow"]
+    }
+    assert status_info["portfolio_winner"] == max(scores, key=scores.get)
+    for name in ["MinMax", "FairFlow"]:
+        assert status_info["portfolio_{}_status".format(name)] == "solved"
+        assert float(status_info["portfolio_{}_time".format(name)]) >= 0
+
+
+def test_portfolio_cancel():
+    """The first solution wins by time and the other solvers are cancelled"""
+    start = time.monotonic()
+    portfolio = Portfolio(
+        [0] * 8,
+        [2] * 8,
+        [2] * 6,
+        _encoder(),
+        solvers={
+            "Slow": SlowSolver,
+            "Failing": FailingSolver,
+            "MinMax": MinMaxSolver,
+        },
+        scoring="time",
+    )
+    portfolio.solve()
+
+    assert time.monotonic() - start < 30
+    assert portfolio.solved
+    status_info = portfolio.get_additional_status_info()
+    assert status_info["portfolio_winner"] == "MinMax"
+    assert status_info["portfolio_Slow_status"] == "cancelled"
+    assert status_info["portfolio_Failing_status"] == "error"
+
+
+def test_portfolio_time_budget():
+    """Once the time budget has run out, slower solvers are cancelled"""
+    portfolio = Portfolio(
+        [0] * 8,
+        [2] * 8,
+        [2] * 6,
+        _encoder(),
+        solvers={"Slow": SlowSolver, "MinMax": MinMaxSolver},
+        time_budget=0.5,
+    )
+    portfolio.solve()
+
+    assert portfolio.solved
+    assert portfolio.winner == "MinMax"
+    assert portfolio.results["Slow"]["cancelled"]
+
+
+def test_portfolio_no_solution():
+    """Errors of every solver are reported when none finds a solution"""
+    portfolio = Portfolio(
+        [0] * 8,
+        [2] * 8,
+        [2] * 6,
+        _encoder(),
+        solvers={"Failing": FailingSolver},
+    )
+    with pytest.raises(SolverException, match="Failing: infeasible"):
+        portfolio.solve()
+
+
+def test_matcher_portfolio(tmp_path):
+    """The Matcher runs the configured portfolio and keeps the alternates of the winner"""
+    reviewers = ["reviewer{}".format(index) for index in range(6)]
+    papers = ["paper{}".format(index) for index in range(4)]
+    scores = [
+        (paper, reviewer, (index * 7 % 11 + 1) / 11)
+        for index, (paper, reviewer) in enumerate(
+            itertools.product(papers, reviewers)
+        )
+    ]
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * 6,
+            "maximums": [2] * 6,
+            "demands": [2] * 4,
+            "num_alternates": 1,
+            "portfolio": ["MinMax", "FairSequence"],
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+        },
+        solver_class="Portfolio",
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    assert all(len(test_matcher.assignments[paper]) == 2 for paper in papers)
+    assert all(len(test_matcher.alternates[paper]) == 1 for paper in papers)
+
+
+def test_portfolio_time_budget_no_solution():
+    """Solvers still running when the time budget runs out are cancelled, even without a solution"""
+    start = time.monotonic()
+    portfolio = Portfolio(
+        [0] * 8,
+        [2] * 8,
+        [2] * 6,
+        _encoder(),
+        solvers={"Slow": SlowSolver},
+        time_budget=0.5,
+    )
+    assert portfolio.solve() is None
+
+    assert time.monotonic() - start < 30
+    assert not portfolio.solved
+    assert portfolio.results["Slow"]["cancelled"]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_matcher_portfolio_split_components(num_workers, tmp_path):
+    """Each component is raced by the portfolio, which keeps the alternates of its winners"""
+    # two groups of papers and reviewers, with scores only within a group
+    reviewers = ["reviewer{}".format(index) for index in range(8)]
+    papers = ["paper{}".format(index) for index in range(6)]
+    scores = [
+        (paper, reviewer, (position * 7 % 11 + 1) / 11)
+        for group in range(2)
+        for position, (paper, reviewer) in enumerate(
+            itertools.product(
+                papers[3 * group : 3 * group + 3],
+                reviewers[4 * group : 4 * group + 4],
+            )
+        )
+    ]
+    test_matcher = Matcher(
+        {
+            "reviewers": reviewers,
+            "papers": papers,
+            "scores_by_type": {"affinity": {"edges": scores}},
+            "weight_by_type": {"affinity": 1},
+            "minimums": [0] * 8,
+            "maximums": [2] * 8,
+            "demands": [2] * 6,
+            "num_alternates": 1,
+            "portfolio": ["MinMax", "FairFlow"],
+            "split_components": True,
+            "num_workers": num_workers,
+            "assignments_output": str(tmp_path / "assignments.json"),
+            "alternates_output": str(tmp_path / "alternates.json"),
+        },
+        solver_class="Portfolio",
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == "Complete"
+    assert all(len(test_matcher.assignments[paper]) == 2 for paper in papers)
+    assert all(len(test_matcher.alternates[paper]) == 1 for paper in papers)
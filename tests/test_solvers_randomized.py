@@ -405,3 +405,232 @@ def test_identical_costs():
     )
     for _ in range(1000):
         check_test_solution(solver, T=1)
+
+
+def test_one_network(monkeypatch):
+    """The fractional and deterministic problems share one flow network"""
+    from matcher.solvers import minmax_solver
+
+    built = []
+
+    class CountingSolver(minmax_solver.SimpleSolver):
+        def __init__(self, *args, **kwargs):
+            built.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(minmax_solver, "SimpleSolver", CountingSolver)
+    S = np.transpose(
+        np.array(
+            [[1, 0.1, 0.5], [0.5, 1, 0.1], [0.1, 0.5, 1], [0.3, 0.2, 0.4]]
+        )
+    )
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.5)
+    solver = RandomizedSolver(
+        [0, 0, 0, 0], [2, 2, 2, 2], [2, 2, 2], encoder(-S, M, Q)
+    )
+    solver.solve()
+
+    assert len(built) == 1
+    assert solver.solved and solver.opt_solved
+    assert np.all(solver.fractional_assignment_matrix <= Q)
+    check_sampled_solution(solver)
+
+
+def test_sample_bvn_in_place():
+    """The sampler writes into C-contiguous intc buffers and copies other input once"""
+    from matcher.solvers.bvn_extension import sample_bvn
+
+    one = 100
+    flows = np.array(
+        [[50, 50, 0, 0], [50, 0, 50, 0], [0, 50, 50, 100]], dtype=np.intc
+    )
+    demands = flows.sum(axis=1) // one
+    reviewer_loads = flows.sum(axis=0)
+
+    as_int64 = flows.astype(np.int64)
+    sample = sample_bvn(as_int64, one)
+    assert sample is not as_int64
+    assert np.all(as_int64 == flows)
+
+    sample = sample_bvn(flows, one)
+    assert sample is flows
+    assert np.all(np.logical_or(sample == 0, sample == 1))
+    assert np.all(sample.sum(axis=1) == demands)
+    assert np.all(sample.sum(axis=0) * one >= reviewer_loads - one + 1)
+    assert np.all(sample.sum(axis=0) * one <= reviewer_loads + one - 1)
+
+
+def test_sample_bvn_sparse():
+    """Sampling from edges matches the marginals of the fractional assignment"""
+    from matcher.solvers.bvn_extension import sample_bvn_sparse
+
+    one = 100
+    # a 3 x 4 fractional assignment, with a zero-flow and an integral edge
+    papers = np.array([0, 0, 1, 1, 2, 2, 2, 0])
+    reviewers = np.array([0, 1, 0, 2, 1, 2, 3, 3])
+    flows = np.array([50, 50, 50, 50, 50, 50, 100, 0])
+
+    total = np.zeros(len(flows))
+    for _ in range(400):
+        sample = sample_bvn_sparse(
+            papers, reviewers, flows, one, num_papers=3, num_reviewers=4
+        )
+        assert np.all(np.logical_or(sample == 0, sample == 1))
+        assert np.all(np.bincount(papers, weights=sample) == [1, 1, 2])
+        assert sample[-1] == 0 and sample[-2] == 1
+        total += sample
+
+    assert np.allclose(total / 400, flows / one, atol=0.1)
+
+
+def test_num_samples():
+    """Samples drawn in several processes are valid, and the first is the solution"""
+    S = np.transpose(np.array([[1, 0.1], [1, 1], [0.3, 0.6], [0.5, 0.8]]))
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.75)
+    solver = RandomizedSolver(
+        [0, 0, 0, 0],
+        [1, 1, 1, 1],
+        [2, 2],
+        encoder(-S, M, Q),
+        num_samples=200,
+        max_workers=2,
+    )
+    solver.solve()
+
+    samples = solver.get_samples()
+    assert samples.assignments.shape == (200, len(samples.papers))
+    assert np.all(samples.assignment(0) == solver.flow_matrix)
+    for index in range(200):
+        assignment = samples.assignment(index)
+        assert np.all(assignment.sum(axis=1) == 2)
+        assert np.all(assignment.sum(axis=0) <= 1)
+    assert np.allclose(
+        samples.marginals(), solver.fractional_assignment_matrix, atol=0.15
+    )
+
+
+def test_sample_bvn_seed():
+    """A seed determines the sample, also when sampling in concurrent threads"""
+    from concurrent.futures import ThreadPoolExecutor
+    from matcher.solvers.bvn_extension import sample_bvn_sparse
+
+    one = 100
+    papers = np.repeat(np.arange(20), 4)
+    reviewers = np.tile(np.arange(4), 20) + 4 * (np.arange(80) // 16)
+    flows = np.full(80, 25)
+
+    def sample(seed):
+        return sample_bvn_sparse(
+            papers, reviewers, flows, one, 20, 20, seed=seed
+        )
+
+    sequential = [sample(seed) for seed in range(1, 9)]
+    assert all(np.all(sample(1) == sequential[0]) for _ in range(5))
+    assert any(np.any(other != sequential[0]) for other in sequential[1:])
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        concurrent = list(pool.map(sample, range(1, 9)))
+    for expected, actual in zip(sequential, concurrent):
+        assert np.all(expected == actual)
+
+
+def test_seed():
+    """The same seed gives the same samples and alternates, whatever the number of threads"""
+    S = np.transpose(np.array([[1, 0.1], [1, 1], [0.3, 0.6], [0.5, 0.8]]))
+    M = np.zeros(np.shape(S))
+    Q = np.full(np.shape(S), 0.75)
+
+    def solve(seed, max_workers):
+        solver = RandomizedSolver(
+            [0, 0, 0, 0],
+            [1, 1, 1, 1],
+            [2, 2],
+            encoder(-S, M, Q),
+            num_samples=50,
+            max_workers=max_workers,
+            seed=seed,
+        )
+        solver.solve()
+        return solver.get_samples().assignments, solver.get_alternates(2)
+
+    assignments, alternates = solve(7, 1)
+    same_assignments, same_alternates = solve(7, 2)
+    assert np.all(assignments == same_assignments)
+    assert alternates == same_alternates
+    other_assignments, _ = solve(8, 2)
+    assert np.any(assignments != other_assignments)
+
+
+def test_sample_bvn_all_nonzero():
+    """Fractional assignments with every pair nonzero fill the edge buffers"""
+    from matcher.solvers.bvn_extension import sample_bvn, sample_bvn_sparse
+
+    one = 100
+    flows = np.full((2, 2), 50, dtype=np.intc)
+    papers, reviewers = np.nonzero(flows)
+    for seed in range(1, 50):
+        sample = sample_bvn(flows.copy(), one, seed=seed)
+        assert np.all(sample.sum(axis=0) == 1)
+        assert np.all(sample.sum(axis=1) == 1)
+        sample = sample_bvn_sparse(
+            papers, reviewers, flows.flatten(), one, 2, 2, seed=seed
+        )
+        assert np.all(np.bincount(papers, weights=sample) == 1)
+        assert np.all(np.bincount(reviewers, weights=sample) == 1)
+
+
+SANITIZER_HARNESS = r"""
+#include <stdint.h>
+int run_bvn(int*, int*, int, int, int, uint64_t);
+int run_bvn_sparse(int*, int*, int*, int, int*, int, int, int, uint64_t);
+int main(void)
+{
+    int flows[6] = {50, 50, 0, 50, 50, 100}, subsets[3] = {1, 1, 1};
+    int paps[4] = {0, 0, 1, 1}, revs[4] = {0, 1, 0, 1};
+    int edge_flows[4] = {50, 50, 50, 50};
+    for(uint64_t seed = 1; seed < 20; seed++)
+    {
+        int dense[4] = {50, 50, 50, 50};
+        int sparse[4] = {50, 50, 50, 50};
+        run_bvn(dense, subsets, 2, 2, 100, seed);
+        run_bvn_sparse(paps, revs, sparse, 4, subsets, 2, 2, 100, seed);
+    }
+    run_bvn(flows, subsets, 2, 3, 100, 1);
+    run_bvn_sparse(paps, revs, edge_flows, 4, subsets, 2, 2, 100, 1);
+    return 0;
+}
+"""
+
+
+def test_bvn_address_sanitizer(tmp_path):
+    """The sampler stays within its buffers, when built with AddressSanitizer"""
+    import os
+    import shutil
+    import subprocess
+
+    compiler = shutil.which("gcc") or shutil.which("clang")
+    if compiler is None:
+        pytest.skip("no C compiler")
+    source = os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "matcher",
+        "solvers",
+        "bvn_extension",
+        "bvn.c",
+    )
+    harness = tmp_path / "harness.c"
+    harness.write_text(SANITIZER_HARNESS)
+    binary = tmp_path / "harness"
+    build = subprocess.run(
+        [compiler, "-g", "-fsanitize=address", str(harness), source]
+        + ["-lm", "-o", str(binary)],
+        capture_output=True,
+        text=True,
+    )
+    if build.returncode != 0:
+        pytest.skip("AddressSanitizer unavailable: " + build.stderr)
+
+    run = subprocess.run([str(binary)], capture_output=True, text=True)
+    assert run.returncode == 0, run.stderr